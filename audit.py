@@ -0,0 +1,190 @@
+"""
+Gravação assíncrona e em lotes dos logs de auditoria.
+
+Os endpoints apenas enfileiram as entradas (operação O(1), segura entre
+threads); uma task em background, iniciada no startup da aplicação, drena a
+fila em lotes — por tamanho ou por janela de tempo — para o repositório de
+logs. No shutdown a fila é esvaziada antes de encerrar.
+
+Enquanto o writer não estiver rodando (scripts, testes sem lifespan), as
+entradas são gravadas diretamente, mantendo o comportamento síncrono. Toda
+gravação passa por um único writer, de modo que os lotes nunca se sobrepõem.
+"""
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from storage import LogStore
+
+logger = logging.getLogger(__name__)
+
+Entrada = Tuple[int, str, str, datetime]
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+
+class AuditLogWriter:
+    """Fila de logs em memória drenada em lotes por uma task assíncrona."""
+
+    def __init__(self, store: LogStore, batch_size: int = 500, flush_interval: float = 0.05,
+                 max_queue: int = 10_000, overflow: str = "drop"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de overflow desconhecida: {overflow}")
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._fila: Deque[Entrada] = deque()
+        self._lock = threading.Lock()
+        self._escrita = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._evento: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, usuario_id: int, acao: str, detalhes: str = "") -> None:
+        """Enfileira uma entrada de log (ou grava diretamente se o writer estiver parado).
+
+        No overflow "block" quem enfileira grava um lote na própria thread; no
+        event loop use ``put``.
+        """
+        entrada = (usuario_id, acao, detalhes, datetime.now())
+        while not self._enfileirar(entrada):
+            self._gravar_proximo()
+
+    async def put(self, usuario_id: int, acao: str, detalhes: str = "") -> None:
+        """Como ``submit``, mas no overflow "block" aguarda a gravação fora do event loop."""
+        entrada = (usuario_id, acao, detalhes, datetime.now())
+        while not self._enfileirar(entrada):
+            await asyncio.to_thread(self._gravar_proximo)
+
+    def _enfileirar(self, entrada: Entrada) -> bool:
+        """Enfileira, descarta ou grava a entrada; False se a fila cheia exige backpressure."""
+        if not self.running:
+            with self._escrita:
+                self._gravar([entrada])
+            return True
+
+        with self._lock:
+            if len(self._fila) >= self.max_queue:
+                if self.overflow == "block":
+                    return False
+                self.descartados += 1
+                return True
+            self._fila.append(entrada)
+            self.enfileirados += 1
+            cheio = len(self._fila) >= self.batch_size
+
+        if cheio:
+            self._acordar()
+        return True
+
+    def _retirar_lote(self) -> List[Entrada]:
+        """Retira até ``batch_size`` entradas da fila (chamar com o lock adquirido)."""
+        quantidade = min(self.batch_size, len(self._fila))
+        return [self._fila.popleft() for _ in range(quantidade)]
+
+    def _gravar_proximo(self) -> int:
+        """Retira e grava o próximo lote; devolve quantas entradas foram gravadas.
+
+        Retirada e gravação ocorrem sob ``_escrita``: há um único writer por vez
+        e os lotes chegam ao repositório na ordem da fila (IDs seguem timestamps).
+        """
+        with self._escrita:
+            with self._lock:
+                lote = self._retirar_lote()
+            if lote:
+                try:
+                    self._gravar(lote)
+                except Exception:
+                    with self._lock:
+                        self.falhas += 1
+                    raise
+            return len(lote)
+
+    def _gravar(self, lote: List[Entrada]) -> None:
+        self.store.add_many(lote)
+        with self._lock:
+            self.gravados += len(lote)
+
+    def _acordar(self) -> None:
+        """Sinaliza a task de gravação (pode ser chamado de qualquer thread)."""
+        loop, evento = self._loop, self._evento
+        if loop is None or evento is None:
+            return
+        try:
+            loop.call_soon_threadsafe(evento.set)
+        except RuntimeError:
+            pass  # loop já encerrado; o flush do shutdown cuida do restante
+
+    async def start(self) -> None:
+        """Inicia a task de gravação no event loop atual."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._evento = asyncio.Event()
+        self._task = asyncio.create_task(self._executar())
+
+    async def _executar(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._evento.clear()
+            await self._flush_registrando_falhas()
+
+    async def flush(self) -> None:
+        """Grava todas as entradas pendentes, lote a lote, fora do event loop."""
+        while await asyncio.to_thread(self._gravar_proximo):
+            pass
+
+    async def _flush_registrando_falhas(self) -> None:
+        """Como ``flush``, mas registra lotes com falha e segue com o restante da fila.
+
+        O lote que falhou já saiu da fila, então cada nova tentativa avança.
+        """
+        while True:
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception("Falha ao gravar lote de logs de auditoria; lote descartado")
+
+    async def stop(self) -> None:
+        """Interrompe a task e grava o que ainda estiver na fila."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Task de gravação dos logs de auditoria encerrou com erro")
+        await self._flush_registrando_falhas()
+        self._loop = None
+        self._evento = None
+
+    def stats(self) -> dict:
+        """Contadores do pipeline de logs."""
+        with self._lock:
+            return {
+                "pendentes": len(self._fila),
+                "enfileirados": self.enfileirados,
+                "gravados": self.gravados,
+                "descartados": self.descartados,
+                "falhas": self.falhas,
+                "politica_overflow": self.overflow,
+            }
@@ -0,0 +1,10 @@
+"""
+Suíte de benchmarks da API de cadastro.
+
+- ``benchmarks.micro``: micro-benchmarks das funções críticas e das buscas
+  no repositório de usuários em diferentes tamanhos de base;
+- ``benchmarks.loadgen``: gerador de carga em processo (httpx + ASGI) com
+  uma mistura realista de cadastro/login/me/listagem;
+- ``python -m benchmarks``: executa tudo e grava os resultados em JSON,
+  opcionalmente comparando com uma execução anterior.
+"""
@@ -0,0 +1,139 @@
+"""
+Executa a suíte de benchmarks e grava os resultados em JSON.
+
+Uso:
+    python -m benchmarks --sizes 1000,100000,1000000 --output bench.json
+    python -m benchmarks --output novo.json --compare bench.json --tolerance 0.15
+    python -m benchmarks --bcrypt-rounds 4 --sizes 1000   # rodada rápida
+    python -m benchmarks --skip-micro --skip-load --workers 1,2,4   # escalabilidade
+    python -m benchmarks --skip-micro --skip-load --durable 1000000  # inicialização com WAL/snapshot
+    python -m benchmarks --skip-micro --skip-load --cold-start 5     # partida a frio
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+# Métricas em que um valor maior é pior (latências, memória) ou melhor (throughput)
+MAIOR_E_PIOR = ("media_ms", "p50_ms", "p95_ms", "p99_ms", "bytes_por_usuario", "inicio_ms",
+                "pronto_ms", "primeiro_login_ms", "primeiro_openapi_ms")
+MAIOR_E_MELHOR = ("ops_por_segundo",)
+
+
+def _versao_git() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def _folhas(resultado: dict, prefixo: str = "") -> Iterator[Tuple[str, float]]:
+    for chave, valor in resultado.items():
+        caminho = f"{prefixo}.{chave}" if prefixo else chave
+        if isinstance(valor, dict):
+            yield from _folhas(valor, caminho)
+        elif isinstance(valor, (int, float)):
+            yield caminho, valor
+
+
+def compare(atual: dict, anterior: dict, tolerancia: float) -> List[str]:
+    """Lista as métricas que pioraram mais que ``tolerancia`` em relação à execução anterior."""
+    base: Dict[str, float] = dict(_folhas(anterior))
+    regressoes = []
+    for caminho, valor in _folhas(atual):
+        metrica = caminho.rsplit(".", 1)[-1]
+        if caminho not in base or base[caminho] == 0 or caminho.startswith("meta."):
+            continue
+        variacao = (valor - base[caminho]) / base[caminho]
+        if (metrica in MAIOR_E_PIOR and variacao > tolerancia) or \
+                (metrica in MAIOR_E_MELHOR and variacao < -tolerancia):
+            regressoes.append(f"{caminho}: {base[caminho]} -> {valor} ({variacao:+.1%})")
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks da API de Cadastro")
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="Tamanhos de base para as buscas (separados por vírgula)")
+    parser.add_argument("--backend", default="memory", help="Backend das buscas (memory ou sqlite)")
+    parser.add_argument("--repeticoes", type=int, default=10_000, help="Repetições por micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2_000, help="Requisições do teste de carga")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clientes simultâneos no teste de carga")
+    parser.add_argument("--skip-micro", action="store_true", help="Não executa os micro-benchmarks")
+    parser.add_argument("--skip-load", action="store_true", help="Não executa o teste de carga")
+    parser.add_argument("--workers", help="Números de workers para o teste de escalabilidade (ex.: 1,2,4)")
+    parser.add_argument("--durable", help="Tamanhos de base para o benchmark de persistência (ex.: 1000000)")
+    parser.add_argument("--cold-start", type=int, help="Rodadas do benchmark de partida a frio (processos novos)")
+    parser.add_argument("--bcrypt-rounds", help="Custo do bcrypt da aplicação (ex.: 4 para rodadas rápidas)")
+    parser.add_argument("--output", default="bench_results.json", help="Arquivo JSON de saída")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora tolerada na comparação (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = args.bcrypt_rounds  # lido na importação de main
+
+    from benchmarks import coldstart, loadgen, micro, scaling
+    import main as api
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(),
+            "git": _versao_git(),
+            "python": sys.version.split()[0],
+            "plataforma": platform.platform(),
+            "bcrypt_rounds": api.BCRYPT_ROUNDS,
+        }
+    }
+    if not args.skip_micro:
+        tamanhos = [int(t) for t in args.sizes.split(",") if t]
+        print(f"Micro-benchmarks (buscas em {tamanhos}, backend {args.backend})...")
+        resultado["lookups"] = micro.bench_lookups(tamanhos, args.backend, args.repeticoes)
+        print("Memória por usuário...")
+        resultado["memoria"] = micro.bench_memory(tamanhos)
+        print("Busca por prefixo (e memória do índice)...")
+        resultado["busca"] = micro.bench_search(tamanhos, args.backend, min(args.repeticoes, 2_000))
+        print("Consultas de logs por janela de tempo e ação...")
+        resultado["logs"] = micro.bench_log_queries(args.backend, repeticoes=min(args.repeticoes, 2_000))
+        print("Micro-benchmarks de autenticação...")
+        resultado["auth"] = micro.bench_auth(args.repeticoes)
+    if not args.skip_load:
+        print(f"Teste de carga ({args.requests} requisições, concorrência {args.concurrency})...")
+        # Toda a carga parte de um único "IP": com o limitador ativo os logins virariam 429
+        api.login_limiter.ativo = False
+        resultado["load"] = loadgen.run_load(api.app, total=args.requests, concorrencia=args.concurrency)
+    if args.workers:
+        workers = [int(n) for n in args.workers.split(",") if n]
+        print(f"Escalabilidade com {workers} workers (backend sqlite)...")
+        resultado["scaling"] = scaling.bench_scaling(workers, total=args.requests, concorrencia=args.concurrency,
+                                                     bcrypt_rounds=args.bcrypt_rounds or "4")
+    if args.durable:
+        tamanhos = [int(t) for t in args.durable.split(",") if t]
+        print(f"Persistência (inicialização com {tamanhos} usuários, políticas de fsync)...")
+        resultado["durable"] = micro.bench_durable(tamanhos)
+    if args.cold_start:
+        print(f"Partida a frio ({args.cold_start} rodadas, com e sem aquecimento)...")
+        resultado["cold_start"] = coldstart.bench_cold_start(args.cold_start,
+                                                             bcrypt_rounds=args.bcrypt_rounds or "12")
+
+    with open(args.output, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as arquivo:
+            regressoes = compare(resultado, json.load(arquivo), args.tolerance)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        if regressoes:
+            return 1
+        print("Nenhuma regressão acima da tolerância.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Tempo de partida a frio (importação, inicialização e primeiras requisições).
+
+Cada rodada executa um interpretador novo, que importa ``main``, passa pelo
+lifespan (com ou sem aquecimento) e faz duas vezes ``/login`` e
+``/openapi.json``. A diferença entre a primeira e a segunda requisição é o
+custo que sobra para o primeiro cliente depois de um deploy ou de um
+scale-out; ``pronto_ms`` é o tempo até a instância poder receber tráfego.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+from passwords import build_password_context
+
+_SONDA = """
+import json, os, time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+from datetime import datetime
+with TestClient(main.app) as client:
+    iniciado = time.perf_counter()
+    main.db_usuarios.insert({
+        "username": "maria", "email": "maria@email.com", "nome_completo": None, "idade": None,
+        "hashed_password": os.environ["HASH_SONDA"], "data_criacao": datetime.now(), "ultimo_login": None,
+    })
+    tempos = {}
+    for nome, metodo, rota, corpo in (
+        ("primeiro_login_ms", "post", "/login", {"username": "maria", "password": "senha123"}),
+        ("segundo_login_ms", "post", "/login", {"username": "maria", "password": "senha123"}),
+        ("primeiro_openapi_ms", "get", "/openapi.json", None),
+        ("segundo_openapi_ms", "get", "/openapi.json", None),
+    ):
+        t = time.perf_counter()
+        resposta = client.request(metodo, rota, json=corpo)
+        assert resposta.status_code == 200, resposta.text
+        tempos[nome] = (time.perf_counter() - t) * 1000
+print(json.dumps({"import_ms": (importado - inicio) * 1000, "startup_ms": (iniciado - importado) * 1000, **tempos}))
+"""
+
+
+def _rodada(env: dict) -> Dict[str, float]:
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, "-c", _SONDA], env=env, capture_output=True, text=True, check=True)
+    tempos = json.loads(saida.stdout.strip().splitlines()[-1])
+    tempos["processo_ms"] = (time.perf_counter() - inicio) * 1000
+    tempos["pronto_ms"] = tempos["import_ms"] + tempos["startup_ms"]
+    return tempos
+
+
+def bench_cold_start(rodadas: int = 5, bcrypt_rounds: str = "12") -> Dict[str, dict]:
+    """Mediana de cada fase da partida a frio, com e sem o aquecimento no lifespan."""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    hash_sonda = build_password_context(int(bcrypt_rounds)).hash("senha123")
+    resultados = {}
+    for aquecimento in ("true", "false"):
+        env = {
+            **os.environ,
+            "PYTHONPATH": raiz,
+            "BCRYPT_ROUNDS": bcrypt_rounds,
+            "STARTUP_WARMUP": aquecimento,
+            "HASH_SONDA": hash_sonda,
+            "LOGIN_RATE_LIMIT": "false",
+        }
+        amostras = [_rodada(env) for _ in range(rodadas)]
+        nome = "com_aquecimento" if aquecimento == "true" else "sem_aquecimento"
+        resultados[nome] = {
+            metrica: round(statistics.median(amostra[metrica] for amostra in amostras), 2)
+            for metrica in amostras[0]
+        }
+    return resultados
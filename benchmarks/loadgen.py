@@ -0,0 +1,105 @@
+"""
+Gerador de carga em processo: httpx.AsyncClient contra a aplicação ASGI.
+
+Executa uma mistura ponderada de operações (cadastro, login, /me e
+listagem) com ``concorrencia`` clientes simultâneos e reporta throughput e
+percentis de latência por operação e no total.
+"""
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.stats import summarize
+
+MISTURA_PADRAO = {"cadastro": 5, "login": 10, "me": 50, "listagem": 35}
+
+
+class LoadGenerator:
+    """Dispara requisições contra ``app`` e coleta latências por operação."""
+
+    def __init__(self, app=None, base_url: str = "http://bench", concorrencia: int = 32,
+                 mistura: Optional[Dict[str, int]] = None, contas: int = 20, semente: int = 42):
+        self.app = app
+        self.base_url = base_url
+        self.concorrencia = concorrencia
+        self.mistura = mistura or MISTURA_PADRAO
+        self.contas = contas
+        self._sorteio = random.Random(semente)
+        self._sequencia = itertools.count()
+        self._prefixo = f"carga{int(time.time() * 1000) % 10_000_000}"
+        self._tokens: List[str] = []
+        self._usernames: List[str] = []
+        self.latencias: Dict[str, List[float]] = {operacao: [] for operacao in self.mistura}
+        self.erros: Dict[str, int] = {operacao: 0 for operacao in self.mistura}
+
+    def _client(self) -> httpx.AsyncClient:
+        transporte = httpx.ASGITransport(app=self.app) if self.app is not None else None
+        return httpx.AsyncClient(transport=transporte, base_url=self.base_url, timeout=60)
+
+    def _novo_usuario(self) -> dict:
+        n = next(self._sequencia)
+        return {"username": f"{self._prefixo}u{n}", "password": "senha123",
+                "email": f"{self._prefixo}u{n}@bench.com"}
+
+    async def preparar(self, client: httpx.AsyncClient) -> None:
+        """Cria as contas usadas nos logins e obtém tokens para as rotas autenticadas."""
+        for _ in range(self.contas):
+            dados = self._novo_usuario()
+            await client.post("/cadastro", json=dados)
+            resposta = await client.post("/login", json={"username": dados["username"], "password": "senha123"})
+            self._usernames.append(dados["username"])
+            self._tokens.append(resposta.json()["access_token"])
+
+    async def _operacao(self, client: httpx.AsyncClient, operacao: str) -> None:
+        headers = {"Authorization": f"Bearer {self._sorteio.choice(self._tokens)}"}
+        inicio = time.perf_counter()
+        if operacao == "cadastro":
+            resposta = await client.post("/cadastro", json=self._novo_usuario())
+        elif operacao == "login":
+            resposta = await client.post("/login", json={
+                "username": self._sorteio.choice(self._usernames), "password": "senha123"})
+        elif operacao == "me":
+            resposta = await client.get("/me", headers=headers)
+        else:
+            resposta = await client.get("/usuarios", params={"limite": 10}, headers=headers)
+        self.latencias[operacao].append(time.perf_counter() - inicio)
+        if resposta.status_code >= 400:
+            self.erros[operacao] += 1
+
+    async def run(self, total: int) -> dict:
+        """Executa ``total`` operações sorteadas pela mistura e retorna o relatório."""
+        operacoes = list(self.mistura)
+        pesos = [self.mistura[operacao] for operacao in operacoes]
+        plano = self._sorteio.choices(operacoes, weights=pesos, k=total)
+        fila = iter(plano)
+
+        async with self._client() as client:
+            await self.preparar(client)
+
+            async def trabalhador():
+                for operacao in fila:
+                    await self._operacao(client, operacao)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabalhador() for _ in range(self.concorrencia)))
+            duracao = time.perf_counter() - inicio
+
+        todas = [latencia for latencias in self.latencias.values() for latencia in latencias]
+        return {
+            "concorrencia": self.concorrencia,
+            "duracao_s": round(duracao, 3),
+            "total": summarize(todas, duracao),
+            "por_operacao": {
+                operacao: {**summarize(latencias, duracao), "erros": self.erros[operacao]}
+                for operacao, latencias in self.latencias.items()
+            },
+        }
+
+
+def run_load(app=None, total: int = 2_000, **kwargs) -> dict:
+    """Atalho síncrono para executar o gerador de carga."""
+    return asyncio.run(LoadGenerator(app=app, **kwargs).run(total))
@@ -0,0 +1,232 @@
+"""
+Micro-benchmarks das funções críticas e das buscas no repositório.
+"""
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import main
+from benchmarks.stats import bench
+from storage import InMemoryUserStore, UserRecord, UserStore, create_storage, open_durable_storage
+from storage.search import UserSearchIndex
+
+HASH_FIXO = "$2b$12$KIXQJ5Jm5qk7Sx5y9Zb2UuV9b0nqYgk4B0m6o1bHj3k3U4v5W6x7y"
+
+
+def populate(store: UserStore, quantidade: int) -> None:
+    """Insere ``quantidade`` usuários sintéticos diretamente no repositório (sem bcrypt)."""
+    base = datetime(2024, 1, 1)
+    for i in range(1, quantidade + 1):
+        store.insert({
+            "username": f"user{i}",
+            "email": f"user{i}@email.com",
+            "nome_completo": f"Usuário {i}",
+            "idade": 18 + i % 60,
+            "hashed_password": HASH_FIXO,
+            "data_criacao": base + timedelta(seconds=i),
+            "ultimo_login": None,
+        })
+
+
+def _usuario_sintetico(i: int, base: datetime) -> dict:
+    # Strings novas por usuário, como chegariam de requisições reais
+    return {
+        "id": i,
+        "username": f"user{i}",
+        "email": f"user{i}@email.com",
+        "nome_completo": f"Usuário {i}",
+        "idade": 18 + i % 60,
+        "hashed_password": HASH_FIXO[:-6] + f"{i:06d}",
+        "data_criacao": base + timedelta(seconds=i),
+        "ultimo_login": base + timedelta(seconds=2 * i),
+    }
+
+
+def _bytes_alocados(construir) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        objeto = construir()  # noqa: F841 - mantido vivo até a medição
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(tamanhos: Iterable[int]) -> Dict[str, dict]:
+    """Mede os bytes por usuário: dicionário antigo, registro compacto e repositório completo."""
+    base = datetime(2024, 1, 1)
+    resultados = {}
+    for tamanho in tamanhos:
+        dicts = _bytes_alocados(lambda: [_usuario_sintetico(i, base) for i in range(1, tamanho + 1)])
+        registros = _bytes_alocados(
+            lambda: [UserRecord.from_dict(_usuario_sintetico(i, base)) for i in range(1, tamanho + 1)])
+
+        def repositorio():
+            store = InMemoryUserStore()
+            for i in range(1, tamanho + 1):
+                store.insert(_usuario_sintetico(i, base))
+            return store
+
+        total = _bytes_alocados(repositorio)
+        resultados[str(tamanho)] = {
+            "dict": {"bytes_por_usuario": round(dicts / tamanho, 1)},
+            "registro": {"bytes_por_usuario": round(registros / tamanho, 1)},
+            "repositorio": {"bytes_por_usuario": round(total / tamanho, 1)},
+        }
+    return resultados
+
+
+def bench_lookups(tamanhos: Iterable[int], backend: str = "memory", repeticoes: int = 10_000) -> Dict[str, dict]:
+    """Mede buscas por ID, username, email e uma página de listagem para cada tamanho de base."""
+    resultados = {}
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            store, logs = create_storage(backend, sqlite_path=f"{diretorio}/bench.db")
+            populate(store, tamanho)
+            sorteio = random.Random(42)
+            ids = [sorteio.randint(1, tamanho) for _ in range(repeticoes)]
+            resultados[str(tamanho)] = {
+                "get": bench(lambda i: store.get(ids[i]), repeticoes),
+                "get_by_username": bench(lambda i: store.get_by_username(f"user{ids[i]}"), repeticoes),
+                "get_by_email": bench(lambda i: store.get_by_email(f"USER{ids[i]}@email.com"), repeticoes),
+                "page": bench(lambda i: store.page(10, apos=(ids[i],)), repeticoes),
+            }
+            store.close()
+            logs.close()
+    return resultados
+
+
+def bench_search(tamanhos: Iterable[int], backend: str = "memory", repeticoes: int = 2_000) -> Dict[str, dict]:
+    """Mede a busca por prefixo (primeira página de 20) e os bytes por usuário do índice."""
+    consultas = {
+        "username_exato": lambda i: f"user{i}",
+        "username_prefixo": lambda i: f"user{i // 100}",
+        "nome": lambda i: "usuário",
+        "nome_duas_palavras": lambda i: f"usuario {i}",
+        "email_dominio": lambda i: "email.com",
+    }
+    resultados = {}
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            store, logs = create_storage(backend, sqlite_path=f"{diretorio}/bench.db")
+            populate(store, tamanho)
+            sorteio = random.Random(42)
+            ids = [sorteio.randint(1, tamanho) for _ in range(repeticoes)]
+            resultados[str(tamanho)] = {
+                nome: bench(lambda i: store.search(consulta(ids[i]), 20), repeticoes)
+                for nome, consulta in consultas.items()
+            }
+            if backend == "memory":
+                indice = _bytes_alocados(lambda: _indice_de_busca(store))
+                resultados[str(tamanho)]["indice"] = {"bytes_por_usuario": round(indice / tamanho, 1)}
+            store.close()
+            logs.close()
+    return resultados
+
+
+def bench_log_queries(backend: str = "memory", total: int = 100_000, repeticoes: int = 2_000) -> Dict[str, dict]:
+    """Mede consultas de /logs por janela de tempo, ação e usuário (uma entrada por segundo)."""
+    base = datetime(2024, 1, 1)
+    acoes = ("CONSULTA",) * 6 + ("LOGIN", "LISTAGEM", "BUSCA", "CADASTRO")
+    sorteio = random.Random(42)
+    with tempfile.TemporaryDirectory() as diretorio:
+        store, logs = create_storage(backend, sqlite_path=f"{diretorio}/bench.db")
+        logs.add_many(
+            (sorteio.randint(1, 1000), acoes[i % len(acoes)], "", base + timedelta(seconds=i)) for i in range(total)
+        )
+        inicios = [base + timedelta(seconds=sorteio.randrange(total)) for _ in range(repeticoes)]
+        ids = [sorteio.randint(1, total) for _ in range(repeticoes)]
+        hora = timedelta(hours=1)
+        resultados = {
+            "janela_1h": bench(lambda i: logs.page(50, desde=inicios[i], ate=inicios[i] + hora), repeticoes),
+            "acao_janela_1h": bench(
+                lambda i: logs.page(50, acao="LOGIN", desde=inicios[i], ate=inicios[i] + hora), repeticoes),
+            "usuario_acao": bench(
+                lambda i: logs.page(50, usuario_id=i % 1000 + 1, acao="LOGIN", desde=inicios[i]), repeticoes),
+            "proxima_pagina": bench(
+                lambda i: logs.page(50, ids[i], acao="BUSCA"), repeticoes),
+            # Referência: o filtro feito varrendo o log inteiro
+            "varredura_acao_janela_1h": bench(lambda i: [
+                entrada for entrada in logs.iter_logs()
+                if entrada["acao"] == "LOGIN" and inicios[i] <= entrada["timestamp"] <= inicios[i] + hora
+            ][:50], max(1, repeticoes // 100)),
+        }
+        store.close()
+        logs.close()
+    return resultados
+
+
+def _indice_de_busca(store: InMemoryUserStore) -> UserSearchIndex:
+    indice = UserSearchIndex()
+    indice.load(store.values())
+    return indice
+
+
+def _reabrir_ms(diretorio: str) -> float:
+    inicio = time.perf_counter()
+    usuarios, _ = open_durable_storage(diretorio, intervalo_snapshot=0)
+    decorrido = (time.perf_counter() - inicio) * 1000
+    usuarios.persistencia.wal.close()  # sem snapshot final: o diretório fica como estava
+    return round(decorrido, 1)
+
+
+def bench_durable(tamanhos: Iterable[int], repeticoes: int = 2_000) -> Dict[str, dict]:
+    """Mede o tempo de inicialização (snapshot ou só WAL) e o custo de escrita por política de fsync."""
+    resultados = {}
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            usuarios, _ = open_durable_storage(diretorio, intervalo_snapshot=0)
+            populate(usuarios, tamanho)
+            usuarios.persistencia.wal.flush()
+            so_wal = _reabrir_ms(diretorio)
+            usuarios.persistencia.snapshot()
+            usuarios.persistencia.wal.close()
+            resultados[str(tamanho)] = {
+                "inicio_wal": {"inicio_ms": so_wal},
+                "inicio_snapshot": {"inicio_ms": _reabrir_ms(diretorio)},
+            }
+    for politica in ("off", "batch", "always"):
+        with tempfile.TemporaryDirectory() as diretorio:
+            usuarios, _ = open_durable_storage(diretorio, fsync=politica, intervalo_snapshot=0)
+            populate(usuarios, 100)
+            resultados[f"update_{politica}"] = bench(
+                lambda i: usuarios.update(1 + i % 100, idade=18 + i % 60), repeticoes)
+            usuarios.persistencia.wal.close()
+    return resultados
+
+
+def _sincrono(corrotina):
+    """Executa uma corrotina que não suspende (backend em memória) sem event loop."""
+    try:
+        corrotina.send(None)
+    except StopIteration as fim:
+        return fim.value
+    raise RuntimeError("a corrotina suspendeu; use um event loop")
+
+
+def bench_auth(repeticoes: int = 5_000, repeticoes_bcrypt: int = 5) -> Dict[str, dict]:
+    """Mede hashing/verificação de senha e emissão/validação de tokens."""
+    hashed = main.get_password_hash("senha123")
+    tokens = [main.create_access_token({"sub": f"user{i}"}, timedelta(minutes=5)) for i in range(repeticoes)]
+    token_fixo = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens[0])
+
+    def verify_sem_cache(i):
+        main.token_cache.clear()
+        _sincrono(main.verify_token(token_fixo))
+
+    resultados = {
+        "get_password_hash": bench(lambda i: main.get_password_hash("senha123"), repeticoes_bcrypt),
+        "verify_password": bench(lambda i: main.verify_password("senha123", hashed), repeticoes_bcrypt),
+        "create_access_token": bench(
+            lambda i: main.create_access_token({"sub": f"user{i}"}, timedelta(minutes=5)), repeticoes),
+        "verify_token_sem_cache": bench(verify_sem_cache, repeticoes),
+        "verify_token_com_cache": bench(lambda i: _sincrono(main.verify_token(token_fixo)), repeticoes, aquecimento=1),
+    }
+    main.token_cache.clear()
+    return resultados
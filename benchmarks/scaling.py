@@ -0,0 +1,80 @@
+"""
+Escalabilidade por número de workers.
+
+Sobe a API com ``uvicorn --workers N`` (backend SQLite, estado compartilhado
+no mesmo arquivo) para cada N pedido e dispara a mesma carga por HTTP,
+reportando o throughput de cada configuração e o ganho relativo a 1 worker.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.loadgen import run_load
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _aguardar(url: str, processo: subprocess.Popen, timeout: float = 30.0) -> None:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Servidor encerrou durante a inicialização (código {processo.returncode})")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {timeout}s")
+
+
+def run_server_load(workers: int, total: int, concorrencia: int, bcrypt_rounds: str = "4") -> dict:
+    """Executa a carga contra um servidor com ``workers`` processos."""
+    porta = _porta_livre()
+    with tempfile.TemporaryDirectory() as diretorio:
+        env = {
+            **os.environ,
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_PATH": os.path.join(diretorio, "bench.db"),
+            "LOGIN_RATE_LIMIT": "false",  # toda a carga parte do mesmo IP
+            "BCRYPT_ROUNDS": bcrypt_rounds,
+        }
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{porta}"
+            _aguardar(f"{base_url}/docs", processo)
+            return run_load(None, total=total, base_url=base_url, concorrencia=concorrencia)
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+
+def bench_scaling(workers: List[int], total: int = 2_000, concorrencia: int = 32,
+                  bcrypt_rounds: str = "4") -> dict:
+    """Throughput por número de workers e ganho em relação ao primeiro da lista."""
+    resultado = {}
+    base = None
+    for n in workers:
+        relatorio = run_server_load(n, total, concorrencia, bcrypt_rounds)
+        ops = relatorio["total"]["ops_por_segundo"]
+        base = base or ops
+        resultado[f"workers_{n}"] = {
+            "ops_por_segundo": ops,
+            "p95_ms": relatorio["total"]["p95_ms"],
+            "ganho": round(ops / base, 2) if base else 0.0,
+            "erros": sum(op["erros"] for op in relatorio["por_operacao"].values()),
+        }
+    return resultado
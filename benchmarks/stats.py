@@ -0,0 +1,44 @@
+"""
+Funções auxiliares de medição e sumarização de latências.
+"""
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence
+
+
+def percentile(amostras: Sequence[float], p: float) -> float:
+    """Percentil ``p`` (0-100) por interpolação linear; ``amostras`` já ordenadas."""
+    if not amostras:
+        return 0.0
+    posicao = (len(amostras) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(amostras) - 1)
+    fracao = posicao - inferior
+    return amostras[inferior] + (amostras[superior] - amostras[inferior]) * fracao
+
+
+def summarize(latencias: List[float], duracao_total: float) -> Dict[str, float]:
+    """Resumo de throughput e percentis (latências em segundos, saída em ms)."""
+    ordenadas = sorted(latencias)
+    total = len(ordenadas)
+    return {
+        "operacoes": total,
+        "ops_por_segundo": round(total / duracao_total, 2) if duracao_total > 0 else 0.0,
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 4) if ordenadas else 0.0,
+        "p50_ms": round(percentile(ordenadas, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordenadas, 95) * 1000, 4),
+        "p99_ms": round(percentile(ordenadas, 99) * 1000, 4),
+    }
+
+
+def bench(fn: Callable[[int], object], repeticoes: int, aquecimento: int = 0) -> Dict[str, float]:
+    """Mede ``fn(i)`` repetidas vezes, com ``aquecimento`` chamadas descartadas."""
+    for i in range(aquecimento):
+        fn(i)
+    latencias = []
+    inicio_total = time.perf_counter()
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        fn(i)
+        latencias.append(time.perf_counter() - inicio)
+    return summarize(latencias, time.perf_counter() - inicio_total)
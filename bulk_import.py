@@ -0,0 +1,193 @@
+"""
+Importação em lote de usuários a partir de NDJSON ou CSV em streaming.
+
+O corpo da requisição é lido em pedaços e processado linha a linha: nada é
+acumulado além do lote que está sendo gravado. Cada linha é validada com o
+mesmo schema do ``/cadastro``, a unicidade é checada nos índices do
+repositório e entre as próprias linhas do lote, e os hashes bcrypt de cada
+lote são calculados em paralelo no pool de hashing. O resultado de cada
+linha é devolvido assim que fica pronto. Com repositórios que fazem I/O
+(``store.bloqueante``), consultas e gravações saem do event loop.
+"""
+import asyncio
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from hash_pool import HashWorkerPool, PoolSaturatedError
+from storage import DuplicateKeyError, UserStore
+from storage.base import normalizar_chave
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse que não consome ``receive`` em paralelo.
+
+    A implementação padrão escuta o canal de recebimento para detectar
+    desconexões, o que "rouba" os pedaços do corpo da requisição. Aqui o
+    corpo continua sendo lido pelo gerador da própria resposta.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line: int = 64 * 1024) -> AsyncIterator[str]:
+    """Divide um fluxo de bytes em linhas de texto UTF-8, sem bufferizar o corpo inteiro."""
+    pendente = b""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        pendente += chunk
+        *linhas, pendente = pendente.split(b"\n")
+        for linha in linhas:
+            yield linha.decode("utf-8", errors="replace").rstrip("\r")
+        if len(pendente) > max_line:
+            raise ValueError(f"Linha excede o limite de {max_line} bytes")
+    if pendente:
+        yield pendente.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_records(linhas: AsyncIterator[str], formato: str) -> AsyncIterator[Tuple[int, object]]:
+    """Converte linhas NDJSON/CSV em ``(numero_da_linha, dados)``; linhas inválidas viram exceções."""
+    cabecalho: Optional[List[str]] = None
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        if not linha.strip():
+            continue
+        if formato == "csv":
+            valores = next(csv.reader([linha]))
+            if cabecalho is None:
+                cabecalho = [coluna.strip() for coluna in valores]
+                continue
+            dados = {coluna: valor for coluna, valor in zip(cabecalho, valores) if valor != ""}
+            yield numero, dados
+        else:
+            try:
+                yield numero, json.loads(linha)
+            except ValueError as exc:
+                yield numero, exc
+
+
+def _mensagem_de_validacao(exc: ValidationError) -> str:
+    erro = exc.errors()[0]
+    campo = ".".join(str(parte) for parte in erro.get("loc", ()))
+    return f"{campo}: {erro['msg']}" if campo else erro["msg"]
+
+
+class BulkImporter:
+    """Valida, verifica unicidade, calcula hashes em paralelo e grava usuários em lotes."""
+
+    def __init__(self, store: UserStore, hash_pool: HashWorkerPool, hash_fn: Callable[[str], str],
+                 schema: type, tamanho_lote: int = 32,
+                 on_created: Optional[Callable[[dict], None]] = None):
+        self.store = store
+        self.hash_pool = hash_pool
+        self.hash_fn = hash_fn
+        self.schema = schema
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.on_created = on_created
+        self.total = 0
+        self.criados = 0
+        self.erros = 0
+        self._usernames: Set[str] = set()
+        self._emails: Set[str] = set()
+
+    def _erro(self, numero: int, mensagem: str) -> dict:
+        self.erros += 1
+        return {"linha": numero, "status": "erro", "erro": mensagem}
+
+    def _validar(self, numero: int, dados) -> Tuple[Optional[BaseModel], Optional[dict]]:
+        """Valida uma linha; retorna o modelo ou o resultado de erro."""
+        if isinstance(dados, Exception):
+            return None, self._erro(numero, "JSON inválido")
+        if not isinstance(dados, dict):
+            return None, self._erro(numero, "Linha deve ser um objeto")
+        try:
+            user = self.schema(**dados)
+        except ValidationError as exc:
+            return None, self._erro(numero, _mensagem_de_validacao(exc))
+
+        chave_username = normalizar_chave(user.username)
+        chave_email = normalizar_chave(user.email)
+        if chave_username in self._usernames or self.store.get_by_username(user.username) is not None:
+            return None, self._erro(numero, "Username já cadastrado.")
+        if chave_email in self._emails or self.store.get_by_email(user.email) is not None:
+            return None, self._erro(numero, "Email já cadastrado.")
+        self._usernames.add(chave_username)
+        self._emails.add(chave_email)
+        return user, None
+
+    async def _hash(self, senha: str) -> str:
+        """Calcula o hash no pool, aguardando vaga quando ele estiver saturado."""
+        espera = 0.005
+        while True:
+            try:
+                return await self.hash_pool.run(self.hash_fn, senha)
+            except PoolSaturatedError:
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 0.2)
+
+    async def _no_store(self, fn, *args):
+        """Executa ``fn`` no threadpool se o repositório faz I/O bloqueante."""
+        if self.store.bloqueante:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def _gravar(self, lote: List[Tuple[int, BaseModel]]) -> List[dict]:
+        hashes = await asyncio.gather(*(self._hash(user.password) for _, user in lote))
+        return await self._no_store(self._inserir, lote, hashes)
+
+    def _inserir(self, lote: List[Tuple[int, BaseModel]], hashes: List[str]) -> List[dict]:
+        resultados = []
+        for (numero, user), hashed_password in zip(lote, hashes):
+            try:
+                usuario = self.store.insert({
+                    "username": user.username,
+                    "email": user.email,
+                    "nome_completo": user.nome_completo,
+                    "idade": user.idade,
+                    "hashed_password": hashed_password,
+                    "data_criacao": datetime.now(),
+                    "ultimo_login": None,
+                })
+            except DuplicateKeyError as exc:
+                # Cadastro concorrente entre a validação e a gravação
+                resultados.append(self._erro(numero, f"{exc.campo.capitalize()} já cadastrado."))
+                continue
+            self.criados += 1
+            if self.on_created is not None:
+                self.on_created(usuario)
+            resultados.append({"linha": numero, "status": "criado", "id": usuario.id,
+                               "username": usuario.username})
+        return resultados
+
+    async def run(self, registros: AsyncIterator[Tuple[int, object]]) -> AsyncIterator[dict]:
+        """Processa os registros, produzindo um resultado por linha e um resumo final."""
+        lote: List[Tuple[int, BaseModel]] = []
+        try:
+            async for numero, dados in registros:
+                self.total += 1
+                user, erro = await self._no_store(self._validar, numero, dados)
+                if erro is not None:
+                    yield erro
+                    continue
+                lote.append((numero, user))
+                if len(lote) >= self.tamanho_lote:
+                    for resultado in await self._gravar(lote):
+                        yield resultado
+                    lote = []
+            if lote:
+                for resultado in await self._gravar(lote):
+                    yield resultado
+        except ValueError as exc:
+            # Corpo malformado (ex.: linha grande demais): interrompe e informa no resumo
+            yield {"status": "erro", "erro": str(exc)}
+        yield {"resumo": {"total": self.total, "criados": self.criados, "erros": self.erros}}
+
@@ -0,0 +1,176 @@
+"""
+Caches em memória limitados (LRU) com expiração opcional por entrada.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set
+
+from storage.base import normalizar_chave
+
+
+class LRUCache:
+    """Cache LRU limitado e seguro entre threads, com expiração por entrada."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def get(self, chave: Hashable):
+        """Retorna o valor em cache ou ``None`` (contabilizando hit/miss)."""
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None:
+                valor, expira_em = item
+                if expira_em is None or time.time() < expira_em:
+                    self._dados.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                self._remover(chave)
+            self.misses += 1
+            return None
+
+    def set(self, chave: Hashable, valor, expira_em: Optional[float] = None) -> None:
+        """Armazena ``valor`` até o instante ``expira_em`` (epoch), se informado."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._inserir(chave, valor, expira_em)
+
+    def _inserir(self, chave: Hashable, valor, expira_em: Optional[float]) -> None:
+        """Insere e aplica o limite de tamanho (chamar com o lock adquirido)."""
+        if chave in self._dados:
+            self._remover(chave)
+        self._dados[chave] = (valor, expira_em)
+        self._ao_inserir(chave, valor)
+        while len(self._dados) > self.maxsize:
+            antiga = next(iter(self._dados))
+            self._remover(antiga)
+            self.evictions += 1
+
+    def pop(self, chave: Hashable) -> None:
+        """Remove a entrada, se existir."""
+        with self._lock:
+            if chave in self._dados:
+                self._remover(chave)
+
+    def _remover(self, chave: Hashable) -> None:
+        """Remove uma entrada (chamar com o lock adquirido)."""
+        valor, _ = self._dados.pop(chave)
+        self._ao_remover(chave, valor)
+
+    def _ao_inserir(self, chave: Hashable, valor) -> None:
+        """Gancho para subclasses manterem índices auxiliares."""
+
+    def _ao_remover(self, chave: Hashable, valor) -> None:
+        """Gancho para subclasses manterem índices auxiliares."""
+
+    def clear(self) -> None:
+        with self._lock:
+            for chave in list(self._dados):
+                self._remover(chave)
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "tamanho": len(self._dados),
+                "capacidade": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / consultas, 4) if consultas else 0.0,
+            }
+
+
+class ClaimsCache(LRUCache):
+    """Cache de claims de JWT já validados, indexado também pelo ``sub``.
+
+    O valor armazenado é a tupla ``(sub, jti, iat)`` do token; o índice
+    reverso por ``sub`` permite descartar todos os tokens de um usuário de uma
+    vez. ``jti``/``iat`` ficam em cache para a checagem de revogação, que é
+    feita a cada uso (a revogação pode vir de outro worker).
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._por_sub: Dict[str, Set[Hashable]] = {}
+
+    def _ao_inserir(self, chave: Hashable, valor: tuple) -> None:
+        self._por_sub.setdefault(valor[0], set()).add(chave)
+
+    def _ao_remover(self, chave: Hashable, valor: tuple) -> None:
+        chaves = self._por_sub.get(valor[0])
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del self._por_sub[valor[0]]
+
+    def invalidate_subject(self, sub: str) -> int:
+        """Remove todos os tokens em cache do usuário ``sub``."""
+        with self._lock:
+            chaves = list(self._por_sub.get(sub, ()))
+            for chave in chaves:
+                self._remover(chave)
+            return len(chaves)
+
+
+class ProfileCache(LRUCache):
+    """Perfis já serializados (JSON de ``UserResponse``) por id, indexados também pelo username.
+
+    O valor armazenado é a tupla ``(username_key, corpo, etag)``. Cada
+    invalidação incrementa ``geracao``; ``put`` recebe a geração lida antes
+    da consulta ao repositório e descarta o perfil se houve invalidação nesse
+    intervalo, para que uma leitura concorrente não regrave dados antigos.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._por_username: Dict[str, Hashable] = {}
+        self.geracao = 0
+
+    def _ao_inserir(self, chave: Hashable, valor: tuple) -> None:
+        self._por_username[valor[0]] = chave
+
+    def _ao_remover(self, chave: Hashable, valor: tuple) -> None:
+        if self._por_username.get(valor[0]) == chave:
+            del self._por_username[valor[0]]
+
+    def get_by_username(self, username: str):
+        """Busca pelo username (sem diferenciar caixa)."""
+        chave = self._por_username.get(normalizar_chave(username))
+        if chave is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get(chave)
+
+    def put(self, chave: Hashable, username: str, corpo: bytes, etag: str, geracao: int,
+            expira_em: Optional[float] = None) -> bool:
+        """Armazena o perfil se nada foi invalidado desde ``geracao``."""
+        if self.maxsize <= 0:
+            return False
+        with self._lock:
+            if geracao != self.geracao:
+                return False
+            self._inserir(chave, (normalizar_chave(username), corpo, etag), expira_em)
+            return True
+
+    def invalidate(self, chave: Hashable) -> None:
+        """Remove o perfil do usuário após qualquer alteração."""
+        with self._lock:
+            self.geracao += 1
+            if chave in self._dados:
+                self._remover(chave)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.geracao += 1
+        super().clear()
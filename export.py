@@ -0,0 +1,76 @@
+"""
+Serialização em streaming para os endpoints de exportação.
+
+Os geradores consomem os iteradores paginados dos repositórios e produzem
+pedaços de texto (NDJSON ou CSV), agrupados para reduzir o número de
+escritas no socket; a compressão gzip, quando pedida, é aplicada pedaço a
+pedaço. A memória usada independe do tamanho da tabela exportada.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+
+CAMPOS_USUARIO = ("id", "username", "email", "nome_completo", "idade", "data_criacao", "ultimo_login")
+CAMPOS_LOG = ("id", "timestamp", "usuario_id", "acao", "detalhes")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+TAMANHO_PEDACO = 64 * 1024
+
+
+def _valor(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def iter_ndjson(registros: Iterable[dict], campos: Sequence[str]) -> Iterator[str]:
+    """Gera linhas NDJSON apenas com os ``campos`` informados."""
+    for registro in registros:
+        yield json.dumps({campo: _valor(registro.get(campo)) for campo in campos}, ensure_ascii=False) + "\n"
+
+
+def iter_csv(registros: Iterable[dict], campos: Sequence[str]) -> Iterator[str]:
+    """Gera o cabeçalho e as linhas CSV com os ``campos`` informados."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(campos)
+    for registro in registros:
+        escritor.writerow(["" if registro.get(campo) is None else _valor(registro.get(campo)) for campo in campos])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def serialize(registros: Iterable[dict], campos: Sequence[str], formato: str) -> Iterator[str]:
+    """Seleciona o serializador do formato pedido."""
+    if formato == "csv":
+        return iter_csv(registros, campos)
+    return iter_ndjson(registros, campos)
+
+
+def chunked(linhas: Iterable[str], tamanho: int = TAMANHO_PEDACO) -> Iterator[bytes]:
+    """Agrupa linhas em pedaços de aproximadamente ``tamanho`` bytes."""
+    partes, acumulado = [], 0
+    for linha in linhas:
+        dados = linha.encode("utf-8")
+        partes.append(dados)
+        acumulado += len(dados)
+        if acumulado >= tamanho:
+            yield b"".join(partes)
+            partes, acumulado = [], 0
+    if partes:
+        yield b"".join(partes)
+
+
+def gzip_stream(pedacos: Iterable[bytes], nivel: int = 6) -> Iterator[bytes]:
+    """Comprime um fluxo de bytes em formato gzip, pedaço a pedaço."""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+    for pedaco in pedacos:
+        comprimido = compressor.compress(pedaco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
@@ -0,0 +1,99 @@
+"""
+Pool de workers limitado para o trabalho de hashing de senhas (bcrypt).
+
+O bcrypt consome dezenas a centenas de milissegundos de CPU por chamada.
+Executá-lo fora do event loop, em um pool com fila limitada, evita que picos
+de login degradem os demais endpoints: quando a fila enche, a requisição é
+rejeitada imediatamente em vez de aguardar indefinidamente.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class PoolSaturatedError(RuntimeError):
+    """Erro lançado quando a fila do pool de hashing está cheia."""
+
+
+class HashWorkerPool:
+    """Executa funções de hashing em um pool de threads ou processos com fila limitada."""
+
+    def __init__(self, max_workers: int, max_pending: int, kind: str = "thread",
+                 on_latency: Optional[Callable[[float], None]] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de pool desconhecido: {kind}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self.on_latency = on_latency
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._submetidos = 0
+        self._rejeitados = 0
+        self._concluidos = 0
+        self._latencia_total = 0.0
+        self._latencia_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        """Cria o executor sob demanda (evita subir processos sem necessidade)."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix="hash-worker",
+                        )
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Executa ``fn(*args)`` no pool; lança PoolSaturatedError se a fila estiver cheia."""
+        with self._lock:
+            if self._pendentes >= self.max_workers + self.max_pending:
+                self._rejeitados += 1
+                raise PoolSaturatedError("Pool de hashing saturado")
+            self._pendentes += 1
+            self._submetidos += 1
+
+        inicio = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            latencia = time.perf_counter() - inicio
+            with self._lock:
+                self._pendentes -= 1
+                self._concluidos += 1
+                self._latencia_total += latencia
+                self._latencia_max = max(self._latencia_max, latencia)
+            if self.on_latency is not None:
+                self.on_latency(latencia)
+
+    def stats(self) -> dict:
+        """Retorna profundidade da fila e latências acumuladas do pool."""
+        with self._lock:
+            media = self._latencia_total / self._concluidos if self._concluidos else 0.0
+            return {
+                "tipo": self.kind,
+                "workers": self.max_workers,
+                "fila_maxima": self.max_pending,
+                "em_execucao": min(self._pendentes, self.max_workers),
+                "fila": max(0, self._pendentes - self.max_workers),
+                "submetidos": self._submetidos,
+                "concluidos": self._concluidos,
+                "rejeitados": self._rejeitados,
+                "latencia_media_ms": round(media * 1000, 3),
+                "latencia_max_ms": round(self._latencia_max * 1000, 3),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Encerra o executor subjacente, se já tiver sido criado."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
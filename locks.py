@@ -0,0 +1,46 @@
+"""
+Locks assíncronos por chave.
+
+Os handlers rodam no event loop; operações que verificam e depois gravam
+(ex.: unicidade de username/email no cadastro, com um ``await`` do hash no
+meio) precisam de exclusão mútua entre requisições que disputam a mesma
+chave, sem serializar as demais. ``KeyedLock`` cria um ``asyncio.Lock`` por
+chave sob demanda e o descarta quando ninguém mais o usa, então a memória
+cresce só com as chaves em disputa no momento.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLock:
+    """Exclusão mútua assíncrona por chave (dentro de um processo)."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}  # chave -> [asyncio.Lock, usuários]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *chaves: Hashable) -> AsyncIterator[None]:
+        """Adquire os locks de todas as chaves (em ordem fixa, evitando deadlock)."""
+        ordenadas = sorted(set(chaves))
+        registradas: List[Hashable] = []
+        adquiridas: List[Hashable] = []
+        try:
+            for chave in ordenadas:
+                entrada = self._locks.setdefault(chave, [asyncio.Lock(), 0])
+                entrada[1] += 1
+                registradas.append(chave)
+                await entrada[0].acquire()
+                adquiridas.append(chave)
+            yield
+        finally:
+            for chave in adquiridas:
+                self._locks[chave][0].release()
+            for chave in registradas:
+                entrada = self._locks[chave]
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    del self._locks[chave]
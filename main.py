@@ -1,19 +1,70 @@
-from fastapi import FastAPI, HTTPException, status, Depends
+import base64
+import hashlib
+import itertools
+import json
+import math
+import os
+import secrets
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import BackgroundTasks, FastAPI, HTTPException, status, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, validator, EmailStr
-from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, validator, EmailStr
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from jose import jwt, JWTError
 
+from audit import AuditLogWriter
+from cache import ClaimsCache, ProfileCache
+from hash_pool import HashWorkerPool, PoolSaturatedError
+from locks import KeyedLock
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, SlidingWindowCounter
+from passwords import build_password_context, resolve_bcrypt_rounds, warm_up_context
+from rate_limit import InMemoryTokenBucketStore, LoginRateLimiter, SQLiteTokenBucketStore
+from serialization import (
+    FastJSONResponse,
+    dumps,
+    etag_confere,
+    etag_para,
+    usuario_para_dict,
+    usuarios_para_lista,
+)
+from storage import DuplicateKeyError, DurableUserStore, create_storage
+from storage.base import ORDEM_CRIACAO, ORDEM_ID, ORDEM_IDADE, chave_de_ordenacao, normalizar_chave, ordem_para_filtros
+from storage.search import CAMPOS_BUSCA
+from tokens import (
+    InMemoryRefreshTokenStore,
+    InMemoryRevocationList,
+    SQLiteRefreshTokenStore,
+    SQLiteRevocationList,
+)
+
 # --- Configuração Inicial ---
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Aquece as dependências, inicia os serviços em background e os encerra de forma limpa."""
+    if STARTUP_WARMUP:
+        await warm_up()
+    await audit_writer.start()
+    yield
+    await audit_writer.stop()
+    hash_pool.shutdown(wait=False)
+    if isinstance(db_usuarios, DurableUserStore):
+        # Grava os logs pendentes, um snapshot final e fecha o WAL
+        await run_in_threadpool(db_usuarios.close)
+
 app = FastAPI(
     title="API de Cadastro Avançada",
     description="API completa com autenticação JWT, perfis de usuário e logs de atividade.",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -23,23 +74,203 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Contexto para hashing de senhas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Contexto para hashing de senhas. Custo do bcrypt: BCRYPT_ROUNDS fixo, ou
+# calibrado na inicialização para BCRYPT_TARGET_MS (nunca abaixo de
+# BCRYPT_MIN_ROUNDS), ou o padrão 12. Hashes com custo menor são refeitos no login.
+BCRYPT_ROUNDS = resolve_bcrypt_rounds(
+    os.getenv("BCRYPT_ROUNDS"),
+    alvo_ms=float(os.getenv("BCRYPT_TARGET_MS", "0")),
+    minimo=int(os.getenv("BCRYPT_MIN_ROUNDS", "10")),
+)
+pwd_context = build_password_context(BCRYPT_ROUNDS)
 
 # Configurações JWT
 SECRET_KEY = "sua-chave-secreta-super-segura-para-producao-mude-isso"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Pool de hashing (bcrypt roda fora do event loop, com fila limitada)
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread")  # "thread" ou "process"
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASH_POOL_MAX_PENDING = int(os.getenv("HASH_POOL_MAX_PENDING", "64"))
+HASH_POOL_RETRY_AFTER = int(os.getenv("HASH_POOL_RETRY_AFTER", "1"))
+
+# Limites de tentativas de login (token buckets por IP e por username)
+LOGIN_RATE_LIMIT = os.getenv("LOGIN_RATE_LIMIT", "true").lower() in ("1", "true")
+LOGIN_RATE_IP_BURST = int(os.getenv("LOGIN_RATE_IP_BURST", "30"))
+LOGIN_RATE_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", "30"))
+LOGIN_RATE_USER_BURST = int(os.getenv("LOGIN_RATE_USER_BURST", "10"))
+LOGIN_RATE_USER_PER_MINUTE = float(os.getenv("LOGIN_RATE_USER_PER_MINUTE", "5"))
+LOGIN_RATE_MAX_KEYS = int(os.getenv("LOGIN_RATE_MAX_KEYS", "100000"))
+
+# Importação em lote: linhas por lote de hashing paralelo
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", str(max(8, HASH_POOL_WORKERS * 2))))
+
+# Retenção dos logs de atividade
+LOG_MAX_POR_USUARIO = int(os.getenv("LOG_MAX_POR_USUARIO", "1000"))
+LOG_MAX_TOTAL = int(os.getenv("LOG_MAX_TOTAL", "100000"))
+
+# Gravação assíncrona dos logs de auditoria
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "50"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_OVERFLOW = os.getenv("LOG_OVERFLOW", "drop")  # "drop" ou "block"
+
+# Serialização rápida: endpoints de leitura devolvem JSON direto dos registros,
+# sem a revalidação do response_model (orjson quando instalado)
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "false").lower() in ("1", "true")
+
+# Backend de armazenamento: "memory" (padrão) ou "sqlite" (compartilhado entre workers)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "cadastro.db")
+
+# Cache de perfis serializados (/usuario/{id} e /me); 0 desativa. Com vários
+# workers a invalidação é local ao processo, então as entradas expiram após
+# PROFILE_CACHE_TTL segundos (0 = sem expiração, padrão no backend em memória)
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "2" if STORAGE_BACKEND == "sqlite" else "0"))
+
+# Máximo de ids/usernames por chamada de POST /usuarios/batch
+BATCH_LOOKUP_MAX = int(os.getenv("BATCH_LOOKUP_MAX", "500"))
+
+# Usernames (separados por vírgula) autorizados a consultar logs de outros usuários
+LOG_ADMINS = {normalizar_chave(nome.strip()) for nome in os.getenv("LOG_ADMINS", "").split(",") if nome.strip()}
+
+# Durabilidade opcional do backend em memória: WAL binário + snapshots no diretório
+# informado (vazio = desativada). WAL_FSYNC: "always", "batch" (padrão) ou "off"
+PERSISTENCE_DIR = os.getenv("PERSISTENCE_DIR", "")
+WAL_FSYNC = os.getenv("WAL_FSYNC", "batch")
+WAL_FLUSH_INTERVAL_MS = int(os.getenv("WAL_FLUSH_INTERVAL_MS", "10"))
+SNAPSHOT_INTERVAL_S = int(os.getenv("SNAPSHOT_INTERVAL_S", "300"))
+
+# Aquecimento na inicialização (backend do bcrypt, JWT, esquema OpenAPI, pool de
+# hashing), para a primeira requisição após um deploy não pagar esse custo
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true")
+
+# Processos do uvicorn ao executar este módulo; mais de um exige o backend sqlite
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# --- Métricas (expostas em /metrics no formato Prometheus) ---
+metrics_registry = MetricsRegistry()
+http_requests_total = metrics_registry.counter(
+    "http_requests_total", "Requisições HTTP por rota, método e status.", ("method", "route", "status"))
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.", ("method", "route"))
+function_duration = metrics_registry.histogram(
+    "app_function_duration_seconds", "Duração das funções auxiliares críticas.", ("function",))
+password_rehash_total = metrics_registry.counter(
+    "password_rehash_total", "Hashes de senha refeitos no login por mudança de custo.")
+hash_pool_latency = metrics_registry.histogram(
+    "hash_pool_latency_seconds", "Latência (fila + execução) das tarefas do pool de hashing.")
+startup_warmup_seconds = metrics_registry.gauge(
+    "app_startup_warmup_seconds", "Duração do aquecimento feito na inicialização.")
+metrics_registry.gauge("app_usuarios", "Usuários cadastrados.", callback=lambda: len(db_usuarios))
+metrics_registry.gauge("app_logs", "Entradas de log retidas.", callback=lambda: len(db_logs))
+metrics_registry.gauge("hash_pool_queue_depth", "Tarefas aguardando worker no pool de hashing.",
+                       callback=lambda: hash_pool.stats()["fila"])
+metrics_registry.gauge("hash_pool_in_flight", "Tarefas em execução no pool de hashing.",
+                       callback=lambda: hash_pool.stats()["em_execucao"])
+metrics_registry.counter_func("hash_pool_rejected_total", "Tarefas rejeitadas por pool saturado.",
+                              callback=lambda: hash_pool.stats()["rejeitados"])
+metrics_registry.gauge("audit_log_pending", "Entradas de log aguardando gravação.",
+                       callback=lambda: audit_writer.stats()["pendentes"])
+metrics_registry.counter_func("audit_log_enqueued_total", "Entradas de log enfileiradas.",
+                              callback=lambda: audit_writer.stats()["enfileirados"])
+metrics_registry.counter_func("audit_log_flushed_total", "Entradas de log gravadas.",
+                              callback=lambda: audit_writer.stats()["gravados"])
+metrics_registry.counter_func("audit_log_dropped_total", "Entradas de log descartadas por fila cheia.",
+                              callback=lambda: audit_writer.stats()["descartados"])
+metrics_registry.counter_func("audit_log_failed_batches_total", "Lotes de log cuja gravação falhou.",
+                              callback=lambda: audit_writer.stats()["falhas"])
+metrics_registry.counter_func("token_cache_hits_total", "Tokens servidos pelo cache de claims.",
+                              callback=lambda: token_cache.hits)
+metrics_registry.counter_func("token_cache_misses_total", "Tokens decodificados por falta no cache.",
+                              callback=lambda: token_cache.misses)
+metrics_registry.counter_func("profile_cache_hits_total", "Perfis servidos pelo cache de perfis.",
+                              callback=lambda: profile_cache.hits)
+metrics_registry.counter_func("profile_cache_misses_total", "Perfis montados a partir do repositório.",
+                              callback=lambda: profile_cache.misses)
+metrics_registry.counter_func("login_throttled_total", "Tentativas de login recusadas pelo limitador.",
+                              callback=lambda: login_limiter.bloqueados)
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=http_requests_total,
+    request_duration=http_request_duration,
+    ignorar={"/metrics"},
+)
 
 # Autenticação
 security = HTTPBearer()
 
-# "Banco de dados" em memória expandido
-db_usuarios = {}
-db_logs = []
-user_id_counter = 1
+# Claims de tokens já validados, mantidos até o "exp" de cada token
+token_cache = ClaimsCache(maxsize=TOKEN_CACHE_SIZE)
+
+# Perfis já serializados, invalidados a cada alteração do usuário
+profile_cache = ProfileCache(maxsize=PROFILE_CACHE_SIZE)
+
+# Cadastros em andamento por username/email (exclusão mútua no event loop)
+cadastro_locks = KeyedLock()
+
+hash_pool = HashWorkerPool(
+    max_workers=HASH_POOL_WORKERS,
+    max_pending=HASH_POOL_MAX_PENDING,
+    kind=HASH_POOL_KIND,
+    on_latency=hash_pool_latency.observe,
+)
+
+# Logins recentes em janelas deslizantes (buckets de 1s no último minuto, de 1min na última hora)
+logins_ultimo_minuto = SlidingWindowCounter(janela=60, resolucao=1)
+logins_ultima_hora = SlidingWindowCounter(janela=3600, resolucao=60)
+
+# "Banco de dados": repositórios de usuários e logs do backend configurado.
+# Usuários têm índices únicos por username/email (buscas O(1)); logs têm
+# buffer circular por usuário e limite global de retenção.
+db_usuarios, db_logs = create_storage(
+    STORAGE_BACKEND,
+    sqlite_path=SQLITE_PATH,
+    log_max_por_usuario=LOG_MAX_POR_USUARIO,
+    log_max_total=LOG_MAX_TOTAL,
+    persistencia_dir=PERSISTENCE_DIR,
+    wal_fsync=WAL_FSYNC,
+    wal_intervalo=WAL_FLUSH_INTERVAL_MS / 1000,
+    snapshot_intervalo=SNAPSHOT_INTERVAL_S,
+)
+
+# Refresh tokens opacos (rotacionados a cada uso), revogação de access tokens
+# e buckets do limitador de login. Com o backend SQLite ficam no mesmo
+# arquivo dos usuários, compartilhados entre workers.
+if STORAGE_BACKEND == "sqlite":
+    refresh_tokens = SQLiteRefreshTokenStore(db_usuarios.db, ttl_segundos=REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    revoked_tokens = SQLiteRevocationList(db_usuarios.db)
+    login_buckets = SQLiteTokenBucketStore(db_usuarios.db)
+else:
+    refresh_tokens = InMemoryRefreshTokenStore(ttl_segundos=REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    revoked_tokens = InMemoryRevocationList()
+    login_buckets = InMemoryTokenBucketStore(max_chaves=LOGIN_RATE_MAX_KEYS)
+
+login_limiter = LoginRateLimiter(
+    login_buckets,
+    ip_capacidade=LOGIN_RATE_IP_BURST,
+    ip_por_minuto=LOGIN_RATE_IP_PER_MINUTE,
+    usuario_capacidade=LOGIN_RATE_USER_BURST,
+    usuario_por_minuto=LOGIN_RATE_USER_PER_MINUTE,
+    ativo=LOGIN_RATE_LIMIT,
+)
+
+# Endpoints apenas enfileiram logs; a gravação ocorre em lotes em background
+audit_writer = AuditLogWriter(
+    db_logs,
+    batch_size=LOG_BATCH_SIZE,
+    flush_interval=LOG_FLUSH_INTERVAL_MS / 1000,
+    max_queue=LOG_QUEUE_MAX,
+    overflow=LOG_OVERFLOW,
+)
 
 # --- Modelos (Schemas Pydantic) Expandidos ---
 
@@ -72,7 +303,10 @@ class UserCreate(BaseModel):
         return v
 
 # Modelo para dados de saída do usuário
+# (lido direto dos atributos do UserRecord, sem dicionário intermediário)
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     username: str
     email: str
@@ -97,6 +331,26 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
+
+# Modelo para renovação de token
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# Modelo para logout (refresh token opcional a ser revogado junto)
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+# Modelos para consulta de usuários em lote
+class UserBatchRequest(BaseModel):
+    ids: List[int] = []
+    usernames: List[str] = []
+
+class UserBatchResponse(BaseModel):
+    usuarios: List[UserResponse]
+    ids_nao_encontrados: List[int]
+    usernames_nao_encontrados: List[str]
 
 # Modelo para logs
 class LogEntry(BaseModel):
@@ -109,14 +363,59 @@ class LogEntry(BaseModel):
 
 # --- Funções Auxiliares ---
 
+@function_duration.time("verify_password")
 def verify_password(plain_password, hashed_password):
     """Verifica se a senha em texto plano corresponde ao hash."""
     return pwd_context.verify(plain_password, hashed_password)
 
+@function_duration.time("get_password_hash")
 def get_password_hash(password):
     """Gera hash da senha."""
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Indica se o hash foi gerado com um custo menor que o configurado."""
+    return pwd_context.needs_update(hashed_password)
+
+async def rehash_password(user_id: int, plain_password: str, hash_antigo: str) -> None:
+    """Refaz o hash com o custo atual (em background, após o login responder)."""
+    try:
+        novo_hash = await hash_pool.run(get_password_hash, plain_password)
+    except PoolSaturatedError:
+        return  # fica para o próximo login
+    usuario = await run_storage(db_usuarios.get, user_id)
+    # Só grava se a senha não mudou enquanto o novo hash era calculado
+    if usuario is not None and usuario.hashed_password == hash_antigo:
+        await run_storage(db_usuarios.update, user_id, hashed_password=novo_hash)
+        password_rehash_total.inc()
+
+def verify_dummy_password(plain_password: str) -> bool:
+    """Verifica contra um hash fictício, igualando o tempo de resposta para usuários inexistentes."""
+    pwd_context.dummy_verify()
+    return False
+
+async def run_storage(fn, *args, **kwargs):
+    """
+    Executa uma operação de armazenamento (repositórios, tokens, limitador).
+    No backend em memória (estruturas O(1), sem I/O) roda direto no event loop;
+    no sqlite vai para o threadpool, sem bloquear as demais requisições.
+    """
+    if db_usuarios.bloqueante:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+async def run_in_hash_pool(fn, *args):
+    """Executa hashing/verificação no pool; responde 503 se ele estiver saturado."""
+    try:
+        return await hash_pool.run(fn, *args)
+    except PoolSaturatedError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": str(HASH_POOL_RETRY_AFTER)},
+        )
+
+@function_duration.time("create_access_token")
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria token JWT."""
     to_encode = data.copy()
@@ -124,7 +423,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti identifica o token na lista de revogação; iat permite revogar tudo que foi emitido até um instante
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": secrets.token_hex(8)})
     try:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
@@ -132,167 +432,492 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         # Fallback simples se JWT não estiver disponível
         return f"simple_token_{data.get('sub', 'unknown')}"
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verifica token JWT."""
+def aquecer_senhas() -> None:
+    """Aquece o bcrypt no worker do pool (função do módulo: serializável para o pool de processos)."""
+    warm_up_context(pwd_context)
+
+async def warm_up() -> float:
+    """
+    Executa na inicialização o que, de outro modo, ficaria para a primeira
+    requisição: backend do bcrypt e workers do pool de hashing, um ciclo de
+    JWT e o esquema OpenAPI. Retorna a duração em segundos.
+    """
+    inicio = time.perf_counter()
+    await hash_pool.run(aquecer_senhas)
+    token = create_access_token({"sub": "aquecimento"}, timedelta(minutes=1))
+    jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    app.openapi()
+    duracao = time.perf_counter() - inicio
+    startup_warmup_seconds.set(duracao)
+    return duracao
+
+@function_duration.time("verify_token")
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verifica token JWT (com cache dos claims já validados)."""
     token = credentials.credentials
+    chave_cache = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    claims = token_cache.get(chave_cache)
     try:
-        # Tentativa de decodificar JWT
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Token inválido")
+        if claims is None:
+            # Tentativa de decodificar JWT
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub") is None:
+                raise HTTPException(status_code=401, detail="Token inválido")
+            claims = (payload["sub"], payload.get("jti"), payload.get("iat"))
+            if "exp" in payload:
+                token_cache.set(chave_cache, claims, expira_em=payload["exp"])
+        # Checada a cada uso, mesmo com cache: a revogação pode ter vindo de outro worker
+        username, jti, emitido_em = claims
+        if await run_storage(revoked_tokens.is_revoked, jti, username, emitido_em):
+            raise HTTPException(status_code=401, detail="Token revogado")
         return username
     except JWTError:
         # Fallback simples - verifica se token segue padrão simples
         if token.startswith("simple_token_"):
             username = token.replace("simple_token_", "")
             # Verifica se usuário existe
-            for user in db_usuarios.values():
-                if user["username"] == username:
-                    return username
+            if await run_storage(db_usuarios.get_by_username, username) is not None:
+                return username
         raise HTTPException(status_code=401, detail="Token inválido")
 
-def add_log(usuario_id: int, acao: str, detalhes: str = ""):
-    """Adiciona entrada no log."""
-    log_entry = {
-        "id": len(db_logs) + 1,
-        "timestamp": datetime.now(),
-        "usuario_id": usuario_id,
-        "acao": acao,
-        "detalhes": detalhes
-    }
-    db_logs.append(log_entry)
+ORDEM_LOGS = "logs"  # cursor de /logs: ID da última entrada da página
+
+# Tipos da chave de cada ordenação (cursores de busca são validados no endpoint)
+TIPOS_CURSOR = {
+    ORDEM_ID: (int,),
+    ORDEM_IDADE: (int, int),
+    ORDEM_CRIACAO: (datetime, int),
+    ORDEM_LOGS: (int,),
+}
+
+def encode_cursor(ordem: str, chave: tuple) -> str:
+    """Codifica a posição da última linha da página em um cursor opaco."""
+    valores = [v.isoformat() if isinstance(v, datetime) else v for v in chave]
+    bruto = json.dumps([ordem, valores], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, tuple]:
+    """Decodifica um cursor gerado por ``encode_cursor``."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ordem, valores = json.loads(bruto)
+        if ordem == ORDEM_CRIACAO:
+            valores[0] = datetime.fromisoformat(valores[0])
+        tipos = TIPOS_CURSOR.get(ordem)
+        if tipos is not None and (len(valores) != len(tipos) or not all(
+                isinstance(valor, tipo) and not isinstance(valor, bool) for valor, tipo in zip(valores, tipos))):
+            raise ValueError(ordem)
+        return ordem, tuple(valores)
+    except (ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+def to_local_naive(valor: Optional[datetime]) -> Optional[datetime]:
+    """Converte datetimes com fuso para o horário local sem fuso (como os dados armazenados)."""
+    if valor is None or valor.tzinfo is None:
+        return valor
+    return valor.astimezone().replace(tzinfo=None)
+
+def require_log_admin(current_user: str) -> None:
+    """Barra (403) quem não está em LOG_ADMINS de ler logs de outros usuários."""
+    if normalizar_chave(current_user) not in LOG_ADMINS:
+        raise HTTPException(status_code=403, detail="Acesso restrito aos administradores de logs.")
+
+@function_duration.time("add_log")
+async def add_log(usuario_id: int, acao: str, detalhes: str = ""):
+    """Adiciona entrada no log (enfileirada para gravação em lote)."""
+    await audit_writer.put(usuario_id, acao, detalhes)
 
 
 # --- Endpoints da API Expandidos ---
 
 @app.post("/cadastro", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def cadastrar_usuario(user: UserCreate):
+async def cadastrar_usuario(user: UserCreate):
     """
     Cadastra um novo usuário no sistema.
     - Verifica se username e email já existem
     - Armazena senha de forma segura (hash)
     - Registra data de criação
     """
-    global user_id_counter
-    
-    # Verificar se username já existe
-    for existing_user in db_usuarios.values():
-        if existing_user["username"] == user.username:
+    # Cadastros simultâneos do mesmo username/email esperam um pelo outro, e o
+    # segundo recebe 400 sem pagar o bcrypt (entre workers vale o índice único)
+    async with cadastro_locks.hold(("username", normalizar_chave(user.username)),
+                                   ("email", normalizar_chave(user.email))):
+        # Verificar se username já existe
+        if await run_storage(db_usuarios.get_by_username, user.username) is not None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username já cadastrado."
             )
-    
-    # Verificar se email já existe
-    for existing_user in db_usuarios.values():
-        if existing_user["email"] == user.email:
+
+        # Verificar se email já existe
+        if await run_storage(db_usuarios.get_by_email, user.email) is not None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email já cadastrado."
             )
+
+        # Criar usuário (hash calculado no pool, fora do event loop)
+        hashed_password = await run_in_hash_pool(get_password_hash, user.password)
+        novo_usuario = {
+            "username": user.username,
+            "email": user.email,
+            "nome_completo": user.nome_completo,
+            "idade": user.idade,
+            "hashed_password": hashed_password,
+            "data_criacao": datetime.now(),
+            "ultimo_login": None
+        }
+
+        try:
+            novo_usuario = await run_storage(db_usuarios.insert, novo_usuario)
+        except DuplicateKeyError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{exc.campo.capitalize()} já cadastrado."
+            )
+    await add_log(novo_usuario.id, "CADASTRO", f"Usuário {user.username} cadastrado")
     
-    # Criar usuário
-    hashed_password = get_password_hash(user.password)
-    novo_usuario = {
-        "id": user_id_counter,
-        "username": user.username,
-        "email": user.email,
-        "nome_completo": user.nome_completo,
-        "idade": user.idade,
-        "hashed_password": hashed_password,
-        "data_criacao": datetime.now(),
-        "ultimo_login": None
-    }
-    
-    db_usuarios[user_id_counter] = novo_usuario
-    add_log(user_id_counter, "CADASTRO", f"Usuário {user.username} cadastrado")
-    user_id_counter += 1
-    
-    return UserResponse(**{k: v for k, v in novo_usuario.items() if k != "hashed_password"})
+    return UserResponse.model_validate(novo_usuario)
+
+@app.post("/cadastro/bulk")
+async def cadastrar_usuarios_em_lote(request: Request, current_user: str = Depends(verify_token)):
+    """
+    Importa usuários em lote a partir de NDJSON (padrão) ou CSV (Content-Type text/csv).
+    - Lê o corpo em streaming, validando linha a linha
+    - Verifica unicidade nos índices e dentro do próprio lote
+    - Calcula os hashes em paralelo no pool de hashing
+    - Devolve o resultado de cada linha em NDJSON, seguido de um resumo
+    Requer autenticação.
+    """
+    from bulk_import import BulkImporter, DuplexStreamingResponse, iter_lines, iter_records  # só usado aqui
+
+    formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    def registrar_cadastro(usuario: dict):
+        # Chamado de dentro da gravação do lote (threadpool no SQLite)
+        audit_writer.submit(usuario.id, "CADASTRO", f"Usuário {usuario.username} importado por {current_user}")
+
+    importador = BulkImporter(
+        db_usuarios, hash_pool, get_password_hash, UserCreate,
+        tamanho_lote=BULK_CHUNK_SIZE, on_created=registrar_cadastro,
+    )
+
+    async def resultados():
+        registros = iter_records(iter_lines(request.stream()), formato)
+        async for resultado in importador.run(registros):
+            yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+    return DuplexStreamingResponse(resultados(), media_type="application/x-ndjson")
 
 @app.post("/login", response_model=TokenResponse)
-def login(user_login: UserLogin):
+async def login(user_login: UserLogin, request: Request, background_tasks: BackgroundTasks):
     """
     Autentica um usuário e retorna token de acesso.
-    - Compara senha com hash armazenado
+    - Limita tentativas por IP e por username (429 antes de qualquer bcrypt)
+    - Compara senha com hash armazenado (refeito em background se o custo mudou)
     - Gera token JWT
     - Registra último login
     """
+    ip = request.client.host if request.client else "desconhecido"
+    espera = await run_storage(login_limiter.check, ip, user_login.username)
+    if espera:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Tente novamente mais tarde.",
+            headers={"Retry-After": str(math.ceil(espera))},
+        )
+
     # Encontrar usuário
-    usuario_encontrado = None
-    for usuario in db_usuarios.values():
-        if usuario["username"] == user_login.username:
-            usuario_encontrado = usuario
-            break
+    usuario_encontrado = await run_storage(db_usuarios.get_by_username, user_login.username)
 
-    if not usuario_encontrado or not verify_password(user_login.password, usuario_encontrado["hashed_password"]):
+    if usuario_encontrado is None:
+        valida = await run_in_hash_pool(verify_dummy_password, user_login.password)
+    else:
+        valida = await run_in_hash_pool(verify_password, user_login.password, usuario_encontrado.hashed_password)
+    if not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário ou senha inválidos.",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    await run_storage(login_limiter.reset_usuario, user_login.username)
+    if password_needs_rehash(usuario_encontrado.hashed_password):
+        background_tasks.add_task(
+            rehash_password, usuario_encontrado.id, user_login.password, usuario_encontrado.hashed_password
+        )
+
     # Atualizar último login
-    usuario_encontrado["ultimo_login"] = datetime.now()
+    await run_storage(db_usuarios.update, usuario_encontrado.id, ultimo_login=datetime.now())
+    profile_cache.invalidate(usuario_encontrado.id)
+    logins_ultimo_minuto.add()
+    logins_ultima_hora.add()
     
-    # Criar token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    await add_log(usuario_encontrado.id, "LOGIN", "Login realizado com sucesso")
+    refresh_token = await run_storage(refresh_tokens.issue, usuario_encontrado.username)
+    return issue_tokens(usuario_encontrado.username, refresh_token)
+
+def issue_tokens(username: str, refresh_token: str) -> TokenResponse:
+    """Monta a resposta com um novo access token e o refresh token informado."""
     access_token = create_access_token(
-        data={"sub": usuario_encontrado["username"]},
-        expires_delta=access_token_expires
+        data={"sub": username},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    
-    add_log(usuario_encontrado["id"], "LOGIN", "Login realizado com sucesso")
-    
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
-        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        refresh_token=refresh_token,
+        refresh_expires_in=REFRESH_TOKEN_EXPIRE_DAYS * 86400,
     )
 
+@app.post("/token/refresh", response_model=TokenResponse)
+async def renovar_token(dados: RefreshRequest):
+    """
+    Troca um refresh token válido por um novo access token (sem bcrypt).
+    - O refresh token é de uso único: a resposta traz um novo
+    """
+    renovado = await run_storage(refresh_tokens.rotate, dados.refresh_token)
+    if renovado is None:
+        raise HTTPException(status_code=401, detail="Refresh token inválido ou expirado.")
+    username, novo_refresh = renovado
+    usuario = await run_storage(db_usuarios.get_by_username, username)
+    if usuario is None:
+        await run_storage(refresh_tokens.revoke, novo_refresh)
+        raise HTTPException(status_code=401, detail="Refresh token inválido ou expirado.")
+    await add_log(usuario.id, "REFRESH", "Token renovado")
+    return issue_tokens(username, novo_refresh)
+
+@app.post("/logout")
+async def logout(dados: Optional[LogoutRequest] = None,
+                 credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Revoga o access token usado na requisição (e o refresh token, se enviado).
+    """
+    await verify_token(credentials)
+    try:
+        payload = jwt.get_unverified_claims(credentials.credentials)
+    except JWTError:
+        payload = {}  # token simples (legado): não há jti a revogar
+    if payload.get("jti"):
+        await run_storage(revoked_tokens.revoke, payload["jti"],
+                          payload.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    token_cache.pop(hashlib.blake2b(credentials.credentials.encode(), digest_size=16).digest())
+    if dados is not None and dados.refresh_token:
+        await run_storage(refresh_tokens.revoke, dados.refresh_token)
+    return {"message": "Logout realizado com sucesso"}
+
+async def cached_profile(user_id: Optional[int] = None, username: Optional[str] = None) -> Optional[tuple]:
+    """
+    Perfil serializado ``(username_key, corpo, etag)`` pelo id ou username.
+    Lê do cache de perfis e, na falta, do repositório (read-through).
+    """
+    if user_id is not None:
+        entrada = profile_cache.get(user_id)
+    else:
+        entrada = profile_cache.get_by_username(username)
+    if entrada is not None:
+        return entrada
+
+    geracao = profile_cache.geracao
+    if user_id is not None:
+        usuario = await run_storage(db_usuarios.get, user_id)
+    else:
+        usuario = await run_storage(db_usuarios.get_by_username, username)
+    if usuario is None:
+        return None
+    return cache_profile(usuario, geracao)
+
+def cache_profile(usuario, geracao: int) -> tuple:
+    """Serializa o perfil e o guarda no cache (se nada foi invalidado desde ``geracao``)."""
+    corpo = dumps(usuario_para_dict(usuario))
+    etag = etag_para(corpo)
+    expira_em = time.time() + PROFILE_CACHE_TTL if PROFILE_CACHE_TTL > 0 else None
+    profile_cache.put(usuario.id, usuario.username, corpo, etag, geracao, expira_em=expira_em)
+    return normalizar_chave(usuario.username), corpo, etag
+
+async def cached_profiles(ids: List[int], usernames: List[str]) -> Tuple[List[tuple], List[int], List[str]]:
+    """
+    Perfis serializados de vários usuários, na ordem pedida e sem repetição.
+    Os que faltam no cache são lidos com uma busca em lote por tipo de chave.
+    Retorna ``(entradas, ids ausentes, usernames ausentes)``.
+    """
+    geracao = profile_cache.geracao
+    por_id = {user_id: profile_cache.get(user_id) for user_id in dict.fromkeys(ids)}
+    pedidos = {}  # username normalizado -> como foi pedido
+    for username in usernames:
+        pedidos.setdefault(normalizar_chave(username), username)
+    por_username = {chave: profile_cache.get_by_username(chave) for chave in pedidos}
+
+    faltando = [user_id for user_id, entrada in por_id.items() if entrada is None]
+    if faltando:
+        for usuario in await run_storage(db_usuarios.get_many, faltando):
+            por_id[usuario.id] = cache_profile(usuario, geracao)
+    faltando = [chave for chave, entrada in por_username.items() if entrada is None]
+    if faltando:
+        for usuario in await run_storage(db_usuarios.get_many_by_username, faltando):
+            entrada = cache_profile(usuario, geracao)
+            por_username[entrada[0]] = entrada
+
+    entradas = {}
+    for entrada in itertools.chain(por_id.values(), por_username.values()):
+        if entrada is not None:
+            entradas.setdefault(entrada[0], entrada)
+    ids_ausentes = [user_id for user_id, entrada in por_id.items() if entrada is None]
+    usernames_ausentes = [pedidos[chave] for chave, entrada in por_username.items() if entrada is None]
+    return list(entradas.values()), ids_ausentes, usernames_ausentes
+
+def profile_response(entrada: tuple, request: Request) -> Response:
+    """Resposta do perfil serializado, ou 304 se o cliente já tem a mesma versão."""
+    _, corpo, etag = entrada
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_confere(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(corpo, media_type="application/json", headers=headers)
+
 @app.get("/usuario/{user_id}", response_model=UserResponse)
-def buscar_usuario(user_id: int, current_user: str = Depends(verify_token)):
+async def buscar_usuario(user_id: int, request: Request, current_user: str = Depends(verify_token)):
     """
     Busca um usuário pelo ID.
+    - Resposta servida do cache de perfis, com ETag (304 para If-None-Match)
     Requer autenticação.
     """
-    if user_id not in db_usuarios:
+    entrada = await cached_profile(user_id=user_id)
+    if entrada is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuário não encontrado."
         )
     
-    usuario = db_usuarios[user_id]
-    add_log(user_id, "CONSULTA", f"Perfil consultado por {current_user}")
-    return UserResponse(**{k: v for k, v in usuario.items() if k != "hashed_password"})
+    await add_log(user_id, "CONSULTA", f"Perfil consultado por {current_user}")
+    return profile_response(entrada, request)
+
+@app.post("/usuarios/batch", response_model=UserBatchResponse)
+async def buscar_usuarios_em_lote(consulta: UserBatchRequest, current_user: str = Depends(verify_token)):
+    """
+    Busca vários usuários por ID e/ou username em uma única chamada.
+    - Até BATCH_LOOKUP_MAX chaves por requisição
+    - Perfis servidos do cache de perfis; os demais são lidos em lote
+    - Lista os ids e usernames não encontrados
+    - Um único log agregado por chamada
+    Requer autenticação.
+    """
+    if len(consulta.ids) + len(consulta.usernames) > BATCH_LOOKUP_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {BATCH_LOOKUP_MAX} ids/usernames por requisição."
+        )
+    entradas, ids_ausentes, usernames_ausentes = await cached_profiles(consulta.ids, consulta.usernames)
+
+    ausentes = len(ids_ausentes) + len(usernames_ausentes)
+    await add_log(0, "CONSULTA_LOTE", f"{len(entradas)} perfis consultados em lote por {current_user} "
+                                f"({ausentes} não encontrados)")
+    # Os perfis já estão serializados no cache: a resposta só os concatena
+    corpo = b"".join((
+        b'{"usuarios":[', b",".join(entrada[1] for entrada in entradas),
+        b'],"ids_nao_encontrados":', dumps(ids_ausentes),
+        b',"usernames_nao_encontrados":', dumps(usernames_ausentes), b"}",
+    ))
+    return Response(corpo, media_type="application/json")
+
+@app.get("/usuarios/search", response_model=List[UserResponse])
+async def buscar_usuarios(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limite: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: str = Depends(verify_token)
+):
+    """
+    Busca usuários por prefixo em username, nome completo e email.
+    - Sem diferenciar maiúsculas nem acentos ("joao" encontra "João")
+    - Várias palavras: todas precisam ser prefixo de algum campo
+    - Ranking: username, depois nome, depois email; o termo exato primeiro
+    - Paginação por cursor (header X-Next-Cursor)
+    Requer autenticação.
+    """
+    ordem = f"busca:{q}"
+    apos = None
+    if cursor is not None:
+        ordem_cursor, apos = decode_cursor(cursor)
+        if ordem_cursor != ordem:
+            raise HTTPException(status_code=400, detail="Cursor não corresponde à busca informada.")
+        if len(apos) != 3 or apos[0] not in range(len(CAMPOS_BUSCA)) or not isinstance(apos[1], str) \
+                or not isinstance(apos[2], int):
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+    usuarios, proxima = await run_storage(db_usuarios.search, q, limite, apos)
+    if proxima is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(ordem, proxima)
+
+    await add_log(0, "BUSCA", f"Busca de usuários por {current_user}")
+    if FAST_SERIALIZATION:
+        return FastJSONResponse(usuarios_para_lista(usuarios), headers=response.headers)
+    return [UserResponse.model_validate(usuario) for usuario in usuarios]
 
 @app.get("/usuarios", response_model=List[UserResponse])
-def listar_usuarios(
-    limite: int = 10, 
-    offset: int = 0,
+async def listar_usuarios(
+    response: Response,
+    limite: int = Query(10, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    idade_min: Optional[int] = None,
+    idade_max: Optional[int] = None,
+    criado_desde: Optional[datetime] = None,
+    criado_ate: Optional[datetime] = None,
     current_user: str = Depends(verify_token)
 ):
     """
-    Lista usuários com paginação.
+    Lista usuários com paginação por cursor (keyset).
+    - `after_id` ou `cursor` (header X-Next-Cursor da página anterior)
+    - Filtros por faixa de idade e janela de data de criação
+    - `offset` é mantido por compatibilidade (sem cursor nem filtros)
     Requer autenticação.
     """
-    usuarios = list(db_usuarios.values())[offset:offset + limite]
-    add_log(0, "LISTAGEM", f"Listagem de usuários por {current_user}")
-    return [UserResponse(**{k: v for k, v in usuario.items() if k != "hashed_password"}) for usuario in usuarios]
+    criado_desde, criado_ate = to_local_naive(criado_desde), to_local_naive(criado_ate)
+    ordem = ordem_para_filtros(idade_min, idade_max, criado_desde, criado_ate)
+    apos = None
+    if cursor is not None:
+        ordem_cursor, apos = decode_cursor(cursor)
+        if ordem_cursor != ordem:
+            raise HTTPException(status_code=400, detail="Cursor não corresponde aos filtros informados.")
+    elif after_id is not None:
+        if ordem != ORDEM_ID:
+            raise HTTPException(status_code=400, detail="after_id não pode ser combinado com filtros; use o cursor.")
+        apos = (after_id,)
+
+    # Busca uma linha a mais para saber se existe próxima página
+    if apos is None and ordem == ORDEM_ID and offset:
+        usuarios = await run_storage(db_usuarios.list_page, offset, limite + 1)
+    else:
+        usuarios = await run_storage(
+            db_usuarios.page, limite + 1, ordem, apos,
+            idade_min=idade_min, idade_max=idade_max,
+            criado_desde=criado_desde, criado_ate=criado_ate,
+        )
+    if len(usuarios) > limite:
+        usuarios = usuarios[:limite]
+        response.headers["X-Next-Cursor"] = encode_cursor(ordem, chave_de_ordenacao(usuarios[-1], ordem))
+
+    await add_log(0, "LISTAGEM", f"Listagem de usuários por {current_user}")
+    if FAST_SERIALIZATION:
+        return FastJSONResponse(usuarios_para_lista(usuarios), headers=response.headers)
+    return [UserResponse.model_validate(usuario) for usuario in usuarios]
 
 @app.get("/me", response_model=UserResponse)
-def meu_perfil(current_user: str = Depends(verify_token)):
+async def meu_perfil(request: Request, current_user: str = Depends(verify_token)):
     """
     Retorna perfil do usuário autenticado.
+    - Resposta servida do cache de perfis, com ETag (304 para If-None-Match)
     """
-    for usuario in db_usuarios.values():
-        if usuario["username"] == current_user:
-            return UserResponse(**{k: v for k, v in usuario.items() if k != "hashed_password"})
-    raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+    entrada = await cached_profile(username=current_user)
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+    return profile_response(entrada, request)
 
 @app.put("/usuario/{user_id}", response_model=UserResponse)
-def atualizar_usuario(
+async def atualizar_usuario(
     user_id: int, 
     user_update: UserUpdate,
     current_user: str = Depends(verify_token)
@@ -301,88 +926,199 @@ def atualizar_usuario(
     Atualiza dados do usuário.
     Usuário só pode editar próprio perfil.
     """
-    if user_id not in db_usuarios:
+    usuario = await run_storage(db_usuarios.get, user_id)
+    if usuario is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
     
-    usuario = db_usuarios[user_id]
-    
     # Verificar permissão
-    if usuario["username"] != current_user:
+    if usuario.username != current_user:
         raise HTTPException(status_code=403, detail="Sem permissão para editar este usuário.")
     
-    # Atualizar campos
-    if user_update.email is not None:
-        # Verificar se email já existe
-        for other_user in db_usuarios.values():
-            if other_user["id"] != user_id and other_user["email"] == user_update.email:
-                raise HTTPException(status_code=400, detail="Email já está em uso.")
-        usuario["email"] = user_update.email
-    
-    if user_update.nome_completo is not None:
-        usuario["nome_completo"] = user_update.nome_completo
-    
-    if user_update.idade is not None:
-        usuario["idade"] = user_update.idade
+    # Atualizar campos (o repositório mantém o índice de email consistente)
+    campos = user_update.dict(exclude_none=True)
+    try:
+        usuario = await run_storage(db_usuarios.update, user_id, **campos)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email já está em uso.")
+    profile_cache.invalidate(user_id)
     
-    add_log(user_id, "ATUALIZACAO", "Perfil atualizado")
-    return UserResponse(**{k: v for k, v in usuario.items() if k != "hashed_password"})
+    await add_log(user_id, "ATUALIZACAO", "Perfil atualizado")
+    return UserResponse.model_validate(usuario)
 
 @app.delete("/usuario/{user_id}")
-def deletar_usuario(user_id: int, current_user: str = Depends(verify_token)):
+async def deletar_usuario(user_id: int, current_user: str = Depends(verify_token)):
     """
     Remove usuário do sistema.
     Usuário só pode deletar próprio perfil.
     """
-    if user_id not in db_usuarios:
+    usuario = await run_storage(db_usuarios.get, user_id)
+    if usuario is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
     
-    usuario = db_usuarios[user_id]
-    
     # Verificar permissão
-    if usuario["username"] != current_user:
+    if usuario.username != current_user:
         raise HTTPException(status_code=403, detail="Sem permissão para deletar este usuário.")
     
-    del db_usuarios[user_id]
-    add_log(user_id, "EXCLUSAO", "Usuário deletado")
+    await run_storage(db_usuarios.delete, user_id)
+    profile_cache.invalidate(user_id)
+    # Tokens já emitidos deixam de valer: access tokens até expirarem, refresh tokens de imediato
+    await run_storage(revoked_tokens.revoke_subject, usuario.username, time.time(),
+                      time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    await run_storage(refresh_tokens.revoke_subject, usuario.username)
+    token_cache.invalidate_subject(usuario.username)
+    await add_log(user_id, "EXCLUSAO", "Usuário deletado")
     return {"message": "Usuário deletado com sucesso"}
 
 @app.get("/logs", response_model=List[LogEntry])
-def listar_logs(
-    limite: int = 50,
+async def listar_logs(
+    response: Response,
+    limite: int = Query(50, ge=1, le=1000),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    acao: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    todos: bool = False,
+    cursor: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
     """
-    Lista logs de atividade do usuário autenticado.
+    Lista logs de atividade (por padrão, do usuário autenticado).
+    - Sem filtros: as últimas `limite` entradas, em ordem cronológica
+    - `desde`/`ate`, `acao`, `usuario_id` ou `todos`: entradas em ordem
+      cronológica a partir de `desde`, com paginação por cursor (header X-Next-Cursor)
+    - `usuario_id` e `todos` só para usuários em LOG_ADMINS (403 para os demais)
+    Requer autenticação.
     """
-    # Encontrar ID do usuário atual
-    usuario_id = None
-    for usuario in db_usuarios.values():
-        if usuario["username"] == current_user:
-            usuario_id = usuario["id"]
-            break
-    
-    if usuario_id is None:
-        return []
-    
-    # Filtrar logs do usuário
-    logs_usuario = [log for log in db_logs if log["usuario_id"] == usuario_id]
-    return logs_usuario[-limite:]
+    if usuario_id is not None and todos:
+        raise HTTPException(status_code=400, detail="Use usuario_id ou todos, não os dois.")
+    if usuario_id is not None or todos:
+        require_log_admin(current_user)
+    filtrado = todos or any(valor is not None for valor in (desde, ate, acao, usuario_id, cursor))
+    if usuario_id is None and not todos:
+        # Encontrar ID do usuário atual
+        usuario = await run_storage(db_usuarios.get_by_username, current_user)
+        if usuario is None:
+            return []
+        usuario_id = usuario.id
 
-@app.get("/stats")
-def estatisticas(current_user: str = Depends(verify_token)):
+    if not filtrado:
+        # Últimas entradas do buffer do usuário (O(limite))
+        logs = await run_storage(db_logs.recent, usuario_id, limite)
+    else:
+        apos_id = None
+        if cursor is not None:
+            ordem, apos = decode_cursor(cursor)
+            if ordem != ORDEM_LOGS:
+                raise HTTPException(status_code=400, detail="Cursor inválido.")
+            apos_id = apos[0]
+        # Busca uma linha a mais para saber se existe próxima página
+        logs = await run_storage(
+            db_logs.page, limite + 1, apos_id, usuario_id=usuario_id, acao=acao,
+            desde=to_local_naive(desde), ate=to_local_naive(ate),
+        )
+        if len(logs) > limite:
+            logs = logs[:limite]
+            response.headers["X-Next-Cursor"] = encode_cursor(ORDEM_LOGS, (logs[-1]["id"],))
+    if FAST_SERIALIZATION:
+        return FastJSONResponse(logs, headers=response.headers)
+    return logs
+
+def export_response(registros, campos, formato: str, nome: str, request: Request) -> StreamingResponse:
+    """Monta a resposta em streaming da exportação, com gzip quando o cliente aceita."""
+    from export import MEDIA_TYPES, chunked, gzip_stream, serialize  # importado só na primeira exportação
+
+    pedacos = chunked(serialize(registros, campos, formato))
+    headers = {"Content-Disposition": f'attachment; filename="{nome}.{formato}"', "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        pedacos = gzip_stream(pedacos)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(pedacos, media_type=MEDIA_TYPES[formato], headers=headers)
+
+@app.get("/export/usuarios")
+async def exportar_usuarios(
+    request: Request,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    current_user: str = Depends(verify_token)
+):
     """
-    Retorna estatísticas da aplicação.
+    Exporta todos os usuários em NDJSON ou CSV, em streaming.
+    - Filtro opcional por janela de data de criação (`desde`/`ate`)
+    - Compressão gzip quando o cliente envia Accept-Encoding: gzip
+    Requer autenticação.
     """
-    usuarios_com_login = len([u for u in db_usuarios.values() if u["ultimo_login"]])
+    from export import CAMPOS_USUARIO
+
+    registros = db_usuarios.iter_users(criado_desde=to_local_naive(desde), criado_ate=to_local_naive(ate))
+    await add_log(0, "EXPORTACAO", f"Exportação de usuários por {current_user}")
+    return export_response(registros, CAMPOS_USUARIO, formato, "usuarios", request)
+
+@app.get("/export/logs")
+async def exportar_logs(
+    request: Request,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    current_user: str = Depends(verify_token)
+):
+    """
+    Exporta os logs de atividade retidos em NDJSON ou CSV, em streaming.
+    - Filtro opcional por janela de `timestamp` (`desde`/`ate`)
+    - Compressão gzip quando o cliente envia Accept-Encoding: gzip
+    Requer autenticação e um usuário em LOG_ADMINS (403 para os demais).
+    """
+    from export import CAMPOS_LOG
+
+    require_log_admin(current_user)
+    registros = db_logs.iter_logs(desde=to_local_naive(desde), ate=to_local_naive(ate))
+    await add_log(0, "EXPORTACAO", f"Exportação de logs por {current_user}")
+    return export_response(registros, CAMPOS_LOG, formato, "logs", request)
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """
+    Expõe as métricas da aplicação no formato texto do Prometheus.
+    """
+    # Os gauges consultam os repositórios (no sqlite, I/O)
+    return Response(await run_storage(metrics_registry.render), media_type=CONTENT_TYPE)
+
+def collect_stats() -> dict:
+    """Monta as estatísticas a partir dos contadores de cada componente."""
     return {
         "total_usuarios": len(db_usuarios),
         "total_logs": len(db_logs),
-        "usuarios_com_login": usuarios_com_login,
+        "usuarios_com_login": db_usuarios.count_logged_in(),
+        "logs_por_acao": db_logs.count_by_action(),
+        "logins_ultimo_minuto": logins_ultimo_minuto.count(),
+        "logins_ultima_hora": logins_ultima_hora.count(),
+        "hash_pool": hash_pool.stats(),
+        "bcrypt": {"rounds": BCRYPT_ROUNDS, "rehashes": int(password_rehash_total.value())},
+        "audit_log": audit_writer.stats(),
+        "token_cache": token_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "refresh_tokens": refresh_tokens.stats(),
+        "revogacoes": revoked_tokens.stats(),
+        "login_rate_limit": login_limiter.stats(),
         "ultima_atualizacao": datetime.now().isoformat()
     }
 
+@app.get("/stats")
+async def estatisticas(current_user: str = Depends(verify_token)):
+    """
+    Retorna estatísticas da aplicação.
+    Todos os totais são contadores mantidos incrementalmente (custo O(1)).
+    """
+    return await run_storage(collect_stats)
+
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1 and STORAGE_BACKEND != "sqlite":
+        sys.exit("WORKERS > 1 requer STORAGE_BACKEND=sqlite: o backend em memória não é compartilhado")
+    if WORKERS > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
 
 
@@ -0,0 +1,295 @@
+"""
+Métricas no formato de exposição do Prometheus, sem dependências externas.
+
+Contadores, gauges e histogramas mantêm os valores em dicionários indexados
+pelos valores dos labels; cada observação custa um lock e algumas operações
+de dicionário, baixo o suficiente para manter a instrumentação ligada em
+produção. Métricas derivadas de estatísticas já existentes (pool de hashing,
+writer de logs, caches) são lidas apenas no momento da coleta via callbacks.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metrica):
+    """Contador monotônico com labels."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, descricao, labels=()):
+        super().__init__(nome, descricao, labels)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *valores_labels: str, valor: float = 1.0) -> None:
+        with self._lock:
+            self._valores[valores_labels] = self._valores.get(valores_labels, 0.0) + valor
+
+    def value(self, *valores_labels: str) -> float:
+        return self._valores.get(valores_labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        linhas = self._cabecalho()
+        for valores_labels, valor in itens:
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, valores_labels)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class Gauge(_Metrica):
+    """Valor instantâneo; pode ser atribuído ou calculado por callback na coleta."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, descricao, labels=(), callback: Optional[Callable[[], float]] = None):
+        super().__init__(nome, descricao, labels)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, valor: float, *valores_labels: str) -> None:
+        with self._lock:
+            self._valores[valores_labels] = valor
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            itens = [((), float(self._callback()))]
+        else:
+            with self._lock:
+                itens = list(self._valores.items())
+        linhas = self._cabecalho()
+        for valores_labels, valor in itens:
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, valores_labels)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class CounterFunc(Gauge):
+    """Contador cujo valor é lido de uma estatística existente na hora da coleta."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, descricao, callback: Callable[[], float]):
+        super().__init__(nome, descricao, callback=callback)
+
+
+class SlidingWindowCounter:
+    """
+    Contador de eventos em janela deslizante.
+
+    A janela é dividida em buckets de ``resolucao`` segundos guardados em um
+    anel; cada bucket lembra o instante em que começou e é zerado ao ser
+    reutilizado. Registrar custa O(1) e contar custa O(janela / resolucao),
+    independente do volume de eventos.
+    """
+
+    def __init__(self, janela: int, resolucao: int = 1):
+        if janela % resolucao:
+            raise ValueError("janela deve ser múltiplo da resolução")
+        self.janela = janela
+        self.resolucao = resolucao
+        self._tamanho = janela // resolucao
+        self._inicios = [-1] * self._tamanho
+        self._contagens = [0] * self._tamanho
+        self._lock = threading.Lock()
+
+    def add(self, quantidade: int = 1, agora: Optional[float] = None) -> None:
+        bucket = int(time.time() if agora is None else agora) // self.resolucao
+        posicao = bucket % self._tamanho
+        with self._lock:
+            if self._inicios[posicao] != bucket:
+                self._inicios[posicao] = bucket
+                self._contagens[posicao] = 0
+            self._contagens[posicao] += quantidade
+
+    def count(self, agora: Optional[float] = None) -> int:
+        """Eventos registrados nos últimos ``janela`` segundos (na granularidade da resolução)."""
+        atual = int(time.time() if agora is None else agora) // self.resolucao
+        minimo = atual - self._tamanho
+        with self._lock:
+            return sum(
+                contagem
+                for inicio, contagem in zip(self._inicios, self._contagens)
+                if minimo < inicio <= atual
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._inicios = [-1] * self._tamanho
+            self._contagens = [0] * self._tamanho
+
+
+class Histogram(_Metrica):
+    """Histograma com buckets fixos (cumulativos na exposição)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, descricao, labels=(), buckets: Sequence[float] = BUCKETS_PADRAO):
+        super().__init__(nome, descricao, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, valor: float, *valores_labels: str) -> None:
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_labels)
+            if serie is None:
+                # [contagens por bucket..., +Inf], soma, total
+                serie = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[valores_labels] = serie
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def count(self, *valores_labels: str) -> int:
+        serie = self._series.get(valores_labels)
+        return serie[2] if serie else 0
+
+    def time(self, *valores_labels: str):
+        """Decorador que mede a duração de funções síncronas ou assíncronas."""
+        def decorador(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    inicio = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.observe(time.perf_counter() - inicio, *valores_labels)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - inicio, *valores_labels)
+            return wrapper
+        return decorador
+
+    def render(self) -> List[str]:
+        with self._lock:
+            itens = [(chave, (list(serie[0]), serie[1], serie[2])) for chave, serie in self._series.items()]
+        linhas = self._cabecalho()
+        for valores_labels, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(float(limite))}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, valores_labels, le)} {acumulado}")
+            labels = _formatar_labels(self.labels, valores_labels)
+            linhas.append(f"{self.nome}_sum{labels} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{labels} {total}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expostas em ``/metrics``."""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def register(self, metrica: _Metrica) -> _Metrica:
+        if metrica.nome in self._metricas:
+            raise ValueError(f"Métrica já registrada: {metrica.nome}")
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def counter(self, nome, descricao, labels=()) -> Counter:
+        return self.register(Counter(nome, descricao, labels))
+
+    def gauge(self, nome, descricao, labels=(), callback=None) -> Gauge:
+        return self.register(Gauge(nome, descricao, labels, callback=callback))
+
+    def counter_func(self, nome, descricao, callback) -> CounterFunc:
+        return self.register(CounterFunc(nome, descricao, callback))
+
+    def histogram(self, nome, descricao, labels=(), buckets=BUCKETS_PADRAO) -> Histogram:
+        return self.register(Histogram(nome, descricao, labels, buckets))
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus."""
+        linhas: List[str] = []
+        for metrica in self._metricas.values():
+            linhas.extend(metrica.render())
+        return "\n".join(linhas) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra contagem, status e latência por rota.
+
+    Usa o template da rota (ex.: ``/usuario/{user_id}``) como label, evitando
+    uma série por ID; requisições sem rota correspondente são agrupadas.
+    """
+
+    def __init__(self, app, requests_total: Counter, request_duration: Histogram,
+                 ignorar: Iterable[str] = ()):
+        self.app = app
+        self.requests_total = requests_total
+        self.request_duration = request_duration
+        self.ignorar = frozenset(ignorar)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.ignorar:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status_code = 500
+
+        async def send_com_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", None) or "<sem_rota>"
+            metodo = scope["method"]
+            self.request_duration.observe(time.perf_counter() - inicio, metodo, caminho)
+            self.requests_total.inc(metodo, caminho, str(status_code))
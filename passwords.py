@@ -0,0 +1,73 @@
+"""
+Custo do bcrypt: contexto de hashing, calibração e resolução da configuração.
+
+O custo (``rounds``) pode ser fixado por configuração ou calibrado na
+inicialização para um tempo-alvo de verificação no hardware atual. O
+custo escolhido é o mínimo aceito: hashes gravados com custo menor
+continuam verificando normalmente, mas ``needs_update`` os marca para serem
+recalculados no próximo login bem-sucedido. Assim o custo pode subir por
+implantação sem migração. Hashes com custo maior não são marcados: com
+vários workers calibrando cada um o seu custo, um hash nunca fica
+alternando entre eles — converge para o maior custo em uso.
+
+O backend do bcrypt é detectado na primeira utilização; ``warm_up_context``
+antecipa isso para a inicialização com um hash de custo mínimo.
+"""
+import time
+from typing import Optional
+
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+ROUNDS_PADRAO = 12  # padrão do passlib para bcrypt
+ROUNDS_BASE_CALIBRACAO = 6
+ROUNDS_AQUECIMENTO = 4  # mínimo do bcrypt: aquece o backend sem pagar o custo configurado
+
+
+def build_password_context(rounds: int = ROUNDS_PADRAO) -> CryptContext:
+    """Contexto bcrypt com custo ``rounds``; só hashes com custo menor precisam de atualização."""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
+
+def warm_up_context(contexto: CryptContext) -> None:
+    """Carrega o backend do bcrypt e exercita ``verify``/``needs_update`` do contexto."""
+    hash_barato = bcrypt.using(rounds=ROUNDS_AQUECIMENTO).hash("aquecimento")
+    contexto.verify("aquecimento", hash_barato)
+    contexto.needs_update(hash_barato)
+
+
+def calibrate_bcrypt_rounds(alvo_ms: float, minimo: int = 10, maximo: int = 16, amostras: int = 3) -> int:
+    """
+    Maior custo cuja verificação estimada cabe em ``alvo_ms`` neste hardware.
+
+    Mede a verificação com um custo baixo e extrapola (cada round dobra o
+    tempo), o que mantém a calibração em poucos milissegundos. O resultado
+    nunca fica abaixo de ``minimo``.
+    """
+    contexto = build_password_context(ROUNDS_BASE_CALIBRACAO)
+    hash_base = contexto.hash("calibracao")
+    tempos = []
+    for _ in range(amostras):
+        inicio = time.perf_counter()
+        contexto.verify("calibracao", hash_base)
+        tempos.append(time.perf_counter() - inicio)
+    base_ms = min(tempos) * 1000
+
+    rounds = ROUNDS_BASE_CALIBRACAO
+    while rounds < maximo and base_ms * 2 ** (rounds + 1 - ROUNDS_BASE_CALIBRACAO) <= alvo_ms:
+        rounds += 1
+    return max(minimo, rounds)
+
+
+def resolve_bcrypt_rounds(rounds: Optional[str] = None, alvo_ms: float = 0, minimo: int = 10) -> int:
+    """Custo configurado: fixo se informado, calibrado se houver alvo, senão o padrão."""
+    if rounds:
+        return int(rounds)
+    if alvo_ms > 0:
+        return calibrate_bcrypt_rounds(alvo_ms, minimo=minimo)
+    return ROUNDS_PADRAO
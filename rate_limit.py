@@ -0,0 +1,201 @@
+"""
+Limitação de tentativas de login com token buckets por IP e por username.
+
+Cada chave (``ip:<endereço>`` ou ``usuario:<username>``) tem um bucket com
+``capacidade`` tokens que se recarrega continuamente; cada tentativa consome
+um token e, sem tokens, a tentativa é recusada com o tempo até o próximo
+token. A checagem acontece antes de qualquer trabalho de bcrypt.
+
+O estado fica atrás de ``TokenBucketStore``: a implementação em memória
+serve um único processo e a SQLite é compartilhada entre workers. A
+implementação em memória guarda uma tupla por chave em ordem de último
+acesso e descarta chaves ociosas assim que o bucket estaria cheio de novo
+(equivalente a não ter estado), com um teto de chaves para resistir a
+sprays de usernames. A SQLite faz o mesmo por um índice em ``cheio_em``.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from storage.base import normalizar_chave
+
+
+class TokenBucketStore(ABC):
+    """Estado dos buckets, indexado por chave."""
+
+    @abstractmethod
+    def consume(self, chave: str, capacidade: float, por_segundo: float,
+                agora: Optional[float] = None) -> float:
+        """Consome um token; retorna 0 se permitido ou os segundos até haver um token."""
+
+    @abstractmethod
+    def reset(self, chave: str) -> None:
+        """Devolve o bucket da chave à capacidade total."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todo o estado."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Quantidade de chaves com estado."""
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """Buckets em memória com descarte de chaves ociosas e limite de chaves."""
+
+    def __init__(self, max_chaves: int = 100_000):
+        self.max_chaves = max_chaves
+        # chave -> (tokens, atualizado_em, cheio_em), em ordem de último acesso
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.descartadas = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _descartar_ociosas(self, agora: float) -> None:
+        # As menos usadas ficam no início; para na primeira que ainda não encheu
+        while self._buckets:
+            chave, (_, _, cheio_em) = next(iter(self._buckets.items()))
+            if cheio_em > agora and len(self._buckets) < self.max_chaves:
+                return
+            del self._buckets[chave]
+            self.descartadas += 1
+
+    def consume(self, chave, capacidade, por_segundo, agora=None) -> float:
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            self._descartar_ociosas(agora)
+            estado = self._buckets.get(chave)
+            if estado is None:
+                tokens = float(capacidade)
+            else:
+                tokens = min(float(capacidade), estado[0] + (agora - estado[1]) * por_segundo)
+
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            self._buckets[chave] = (tokens, agora, agora + (capacidade - tokens) / por_segundo)
+            self._buckets.move_to_end(chave)
+            return 0.0 if permitido else (1 - tokens) / por_segundo
+
+    def reset(self, chave: str) -> None:
+        with self._lock:
+            self._buckets.pop(chave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+SCHEMA_BUCKETS = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    chave TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    cheio_em REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rate_buckets_cheio ON rate_buckets(cheio_em);
+"""
+
+
+class SQLiteTokenBucketStore(TokenBucketStore):
+    """Buckets compartilhados no banco SQLite (``storage.SQLiteDatabase``).
+
+    Usa ``time.time()`` (comum a todos os processos) e uma transação
+    ``BEGIN IMMEDIATE`` por consumo, serializando workers na mesma chave.
+    """
+
+    def __init__(self, db, limpar_a_cada: int = 1000):
+        self.db = db
+        self.limpar_a_cada = limpar_a_cada
+        self._consumos = 0
+        self.db.connection().executescript(SCHEMA_BUCKETS)
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+    def consume(self, chave, capacidade, por_segundo, agora=None) -> float:
+        agora = time.time() if agora is None else agora
+        conn = self.db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._consumos += 1
+            if self._consumos % self.limpar_a_cada == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE cheio_em <= ?", (agora,))
+            estado = conn.execute(
+                "SELECT tokens, atualizado_em FROM rate_buckets WHERE chave = ?", (chave,)
+            ).fetchone()
+            if estado is None:
+                tokens = float(capacidade)
+            else:
+                tokens = min(float(capacidade), estado[0] + max(0.0, agora - estado[1]) * por_segundo)
+
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (chave, tokens, atualizado_em, cheio_em) "
+                "VALUES (?, ?, ?, ?)",
+                (chave, tokens, agora, agora + (capacidade - tokens) / por_segundo),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if permitido else (1 - tokens) / por_segundo
+
+    def reset(self, chave: str) -> None:
+        self.db.connection().execute("DELETE FROM rate_buckets WHERE chave = ?", (chave,))
+
+    def clear(self) -> None:
+        self.db.connection().execute("DELETE FROM rate_buckets")
+
+
+class LoginRateLimiter:
+    """Aplica os limites por IP e por username às tentativas de login."""
+
+    def __init__(self, store: TokenBucketStore, ip_capacidade: int = 30, ip_por_minuto: float = 30,
+                 usuario_capacidade: int = 10, usuario_por_minuto: float = 5, ativo: bool = True):
+        self.store = store
+        self.ip_capacidade = ip_capacidade
+        self.ip_por_segundo = ip_por_minuto / 60
+        self.usuario_capacidade = usuario_capacidade
+        self.usuario_por_segundo = usuario_por_minuto / 60
+        self.ativo = ativo
+        self.permitidos = 0
+        self.bloqueados = 0
+
+    def check(self, ip: str, username: str, agora: Optional[float] = None) -> float:
+        """Registra uma tentativa; retorna 0 se permitida ou os segundos de espera."""
+        if not self.ativo:
+            return 0.0
+        espera = self.store.consume(f"ip:{ip}", self.ip_capacidade, self.ip_por_segundo, agora)
+        if not espera:
+            espera = self.store.consume(f"usuario:{normalizar_chave(username)}",
+                                        self.usuario_capacidade, self.usuario_por_segundo, agora)
+        if espera:
+            self.bloqueados += 1
+        else:
+            self.permitidos += 1
+        return espera
+
+    def reset_usuario(self, username: str) -> None:
+        """Libera o username após um login bem-sucedido."""
+        self.store.reset(f"usuario:{normalizar_chave(username)}")
+
+    def clear(self) -> None:
+        self.store.clear()
+        self.permitidos = 0
+        self.bloqueados = 0
+
+    def stats(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "chaves": len(self.store),
+            "permitidos": self.permitidos,
+            "bloqueados": self.bloqueados,
+        }
@@ -51,7 +51,7 @@ def main():
     
     if args.all or (not any([args.unit, args.integration, args.performance, args.coverage])):
         commands.append((
-            f"{base_cmd}{verbose_flag}",
+            f"{base_cmd} -m ''{verbose_flag}",  # inclui os de performance, fora do padrão do pytest.ini
             "Executando todos os testes"
         ))
     
@@ -0,0 +1,73 @@
+"""
+Serialização rápida (opcional) das respostas de usuários e logs.
+
+Com ``response_model``, o FastAPI valida novamente cada item devolvido pelo
+endpoint antes de serializá-lo; em páginas grandes essa segunda passada
+domina o custo do handler. No modo rápido (``FAST_SERIALIZATION``) os
+endpoints devolvem diretamente uma resposta JSON montada a partir dos
+registros do repositório, que já foram validados na escrita. O JSON é gerado
+pelo orjson quando instalado e, caso contrário, pelo serializador do
+pydantic-core; os dois produzem as datas no mesmo formato ISO 8601 do modo
+padrão.
+
+As rotas continuam declarando ``response_model``, então o schema OpenAPI não
+muda.
+
+Os perfis individuais (``/usuario/{id}`` e ``/me``) são sempre servidos já
+serializados a partir do cache de perfis, com um ETag calculado sobre o
+corpo para respostas 304 a ``If-None-Match``.
+"""
+import hashlib
+from typing import Any, Iterable, List, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+
+def dumps(conteudo: Any) -> bytes:
+    """Serializa para JSON (bytes) com o backend mais rápido disponível."""
+    if orjson is not None:
+        return orjson.dumps(conteudo)
+    return to_json(conteudo)
+
+
+class FastJSONResponse(JSONResponse):
+    """Resposta JSON renderizada por :func:`dumps`, sem validação do conteúdo."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def usuario_para_dict(usuario) -> dict:
+    """Campos públicos de um ``UserRecord`` (mesmo formato de ``UserResponse``, sem o hash)."""
+    return {
+        "id": usuario.id,
+        "username": usuario.username,
+        "email": usuario.email,
+        "nome_completo": usuario.nome_completo,
+        "idade": usuario.idade,
+        "data_criacao": usuario.data_criacao,
+        "ultimo_login": usuario.ultimo_login,
+    }
+
+
+def usuarios_para_lista(usuarios: Iterable) -> List[dict]:
+    return [usuario_para_dict(usuario) for usuario in usuarios]
+
+
+def etag_para(corpo: bytes) -> str:
+    """ETag forte derivado do conteúdo serializado."""
+    return '"' + hashlib.blake2b(corpo, digest_size=12).hexdigest() + '"'
+
+
+def etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    """Indica se o header ``If-None-Match`` contém ``etag`` (ou ``*``)."""
+    if not if_none_match:
+        return False
+    candidatos = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    return "*" in candidatos or etag in candidatos
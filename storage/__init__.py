@@ -0,0 +1,57 @@
+"""
+Camada de armazenamento da API de cadastro.
+
+O backend é escolhido por configuração através de ``create_storage``:
+``memory`` (padrão, registros compactos com índices; opcionalmente durável
+com WAL + snapshots em ``persistencia_dir``) ou ``sqlite`` (arquivo
+compartilhado entre workers).
+"""
+from typing import Optional, Tuple
+
+from storage.base import DuplicateKeyError, LogStore, UserStore
+from storage.durable import DurableLogStore, DurableUserStore, open_durable_storage
+from storage.memory import InMemoryLogStore, InMemoryUserStore
+from storage.records import UserRecord
+from storage.sqlite import SQLiteDatabase, SQLiteLogStore, SQLiteUserStore
+
+__all__ = [
+    "DuplicateKeyError",
+    "DurableLogStore",
+    "DurableUserStore",
+    "InMemoryLogStore",
+    "InMemoryUserStore",
+    "LogStore",
+    "SQLiteDatabase",
+    "SQLiteLogStore",
+    "SQLiteUserStore",
+    "UserRecord",
+    "UserStore",
+    "create_storage",
+]
+
+
+def create_storage(backend: str = "memory", sqlite_path: str = "cadastro.db",
+                   log_max_por_usuario: int = 1000,
+                   log_max_total: int = 100_000,
+                   persistencia_dir: Optional[str] = None, wal_fsync: str = "batch",
+                   wal_intervalo: float = 0.01,
+                   snapshot_intervalo: float = 300.0) -> Tuple[UserStore, LogStore]:
+    """Cria os repositórios de usuários e logs para o backend configurado."""
+    if backend == "memory" and persistencia_dir:
+        return open_durable_storage(
+            persistencia_dir, fsync=wal_fsync, intervalo_flush=wal_intervalo,
+            intervalo_snapshot=snapshot_intervalo,
+            log_max_por_usuario=log_max_por_usuario, log_max_total=log_max_total,
+        )
+    if backend == "memory":
+        return (
+            InMemoryUserStore(),
+            InMemoryLogStore(max_por_usuario=log_max_por_usuario, max_total=log_max_total),
+        )
+    if backend == "sqlite":
+        db = SQLiteDatabase(sqlite_path)
+        return (
+            SQLiteUserStore(db),
+            SQLiteLogStore(db, max_por_usuario=log_max_por_usuario, max_total=log_max_total),
+        )
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
@@ -0,0 +1,201 @@
+"""
+Interfaces comuns aos backends de armazenamento.
+
+Todos os endpoints de ``main.py`` acessam usuários e logs apenas através
+destas interfaces, o que permite trocar o backend (memória, SQLite) por
+configuração sem alterar as rotas.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from storage.records import UserRecord
+from storage.search import buscar
+
+
+def normalizar_chave(valor: str) -> str:
+    """Normaliza username/email para uso nos índices (sem diferenciar caixa)."""
+    return valor.casefold()
+
+
+# Ordenações suportadas na paginação por cursor e a chave de cada uma
+ORDEM_ID = "id"
+ORDEM_IDADE = "idade"
+ORDEM_CRIACAO = "data_criacao"
+
+
+def ordem_para_filtros(idade_min=None, idade_max=None, criado_desde=None, criado_ate=None) -> str:
+    """Escolhe o índice que atende os filtros; a página segue a ordem desse índice."""
+    if idade_min is not None or idade_max is not None:
+        return ORDEM_IDADE
+    if criado_desde is not None or criado_ate is not None:
+        return ORDEM_CRIACAO
+    return ORDEM_ID
+
+
+def chave_de_ordenacao(usuario: UserRecord, ordem: str) -> tuple:
+    """Chave de keyset de um usuário para a ordenação informada."""
+    if ordem == ORDEM_IDADE:
+        return (usuario.idade, usuario.id)
+    if ordem == ORDEM_CRIACAO:
+        return (usuario.data_criacao, usuario.id)
+    return (usuario.id,)
+
+
+class DuplicateKeyError(ValueError):
+    """Erro lançado ao violar a unicidade de username ou email."""
+
+    def __init__(self, campo: str, valor: str):
+        super().__init__(f"{campo} já cadastrado: {valor}")
+        self.campo = campo
+        self.valor = valor
+
+
+class UserStore(ABC):
+    """Repositório de usuários com buscas por ID, username e email."""
+
+    # Indica se as operações fazem I/O bloqueante e devem sair do event loop
+    bloqueante = False
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Quantidade de usuários cadastrados."""
+
+    def __contains__(self, user_id) -> bool:
+        return self.get(user_id) is not None
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Busca usuário pelo ID."""
+
+    @abstractmethod
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Busca usuário pelo username (sem diferenciar caixa)."""
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Busca usuário pelo email (sem diferenciar caixa)."""
+
+    def get_many(self, ids: Iterable[int]) -> List[UserRecord]:
+        """Usuários existentes entre ``ids``, sem repetição (ordem não garantida)."""
+        return [usuario for usuario in map(self.get, dict.fromkeys(ids)) if usuario is not None]
+
+    def get_many_by_username(self, usernames: Iterable[str]) -> List[UserRecord]:
+        """Usuários existentes entre ``usernames`` (sem diferenciar caixa), sem repetição."""
+        encontrados = {}
+        for usuario in map(self.get_by_username, usernames):
+            if usuario is not None:
+                encontrados.setdefault(usuario.id, usuario)
+        return list(encontrados.values())
+
+    @abstractmethod
+    def insert(self, usuario: Union[dict, UserRecord]) -> UserRecord:
+        """Insere um usuário, atribuindo o ID; lança DuplicateKeyError se username/email já existirem."""
+
+    @abstractmethod
+    def update(self, user_id: int, **campos) -> UserRecord:
+        """Atualiza campos de um usuário; lança DuplicateKeyError em conflito de email."""
+
+    @abstractmethod
+    def delete(self, user_id: int) -> UserRecord:
+        """Remove um usuário e retorna o registro removido."""
+
+    @abstractmethod
+    def list_page(self, offset: int, limite: int) -> List[UserRecord]:
+        """Retorna uma página de usuários em ordem de cadastro."""
+
+    @abstractmethod
+    def page(self, limite: int, ordem: str = ORDEM_ID, apos: Optional[tuple] = None,
+             idade_min: Optional[int] = None, idade_max: Optional[int] = None,
+             criado_desde: Optional[datetime] = None,
+             criado_ate: Optional[datetime] = None) -> List[UserRecord]:
+        """Página keyset: até ``limite`` usuários após a chave ``apos``, na ordem do índice escolhido."""
+
+    def iter_users(self, criado_desde: Optional[datetime] = None,
+                   criado_ate: Optional[datetime] = None,
+                   tamanho_pagina: int = 500) -> Iterator[UserRecord]:
+        """Percorre os usuários página a página (memória constante, tolerante a escritas)."""
+        ordem = ordem_para_filtros(criado_desde=criado_desde, criado_ate=criado_ate)
+        apos = None
+        while True:
+            pagina = self.page(tamanho_pagina, ordem, apos, criado_desde=criado_desde, criado_ate=criado_ate)
+            yield from pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            apos = chave_de_ordenacao(pagina[-1], ordem)
+
+    @abstractmethod
+    def iter_search_terms(self, campo: int, prefixo: str,
+                          apos: Optional[tuple] = None) -> Iterator[Tuple[str, int]]:
+        """Pares ``(termo, id)`` do índice de busca do campo com o prefixo, em ordem, após ``apos``."""
+
+    def search(self, consulta: str, limite: int,
+               apos: Optional[tuple] = None) -> Tuple[List[UserRecord], Optional[tuple]]:
+        """Busca por prefixo ranqueada (ver ``storage.search``): página e cursor da próxima."""
+        return buscar(self.iter_search_terms, self.get, consulta, limite, apos)
+
+    @abstractmethod
+    def count_logged_in(self) -> int:
+        """Quantidade de usuários que já fizeram login (mantida incrementalmente)."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todos os usuários e reinicia a sequência de IDs."""
+
+    def close(self) -> None:
+        """Libera recursos do backend (conexões, arquivos)."""
+
+
+class LogStore(ABC):
+    """Repositório de logs de atividade."""
+
+    bloqueante = False
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Quantidade de entradas retidas."""
+
+    @abstractmethod
+    def add(self, usuario_id: int, acao: str, detalhes: str = "",
+            timestamp: Optional[datetime] = None) -> dict:
+        """Registra uma entrada e retorna o registro com ID."""
+
+    def add_many(self, entradas: Iterable[Tuple[int, str, str, datetime]]) -> int:
+        """Registra um lote de entradas ``(usuario_id, acao, detalhes, timestamp)``."""
+        quantidade = 0
+        for usuario_id, acao, detalhes, timestamp in entradas:
+            self.add(usuario_id, acao, detalhes, timestamp)
+            quantidade += 1
+        return quantidade
+
+    @abstractmethod
+    def recent(self, usuario_id: int, limite: int) -> List[dict]:
+        """Últimas ``limite`` entradas do usuário, em ordem cronológica."""
+
+    @abstractmethod
+    def page(self, limite: int, apos_id: Optional[int] = None, usuario_id: Optional[int] = None,
+             acao: Optional[str] = None, desde: Optional[datetime] = None,
+             ate: Optional[datetime] = None) -> List[dict]:
+        """Até ``limite`` entradas com ID > ``apos_id``, em ordem cronológica, filtradas por usuário, ação e tempo."""
+
+    def iter_logs(self, desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                  tamanho_pagina: int = 1000) -> Iterator[dict]:
+        """Percorre todas as entradas retidas em ordem de ID, em páginas (memória constante)."""
+        ultimo_id = None
+        while True:
+            pagina = self.page(tamanho_pagina, ultimo_id, desde=desde, ate=ate)
+            yield from pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            ultimo_id = pagina[-1]["id"]
+
+    @abstractmethod
+    def count_by_action(self) -> Dict[str, int]:
+        """Quantidade de entradas retidas por ação, sem varrer o log."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+
+    def close(self) -> None:
+        """Libera recursos do backend (conexões, arquivos)."""
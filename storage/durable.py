@@ -0,0 +1,502 @@
+"""
+Durabilidade opcional do backend em memória: WAL binário + snapshots.
+
+Cada mutação dos repositórios em memória (cadastro, atualização, exclusão,
+login e logs) é acrescentada a um write-ahead log binário logo depois de
+aplicada. Os registros são tuplas serializadas com ``pickle`` em um
+protocolo fixo (estável entre versões do Python, ao contrário de
+``marshal``) e enquadradas por ``versão do formato + tamanho + crc32``. Um
+registro truncado ou corrompido no fim de um segmento (queda no meio da
+gravação) encerra o replay daquele segmento; um quadro íntegro de versão
+desconhecida interrompe a inicialização em vez de ser ignorado. O diretório
+deve ser tão confiável quanto o próprio processo (``pickle`` não é seguro
+para dados de terceiros).
+
+Gravação (group commit): os registros se acumulam em um buffer e uma thread
+os grava em uma única escrita por lote. A política de fsync define a
+garantia:
+
+- ``always``: quem grava espera o fsync do seu lote; requisições
+  simultâneas compartilham o mesmo fsync;
+- ``batch`` (padrão): fsync a cada ``intervalo`` (ex.: 10 ms), sem esperar;
+  uma queda perde no máximo esse intervalo;
+- ``off``: só ``write``; o sistema operacional decide quando ir ao disco.
+
+Compactação: periodicamente o estado é copiado para um snapshot e o WAL
+passa para um novo segmento; os segmentos anteriores ao snapshot são
+apagados. Sob o lock só são copiadas as referências dos registros e
+enfileirada a marca de troca de segmento; os fsyncs, a montagem das tuplas
+e a escrita do arquivo acontecem fora dele. Isso funciona porque os
+registros do WAL são idempotentes (o usuário inteiro a cada alteração,
+exclusão por ID): o que mudar depois da marca é reaplicado no replay.
+
+Inicialização: o snapshot e os segmentos são lidos por ``mmap`` e o estado
+é remontado com carga em massa (índices ordenados de uma vez só).
+"""
+import itertools
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from storage.memory import InMemoryLogStore, InMemoryUserStore
+from storage.records import UserRecord, de_epoch, para_epoch
+
+POLITICAS_FSYNC = ("always", "batch", "off")
+ARQUIVO_SNAPSHOT = "snapshot.bin"
+VERSAO_SNAPSHOT = 2
+VERSAO_WAL = 2
+PROTOCOLO_PICKLE = 5  # fixo: um Python mais novo lê o que um mais antigo gravou
+
+_CABECALHO = struct.Struct("<BII")  # versão do formato, tamanho do payload, crc32
+_MAGICO_SNAPSHOT = b"CADSNAP"  # seguido de um byte de versão e do payload pickle
+
+# Tipos de registro do WAL
+USUARIO = "U"          # ("U", UserRecord.to_tuple()) - inserção ou alteração (upsert)
+EXCLUSAO = "D"         # ("D", id)
+LIMPEZA_USUARIOS = "UC"
+LOG = "L"              # ("L", (id, timestamp_us, usuario_id, acao, detalhes))
+LIMPEZA_LOGS = "LC"
+
+
+def _nome_segmento(numero: int) -> str:
+    return f"wal-{numero:08d}.log"
+
+
+def _fsync_diretorio(diretorio: str) -> None:
+    try:
+        fd = os.open(diretorio, os.O_RDONLY)
+    except OSError:
+        return  # ex.: Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def iter_frames(caminho: str) -> Iterator[tuple]:
+    """Lê os registros de um segmento via mmap, parando no primeiro quadro inválido."""
+    with open(caminho, "rb") as arquivo:
+        tamanho_arquivo = os.fstat(arquivo.fileno()).st_size
+        if tamanho_arquivo == 0:
+            return
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            posicao = 0
+            while posicao + _CABECALHO.size <= tamanho_arquivo:
+                versao, tamanho, crc = _CABECALHO.unpack_from(mapa, posicao)
+                inicio = posicao + _CABECALHO.size
+                fim = inicio + tamanho
+                if fim > tamanho_arquivo:
+                    return  # gravação interrompida
+                payload = mapa[inicio:fim]
+                if zlib.crc32(payload) != crc:
+                    return
+                if versao != VERSAO_WAL:
+                    raise ValueError(f"Versão de WAL não suportada em {caminho}: {versao}")
+                yield pickle.loads(payload)
+                posicao = fim
+
+
+class WriteAheadLog:
+    """Segmentos append-only com group commit e política de fsync configurável."""
+
+    def __init__(self, diretorio: str, segmento: int, fsync: str = "batch", intervalo: float = 0.01):
+        if fsync not in POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync desconhecida: {fsync}")
+        self.diretorio = diretorio
+        self.fsync = fsync
+        self.intervalo = intervalo
+        self.segmento = segmento
+        self._arquivo = open(os.path.join(diretorio, _nome_segmento(segmento)), "ab")
+        self._cond = threading.Condition()
+        self._io = threading.Lock()  # ordem: _io antes de _cond
+        self._pendentes: List[Optional[bytes]] = []  # None marca uma troca de segmento
+        self._ultimo_segmento = segmento
+        self._sequencia = 0
+        self._gravado = 0
+        self._fechado = False
+        self.lotes = 0
+        self.registros = 0
+        self.bytes_no_segmento = 0
+        self._thread = threading.Thread(target=self._loop, name="wal-flusher", daemon=True)
+        self._thread.start()
+
+    def append(self, registro: tuple) -> int:
+        """Enfileira um registro e retorna seu número de sequência (ver :meth:`wait`)."""
+        payload = pickle.dumps(registro, protocol=PROTOCOLO_PICKLE)
+        quadro = _CABECALHO.pack(VERSAO_WAL, len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            if self._fechado:
+                raise RuntimeError("WAL fechado")
+            self._pendentes.append(quadro)
+            self._sequencia += 1
+            if self.fsync == "always":
+                self._cond.notify_all()
+            return self._sequencia
+
+    def wait(self, sequencia: int) -> None:
+        """Na política ``always``, bloqueia até o registro estar em disco."""
+        if self.fsync != "always":
+            return
+        with self._cond:
+            while self._gravado < sequencia and not self._fechado:
+                self._cond.wait()
+
+    def _gravar_pendentes(self) -> None:
+        """Grava (e sincroniza) o lote pendente, trocando de segmento nas marcas; chamar com ``_io`` adquirido."""
+        with self._cond:
+            lote, self._pendentes = self._pendentes, []
+            sequencia = self._sequencia
+        inicio = 0
+        while True:
+            try:
+                marca = lote.index(None, inicio)
+            except ValueError:
+                marca = None
+            self._escrever(lote[inicio:marca])
+            if marca is None:
+                break
+            self._trocar_segmento()
+            inicio = marca + 1
+        with self._cond:
+            self._gravado = max(self._gravado, sequencia)
+            self._cond.notify_all()
+
+    def _escrever(self, quadros: List[bytes]) -> None:
+        if not quadros:
+            return
+        dados = b"".join(quadros)
+        self._arquivo.write(dados)
+        self._arquivo.flush()
+        if self.fsync != "off":
+            os.fsync(self._arquivo.fileno())
+        self.lotes += 1
+        self.registros += len(quadros)
+        self.bytes_no_segmento += len(dados)
+
+    def _trocar_segmento(self) -> None:
+        if self.fsync == "off":
+            os.fsync(self._arquivo.fileno())
+        self._arquivo.close()
+        self.segmento += 1
+        self._arquivo = open(os.path.join(self.diretorio, _nome_segmento(self.segmento)), "ab")
+        self.bytes_no_segmento = 0
+        _fsync_diretorio(self.diretorio)
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self.fsync == "always":
+                    while not self._pendentes and not self._fechado:
+                        self._cond.wait()
+                else:
+                    self._cond.wait(self.intervalo)
+                if self._fechado:
+                    return
+            with self._io:
+                self._gravar_pendentes()
+
+    def flush(self) -> None:
+        """Grava imediatamente tudo o que está pendente."""
+        with self._io:
+            self._gravar_pendentes()
+
+    def rotate(self) -> int:
+        """
+        Encerra o segmento atual na posição corrente da fila (o que for
+        enfileirado depois vai para o próximo) e retorna o número do novo
+        segmento. Não faz I/O, então pode ser chamado sob o lock dos
+        repositórios; a troca de arquivo e os fsyncs acontecem na próxima
+        gravação (ver :meth:`flush`).
+        """
+        with self._cond:
+            if self._fechado:
+                raise RuntimeError("WAL fechado")
+            self._pendentes.append(None)
+            self._ultimo_segmento += 1
+            self._cond.notify_all()
+            return self._ultimo_segmento
+
+    def close(self) -> None:
+        with self._io:
+            self._gravar_pendentes()
+            if self.fsync == "off":
+                os.fsync(self._arquivo.fileno())
+            with self._cond:
+                self._fechado = True
+                self._cond.notify_all()
+            self._arquivo.close()
+        self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "fsync": self.fsync,
+            "segmento": self.segmento,
+            "registros": self.registros,
+            "lotes": self.lotes,
+            "bytes_no_segmento": self.bytes_no_segmento,
+        }
+
+
+class Persistence:
+    """Snapshot + WAL compartilhados pelos repositórios de usuários e de logs."""
+
+    def __init__(self, diretorio: str, fsync: str = "batch", intervalo_flush: float = 0.01,
+                 intervalo_snapshot: float = 300.0):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.fsync = fsync
+        self.intervalo_flush = intervalo_flush
+        self.intervalo_snapshot = intervalo_snapshot
+        # Serializa "aplicar em memória + acrescentar ao WAL", mantendo a ordem do WAL
+        self.lock = threading.RLock()
+        self.wal: Optional[WriteAheadLog] = None
+        self.usuarios: Optional["DurableUserStore"] = None
+        self.logs: Optional["DurableLogStore"] = None
+        self.snapshots = 0
+        self._parar = threading.Event()
+        self._compactador: Optional[threading.Thread] = None
+
+    # --- Inicialização ---
+
+    def _segmentos(self) -> List[int]:
+        numeros = []
+        for nome in os.listdir(self.diretorio):
+            if nome.startswith("wal-") and nome.endswith(".log"):
+                numeros.append(int(nome[4:-4]))
+        return sorted(numeros)
+
+    def open(self, usuarios: "DurableUserStore", logs: "DurableLogStore") -> None:
+        """Restaura o estado (snapshot + replay do WAL) e começa a registrar mutações."""
+        self.usuarios, self.logs = usuarios, logs
+        InMemoryLogStore.clear(logs)
+        # O replay trabalha sobre as tuplas por ID; os índices ordenados são
+        # montados uma vez só no fim (inserções ordenadas uma a uma são O(n²))
+        estado = {"usuarios": {}, "maior_id": 0}
+        primeiro = self._carregar_snapshot(estado)
+        segmentos = [numero for numero in self._segmentos() if numero >= primeiro]
+        for numero in segmentos:
+            for registro in iter_frames(os.path.join(self.diretorio, _nome_segmento(numero))):
+                self._aplicar(registro, estado)
+        tuplas = estado["usuarios"]
+        InMemoryUserStore.bulk_load(usuarios, map(UserRecord.from_tuple, tuplas.values()))
+        usuarios.maior_id = max(estado["maior_id"], max(tuplas, default=0))
+        usuarios.continuar_sequencia()
+        # Sempre um segmento novo: um fim truncado do anterior nunca recebe dados depois dele
+        proximo = max([primeiro - 1] + segmentos) + 1
+        self.wal = WriteAheadLog(self.diretorio, proximo, self.fsync, self.intervalo_flush)
+        if self.intervalo_snapshot > 0:
+            self._compactador = threading.Thread(target=self._loop_compactacao, name="wal-compactor",
+                                                 daemon=True)
+            self._compactador.start()
+
+    def _carregar_snapshot(self, estado: dict) -> int:
+        """Carrega o snapshot, se houver; retorna o primeiro segmento a reaplicar."""
+        caminho = os.path.join(self.diretorio, ARQUIVO_SNAPSHOT)
+        if not os.path.exists(caminho):
+            return 1
+        with open(caminho, "rb") as arquivo, \
+                mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            prefixo = len(_MAGICO_SNAPSHOT)
+            if mapa[:prefixo] != _MAGICO_SNAPSHOT:
+                raise ValueError(f"Snapshot em formato desconhecido: {caminho}")
+            if mapa[prefixo] != VERSAO_SNAPSHOT:
+                raise ValueError(f"Versão de snapshot não suportada: {mapa[prefixo]}")
+            snapshot = pickle.loads(memoryview(mapa)[prefixo + 1:])
+        estado["usuarios"] = {valores[0]: valores for valores in snapshot["usuarios"]}
+        estado["maior_id"] = snapshot["proximo_id"] - 1
+        for valores in snapshot["logs"]:
+            InMemoryLogStore.restore(self.logs, _log_de_tupla(valores))
+        return snapshot["segmento"]
+
+    def _aplicar(self, registro: tuple, estado: dict) -> None:
+        tipo = registro[0]
+        if tipo == USUARIO:
+            valores = registro[1]
+            estado["usuarios"][valores[0]] = valores  # tupla completa: reaplicar é idempotente
+            estado["maior_id"] = max(estado["maior_id"], valores[0])
+        elif tipo == EXCLUSAO:
+            estado["usuarios"].pop(registro[1], None)
+        elif tipo == LOG:
+            InMemoryLogStore.restore(self.logs, _log_de_tupla(registro[1]))
+        elif tipo == LIMPEZA_USUARIOS:
+            estado["usuarios"].clear()
+            estado["maior_id"] = 0
+        elif tipo == LIMPEZA_LOGS:
+            InMemoryLogStore.clear(self.logs)
+
+    # --- Registro de mutações ---
+
+    def record(self, registro: tuple) -> int:
+        """Acrescenta ao WAL; chamar com ``lock`` adquirido, logo após aplicar em memória."""
+        return self.wal.append(registro)
+
+    # --- Compactação ---
+
+    def snapshot(self) -> None:
+        """Grava um snapshot do estado atual e apaga os segmentos que ele tornou desnecessários."""
+        # Sob o lock só as referências e a marca de troca de segmento (sem I/O)
+        with self.lock:
+            usuarios = list(self.usuarios.values())
+            logs = list(self.logs)
+            proximo_id = self.usuarios.maior_id + 1
+            segmento = self.wal.rotate()
+        self.wal.flush()  # grava o fim do segmento anterior (com fsync) e abre o novo
+
+        # Um registro alterado depois da marca pode sair aqui já com o valor
+        # novo (ou pela metade): o replay reaplica a tupla completa do novo segmento
+        estado = {
+            "segmento": segmento,
+            "proximo_id": proximo_id,
+            "usuarios": [usuario.to_tuple() for usuario in usuarios],
+            "logs": [_log_para_tupla(entrada) for entrada in logs],
+        }
+        temporario = os.path.join(self.diretorio, ARQUIVO_SNAPSHOT + ".tmp")
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(_MAGICO_SNAPSHOT + bytes([VERSAO_SNAPSHOT]))
+            pickle.dump(estado, arquivo, protocol=PROTOCOLO_PICKLE)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, os.path.join(self.diretorio, ARQUIVO_SNAPSHOT))
+        _fsync_diretorio(self.diretorio)
+
+        for numero in self._segmentos():
+            if numero < segmento:
+                os.remove(os.path.join(self.diretorio, _nome_segmento(numero)))
+        self.snapshots += 1
+
+    def _loop_compactacao(self) -> None:
+        while not self._parar.wait(self.intervalo_snapshot):
+            self.wal.flush()
+            if self.wal.bytes_no_segmento:
+                self.snapshot()
+
+    def close(self) -> None:
+        """Para o compactador, grava um snapshot final e fecha o WAL (idempotente)."""
+        if self.wal is None or self._parar.is_set():
+            return
+        self._parar.set()
+        if self._compactador is not None:
+            self._compactador.join(timeout=30)
+        self.snapshot()
+        self.wal.close()
+
+    def stats(self) -> dict:
+        return {**self.wal.stats(), "snapshots": self.snapshots}
+
+
+def _log_para_tupla(entrada: dict) -> tuple:
+    return (entrada["id"], para_epoch(entrada["timestamp"]), entrada["usuario_id"],
+            entrada["acao"], entrada["detalhes"])
+
+
+def _log_de_tupla(valores: tuple) -> dict:
+    log_id, timestamp_us, usuario_id, acao, detalhes = valores
+    return {"id": log_id, "timestamp": de_epoch(timestamp_us), "usuario_id": usuario_id,
+            "acao": acao, "detalhes": detalhes}
+
+
+class DurableUserStore(InMemoryUserStore):
+    """Repositório de usuários em memória com cada mutação registrada no WAL."""
+
+    def __init__(self, persistencia: Persistence):
+        super().__init__()
+        self.persistencia = persistencia
+        self.maior_id = 0
+        # Com fsync a cada escrita as mutações esperam o disco: saem do event loop
+        self.bloqueante = persistencia.fsync == "always"
+
+    def _registrar(self, registro: tuple) -> int:
+        return self.persistencia.record(registro)
+
+    def continuar_sequencia(self) -> None:
+        """Após a restauração, novos IDs seguem o maior já atribuído (nunca reutilizados)."""
+        self._ids = itertools.count(self.maior_id + 1)
+
+    def insert(self, usuario) -> UserRecord:
+        with self.persistencia.lock:
+            registro = super().insert(usuario)
+            self.maior_id = max(self.maior_id, registro.id)
+            sequencia = self._registrar((USUARIO, registro.to_tuple()))
+        self.persistencia.wal.wait(sequencia)
+        return registro
+
+    def update(self, user_id: int, **campos) -> UserRecord:
+        with self.persistencia.lock:
+            registro = super().update(user_id, **campos)
+            sequencia = self._registrar((USUARIO, registro.to_tuple()))
+        self.persistencia.wal.wait(sequencia)
+        return registro
+
+    def delete(self, user_id: int) -> UserRecord:
+        with self.persistencia.lock:
+            registro = super().delete(user_id)
+            sequencia = self._registrar((EXCLUSAO, user_id))
+        self.persistencia.wal.wait(sequencia)
+        return registro
+
+    def clear(self) -> None:
+        with self.persistencia.lock:
+            super().clear()
+            self.maior_id = 0
+            if self.persistencia.wal is None:
+                return  # restauração em andamento
+            sequencia = self._registrar((LIMPEZA_USUARIOS,))
+        self.persistencia.wal.wait(sequencia)
+
+    def close(self) -> None:
+        self.persistencia.close()
+
+
+class DurableLogStore(InMemoryLogStore):
+    """Repositório de logs em memória com cada entrada registrada no WAL."""
+
+    def __init__(self, persistencia: Persistence, max_por_usuario: int = 1000, max_total: int = 100_000):
+        super().__init__(max_por_usuario=max_por_usuario, max_total=max_total)
+        self.persistencia = persistencia
+        self.bloqueante = persistencia.fsync == "always"
+
+    def add(self, usuario_id: int, acao: str, detalhes: str = "",
+            timestamp: Optional[datetime] = None) -> dict:
+        with self.persistencia.lock:
+            entrada = super().add(usuario_id, acao, detalhes, timestamp)
+            sequencia = self.persistencia.record((LOG, _log_para_tupla(entrada)))
+        self.persistencia.wal.wait(sequencia)
+        return entrada
+
+    def add_many(self, entradas) -> int:
+        # Um lote do AuditLogWriter espera um único fsync
+        quantidade, sequencia = 0, 0
+        with self.persistencia.lock:
+            for usuario_id, acao, detalhes, timestamp in entradas:
+                entrada = InMemoryLogStore.add(self, usuario_id, acao, detalhes, timestamp)
+                sequencia = self.persistencia.record((LOG, _log_para_tupla(entrada)))
+                quantidade += 1
+        self.persistencia.wal.wait(sequencia)
+        return quantidade
+
+    def clear(self) -> None:
+        with self.persistencia.lock:
+            super().clear()
+            if self.persistencia.wal is None:
+                return  # restauração em andamento
+            sequencia = self.persistencia.record((LIMPEZA_LOGS,))
+        self.persistencia.wal.wait(sequencia)
+
+    def close(self) -> None:
+        self.persistencia.close()
+
+
+def open_durable_storage(diretorio: str, fsync: str = "batch", intervalo_flush: float = 0.01,
+                         intervalo_snapshot: float = 300.0, log_max_por_usuario: int = 1000,
+                         log_max_total: int = 100_000):
+    """Cria os repositórios duráveis e restaura o estado gravado em ``diretorio``."""
+    persistencia = Persistence(diretorio, fsync, intervalo_flush, intervalo_snapshot)
+    usuarios = DurableUserStore(persistencia)
+    logs = DurableLogStore(persistencia, max_por_usuario=log_max_por_usuario, max_total=log_max_total)
+    persistencia.open(usuarios, logs)
+    return usuarios, logs
@@ -0,0 +1,510 @@
+"""
+Implementações em memória dos repositórios de usuários e de logs.
+
+O repositório de usuários mantém, além do dicionário principal
+``id -> UserRecord`` (registros compactos, ver ``storage.records``), índices secundários únicos por username e email
+(normalizados para minúsculas), de forma que todas as buscas feitas pelos
+endpoints sejam O(1). Índices ordenados por ID, idade e data de criação
+servem a paginação por cursor em O(limite + log N), e um índice de prefixos
+por campo (``storage.search``) serve a busca textual.
+
+O repositório de logs guarda as entradas de cada usuário em um buffer
+circular próprio e aplica um limite global de retenção, mantendo a memória
+limitada mesmo sob tráfego contínuo. O log global e um índice por ação são
+segmentos em ordem de chegada (``LogSegments``), consultados por janela de
+tempo com busca binária (tolerando entradas gravadas fora de ordem).
+"""
+import bisect
+import itertools
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+from storage.base import (
+    ORDEM_CRIACAO,
+    ORDEM_IDADE,
+    DuplicateKeyError,
+    LogStore,
+    UserStore,
+    normalizar_chave,
+)
+from storage.records import UserRecord, para_epoch
+from storage.search import UserSearchIndex
+
+
+class SortedIndex:
+    """Lista ordenada de chaves (tuplas terminadas pelo ID) com busca por bisect."""
+
+    def __init__(self):
+        self._chaves: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._chaves)
+
+    def add(self, chave: tuple) -> None:
+        if not self._chaves or chave > self._chaves[-1]:
+            self._chaves.append(chave)  # caso comum: IDs e datas crescentes
+        else:
+            bisect.insort(self._chaves, chave)
+
+    def remove(self, chave: tuple) -> None:
+        posicao = bisect.bisect_left(self._chaves, chave)
+        if posicao < len(self._chaves) and self._chaves[posicao] == chave:
+            del self._chaves[posicao]
+
+    def iter_from(self, minimo: Optional[tuple] = None, apos: Optional[tuple] = None) -> Iterator[tuple]:
+        """Itera a partir da primeira chave >= ``minimo`` e estritamente > ``apos``."""
+        inicio = 0
+        if minimo is not None:
+            inicio = bisect.bisect_left(self._chaves, minimo)
+        if apos is not None:
+            inicio = max(inicio, bisect.bisect_right(self._chaves, apos))
+        chaves = self._chaves
+        for posicao in range(inicio, len(chaves)):
+            if posicao >= len(chaves):
+                return  # a lista encolheu durante a iteração
+            yield chaves[posicao]
+
+    def load(self, chaves: Iterable[tuple]) -> None:
+        """Substitui o conteúdo, ordenando uma única vez (carga em massa)."""
+        self._chaves = sorted(chaves)
+
+    def clear(self) -> None:
+        self._chaves.clear()
+
+
+def _dentro_dos_filtros(usuario: UserRecord, idade_min, idade_max, criado_desde_us, criado_ate_us) -> bool:
+    idade = usuario.idade
+    if idade_min is not None and (idade is None or idade < idade_min):
+        return False
+    if idade_max is not None and (idade is None or idade > idade_max):
+        return False
+    if criado_desde_us is not None and usuario.data_criacao_us < criado_desde_us:
+        return False
+    if criado_ate_us is not None and usuario.data_criacao_us > criado_ate_us:
+        return False
+    return True
+
+
+class InMemoryUserStore(UserStore):
+    """Repositório de usuários em memória com índices por username e email."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._usuarios: Dict[int, UserRecord] = {}
+        self._por_username: Dict[str, int] = {}
+        self._por_email: Dict[str, int] = {}
+        self._ordem_id = SortedIndex()
+        self._ordem_idade = SortedIndex()
+        self._ordem_criacao = SortedIndex()
+        self._busca = UserSearchIndex()
+        self._com_login = 0
+
+    # --- Acesso estilo dicionário (compatível com o antigo db_usuarios) ---
+
+    def __len__(self) -> int:
+        return len(self._usuarios)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._usuarios
+
+    def __getitem__(self, user_id: int) -> UserRecord:
+        return self._usuarios[user_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._usuarios)
+
+    def values(self):
+        return self._usuarios.values()
+
+    # --- Consultas ---
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Busca usuário pelo ID."""
+        return self._usuarios.get(user_id)
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Busca usuário pelo username (O(1))."""
+        user_id = self._por_username.get(normalizar_chave(username))
+        return None if user_id is None else self._usuarios[user_id]
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Busca usuário pelo email (O(1))."""
+        user_id = self._por_email.get(normalizar_chave(email))
+        return None if user_id is None else self._usuarios[user_id]
+
+    def get_many(self, ids) -> List[UserRecord]:
+        """Busca vários usuários pelo ID (ignora os inexistentes)."""
+        usuarios = self._usuarios
+        return [usuarios[user_id] for user_id in dict.fromkeys(ids) if user_id in usuarios]
+
+    def get_many_by_username(self, usernames) -> List[UserRecord]:
+        """Busca vários usuários pelo username (ignora os inexistentes)."""
+        ids = (self._por_username.get(normalizar_chave(username)) for username in usernames)
+        return self.get_many(user_id for user_id in ids if user_id is not None)
+
+    # --- Escrita ---
+
+    def insert(self, usuario) -> UserRecord:
+        """Insere um novo usuário (atribuindo o ID), garantindo unicidade de username e email."""
+        registro = usuario if isinstance(usuario, UserRecord) else UserRecord.from_dict(usuario)
+        chave_username = normalizar_chave(registro.username)
+        chave_email = normalizar_chave(registro.email)
+        if chave_username in self._por_username:
+            raise DuplicateKeyError("username", registro.username)
+        if chave_email in self._por_email:
+            raise DuplicateKeyError("email", registro.email)
+
+        if registro.id is None:
+            registro.id = next(self._ids)
+        user_id = registro.id
+        self._usuarios[user_id] = registro
+        self._por_username[chave_username] = user_id
+        self._por_email[chave_email] = user_id
+        self._ordem_id.add((user_id,))
+        if registro.idade is not None:
+            self._ordem_idade.add((registro.idade, user_id))
+        self._ordem_criacao.add((registro.data_criacao_us, user_id))
+        self._busca.add(registro)
+        if registro.ultimo_login_us is not None:
+            self._com_login += 1
+        return registro
+
+    def update(self, user_id: int, **campos) -> UserRecord:
+        """Atualiza campos de um usuário mantendo os índices consistentes."""
+        registro = self._usuarios[user_id]
+
+        for campo, indice in (("username", self._por_username), ("email", self._por_email)):
+            novo_valor = campos.get(campo)
+            if novo_valor is None:
+                continue
+            chave_nova = normalizar_chave(novo_valor)
+            dono = indice.get(chave_nova)
+            if dono is not None and dono != user_id:
+                raise DuplicateKeyError(campo, novo_valor)
+
+        for campo, indice in (("username", self._por_username), ("email", self._por_email)):
+            novo_valor = campos.get(campo)
+            if novo_valor is not None:
+                del indice[normalizar_chave(getattr(registro, campo))]
+                indice[normalizar_chave(novo_valor)] = user_id
+
+        if "idade" in campos and campos["idade"] != registro.idade:
+            if registro.idade is not None:
+                self._ordem_idade.remove((registro.idade, user_id))
+            if campos["idade"] is not None:
+                self._ordem_idade.add((campos["idade"], user_id))
+
+        self._busca.update(registro, campos)
+
+        if "ultimo_login" in campos:
+            self._com_login += (campos["ultimo_login"] is not None) - (registro.ultimo_login_us is not None)
+
+        for campo, valor in campos.items():
+            setattr(registro, campo, valor)
+        return registro
+
+    def delete(self, user_id: int) -> UserRecord:
+        """Remove um usuário e suas entradas nos índices."""
+        registro = self._usuarios.pop(user_id)
+        del self._por_username[normalizar_chave(registro.username)]
+        del self._por_email[normalizar_chave(registro.email)]
+        self._ordem_id.remove((user_id,))
+        if registro.idade is not None:
+            self._ordem_idade.remove((registro.idade, user_id))
+        self._ordem_criacao.remove((registro.data_criacao_us, user_id))
+        self._busca.remove(registro)
+        if registro.ultimo_login_us is not None:
+            self._com_login -= 1
+        return registro
+
+    def list_page(self, offset: int, limite: int) -> List[UserRecord]:
+        """Retorna uma página de usuários em ordem de cadastro, sem copiar a tabela."""
+        return list(itertools.islice(self._usuarios.values(), offset, offset + limite))
+
+    def page(self, limite, ordem="id", apos=None, idade_min=None, idade_max=None,
+             criado_desde=None, criado_ate=None) -> List[UserRecord]:
+        """Página keyset servida pelo índice ordenado da ordenação escolhida."""
+        # O índice de criação guarda as datas como inteiros (ver UserRecord)
+        criado_desde, criado_ate = para_epoch(criado_desde), para_epoch(criado_ate)
+        if ordem == ORDEM_IDADE:
+            chaves = self._ordem_idade.iter_from((idade_min,) if idade_min is not None else None, apos)
+            maximo = idade_max
+        elif ordem == ORDEM_CRIACAO:
+            if apos is not None:
+                apos = (para_epoch(apos[0]), apos[1])
+            chaves = self._ordem_criacao.iter_from((criado_desde,) if criado_desde is not None else None, apos)
+            maximo = criado_ate
+        else:
+            chaves = self._ordem_id.iter_from(None, apos)
+            maximo = None
+
+        pagina = []
+        if limite <= 0:
+            return pagina
+        for chave in chaves:
+            if maximo is not None and chave[0] > maximo:
+                break
+            usuario = self._usuarios.get(chave[-1])
+            if usuario is None:
+                continue
+            if _dentro_dos_filtros(usuario, idade_min, idade_max, criado_desde, criado_ate):
+                pagina.append(usuario)
+                if len(pagina) >= limite:
+                    break
+        return pagina
+
+    def iter_search_terms(self, campo, prefixo, apos=None) -> Iterator[tuple]:
+        """Faixa do índice de prefixos do campo (mantido a cada escrita)."""
+        return self._busca.iter_terms(campo, prefixo, apos)
+
+    def count_logged_in(self) -> int:
+        """Quantidade de usuários que já fizeram login (contador incremental, O(1))."""
+        return self._com_login
+
+    def bulk_load(self, registros: Iterable[UserRecord], proximo_id: int = 1) -> None:
+        """
+        Substitui o conteúdo por ``registros`` (já válidos e únicos), montando
+        os índices ordenados com uma ordenação só, em vez de uma inserção
+        ordenada por usuário. Usado na restauração de snapshots.
+        """
+        self.clear()
+        usuarios, por_username, por_email = self._usuarios, self._por_username, self._por_email
+        for registro in registros:
+            usuarios[registro.id] = registro
+            por_username[normalizar_chave(registro.username)] = registro.id
+            por_email[normalizar_chave(registro.email)] = registro.id
+            if registro.ultimo_login_us is not None:
+                self._com_login += 1
+        self._ordem_id.load((user_id,) for user_id in usuarios)
+        self._ordem_idade.load((r.idade, r.id) for r in usuarios.values() if r.idade is not None)
+        self._ordem_criacao.load((r.data_criacao_us, r.id) for r in usuarios.values())
+        self._busca.load(usuarios.values())
+        self._ids = itertools.count(max(proximo_id, max(usuarios, default=0) + 1))
+
+    def clear(self) -> None:
+        """Remove todos os usuários (usado principalmente nos testes)."""
+        self._usuarios.clear()
+        self._por_username.clear()
+        self._por_email.clear()
+        self._ordem_id.clear()
+        self._ordem_idade.clear()
+        self._ordem_criacao.clear()
+        self._busca.clear()
+        self._com_login = 0
+        self._ids = itertools.count(1)
+
+
+def _log_id(entrada: dict) -> int:
+    return entrada["id"]
+
+
+class LogSegments:
+    """
+    Entradas de log em ordem de chegada (IDs crescentes), divididas em
+    segmentos de tamanho fixo; a retenção descarta do início sem deslocar o
+    restante. Os timestamps quase sempre crescem com os IDs, mas lotes
+    gravados concorrentemente podem chegar fora de ordem: a busca binária
+    usa o maior timestamp visto até cada posição (crescente por construção)
+    e ``desordem`` guarda o maior atraso observado, que limita quanto é
+    preciso ler além do fim de uma janela.
+    """
+
+    TAMANHO_SEGMENTO = 1024
+
+    def __init__(self):
+        self._segmentos: List[List[Optional[dict]]] = []
+        self._maximos: List[List[datetime]] = []  # maior timestamp até cada posição
+        self._inicio = 0  # entradas já descartadas do primeiro segmento
+        self._tamanho = 0
+        self.desordem = timedelta(0)
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def __iter__(self) -> Iterator[dict]:
+        for indice, segmento in enumerate(self._segmentos):
+            yield from itertools.islice(segmento, self._inicio if indice == 0 else 0, None)
+
+    def append(self, entrada: dict) -> None:
+        maior = timestamp = entrada["timestamp"]
+        if self._maximos and timestamp < self._maximos[-1][-1]:
+            maior = self._maximos[-1][-1]
+            self.desordem = max(self.desordem, maior - timestamp)
+        if not self._segmentos or len(self._segmentos[-1]) >= self.TAMANHO_SEGMENTO:
+            self._segmentos.append([])
+            self._maximos.append([])
+        self._segmentos[-1].append(entrada)
+        self._maximos[-1].append(maior)
+        self._tamanho += 1
+
+    def popleft(self) -> dict:
+        primeiro = self._segmentos[0]
+        entrada = primeiro[self._inicio]
+        primeiro[self._inicio] = None  # libera a referência antes de o segmento inteiro sair
+        self._inicio += 1
+        self._tamanho -= 1
+        if self._inicio == len(primeiro):
+            del self._segmentos[0]
+            del self._maximos[0]
+            self._inicio = 0
+        return entrada
+
+    def iter_from(self, desde: Optional[datetime] = None, apos_id: Optional[int] = None) -> Iterator[dict]:
+        """
+        Itera a partir da primeira posição que pode ter timestamp >= ``desde``
+        e ID > ``apos_id``; entradas atrasadas anteriores a ``desde`` ainda
+        podem aparecer (quem consome filtra pelo timestamp).
+        """
+        segmentos, maximos = self._segmentos, self._maximos
+        indice = 0
+        if desde is not None:
+            indice = bisect.bisect_left(maximos, desde, key=lambda maiores: maiores[-1])
+        if apos_id is not None:
+            indice = max(indice, bisect.bisect_right(segmentos, apos_id, key=lambda segmento: segmento[-1]["id"]))
+        for atual in range(indice, len(segmentos)):
+            segmento = segmentos[atual]
+            inicio = self._inicio if atual == 0 else 0
+            if atual == indice:
+                if desde is not None:
+                    inicio = bisect.bisect_left(maximos[atual], desde, inicio)
+                if apos_id is not None:
+                    inicio = max(inicio, bisect.bisect_right(segmento, apos_id, inicio, key=_log_id))
+            yield from itertools.islice(segmento, inicio, None)
+
+    def clear(self) -> None:
+        self._segmentos.clear()
+        self._maximos.clear()
+        self._inicio = 0
+        self._tamanho = 0
+        self.desordem = timedelta(0)
+
+
+class InMemoryLogStore(LogStore):
+    """Repositório de logs com buffer circular por usuário e retenção global."""
+
+    def __init__(self, max_por_usuario: int = 1000, max_total: int = 100_000):
+        self.max_por_usuario = max_por_usuario
+        self.max_total = max_total
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ordem = LogSegments()
+        self._por_usuario: Dict[int, Deque[dict]] = {}
+        self._por_acao: Dict[str, LogSegments] = {}
+
+    def __len__(self) -> int:
+        return len(self._ordem)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._ordem)
+
+    def add(self, usuario_id: int, acao: str, detalhes: str = "",
+            timestamp: Optional[datetime] = None) -> dict:
+        """Registra uma entrada com ID monotônico e aplica os limites de retenção."""
+        with self._lock:
+            entrada = {
+                "id": next(self._ids),
+                "timestamp": timestamp or datetime.now(),
+                "usuario_id": usuario_id,
+                "acao": acao,
+                "detalhes": detalhes,
+            }
+            self._append(entrada)
+            return entrada
+
+    def restore(self, entrada: dict) -> None:
+        """Reinsere uma entrada com o ID original (restauração de snapshot/WAL)."""
+        with self._lock:
+            self._append(entrada)
+            self._ids = itertools.count(entrada["id"] + 1)
+
+    def _append(self, entrada: dict) -> None:
+        """Adiciona aos buffers e índices e aplica a retenção (chamar com o lock adquirido)."""
+        usuario_id, acao = entrada["usuario_id"], entrada["acao"]
+        logs_usuario = self._por_usuario.get(usuario_id)
+        if logs_usuario is None:
+            logs_usuario = deque(maxlen=self.max_por_usuario)
+            self._por_usuario[usuario_id] = logs_usuario
+        logs_usuario.append(entrada)
+        self._ordem.append(entrada)
+        logs_acao = self._por_acao.get(acao)
+        if logs_acao is None:
+            logs_acao = self._por_acao[acao] = LogSegments()
+        logs_acao.append(entrada)
+
+        while len(self._ordem) > self.max_total:
+            self._descartar_mais_antigo()
+
+    def _descartar_mais_antigo(self) -> None:
+        """Remove a entrada mais antiga do log global, do índice da ação e do buffer do usuário."""
+        antiga = self._ordem.popleft()
+        logs_acao = self._por_acao[antiga["acao"]]
+        logs_acao.popleft()  # a mais antiga no geral é também a mais antiga da sua ação
+        if not logs_acao:
+            del self._por_acao[antiga["acao"]]
+        logs_usuario = self._por_usuario.get(antiga["usuario_id"])
+        if logs_usuario and logs_usuario[0] is antiga:
+            logs_usuario.popleft()
+            if not logs_usuario:
+                del self._por_usuario[antiga["usuario_id"]]
+
+    def recent(self, usuario_id: int, limite: int) -> List[dict]:
+        """Retorna as ``limite`` entradas mais recentes do usuário, em ordem cronológica (O(limite))."""
+        if limite <= 0:
+            return []
+        with self._lock:
+            logs_usuario = self._por_usuario.get(usuario_id)
+            if not logs_usuario:
+                return []
+            ultimas = list(itertools.islice(reversed(logs_usuario), limite))
+        ultimas.reverse()
+        return ultimas
+
+    def page(self, limite: int, apos_id: Optional[int] = None, usuario_id: Optional[int] = None,
+             acao: Optional[str] = None, desde: Optional[datetime] = None,
+             ate: Optional[datetime] = None) -> List[dict]:
+        """
+        Percorre só a sequência mais restrita (buffer do usuário, índice da
+        ação ou log global) a partir da posição de ``desde``/``apos_id``, até
+        ``ate`` mais o maior atraso já observado entre os timestamps.
+        """
+        if limite <= 0:
+            return []
+        with self._lock:
+            fim_leitura = ate + self._ordem.desordem if ate is not None else None
+            if usuario_id is not None:
+                logs_usuario = self._por_usuario.get(usuario_id, ())
+                inicio = bisect.bisect_right(logs_usuario, apos_id, key=_log_id) if apos_id is not None else 0
+                candidatas = itertools.islice(logs_usuario, inicio, None)  # até max_por_usuario entradas
+            elif acao is not None:
+                logs_acao = self._por_acao.get(acao)
+                candidatas = logs_acao.iter_from(desde, apos_id) if logs_acao is not None else iter(())
+            else:
+                candidatas = self._ordem.iter_from(desde, apos_id)
+            pagina = []
+            for entrada in candidatas:
+                timestamp = entrada["timestamp"]
+                if fim_leitura is not None and timestamp > fim_leitura:
+                    break  # nenhuma entrada posterior pode estar dentro da janela
+                if (desde is not None and timestamp < desde) or (ate is not None and timestamp > ate):
+                    continue
+                if acao is not None and entrada["acao"] != acao:
+                    continue
+                pagina.append(entrada)
+                if len(pagina) == limite:
+                    break
+            return pagina
+
+    def count_by_action(self) -> Dict[str, int]:
+        """Quantidade de entradas retidas por ação (contadores incrementais)."""
+        with self._lock:
+            return {acao: len(logs_acao) for acao, logs_acao in self._por_acao.items()}
+
+    def clear(self) -> None:
+        """Remove todas as entradas e reinicia a sequência de IDs."""
+        with self._lock:
+            self._ordem.clear()
+            self._por_usuario.clear()
+            self._por_acao.clear()
+            self._ids = itertools.count(1)
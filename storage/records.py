@@ -0,0 +1,126 @@
+"""
+Registro compacto de usuário usado pelos repositórios.
+
+Cada usuário era um ``dict`` com oito chaves, dois ``datetime`` e o hash
+bcrypt como ``str``; com milhões de usuários o overhead por dicionário
+dominava o consumo de memória. ``UserRecord`` usa ``__slots__`` (sem
+``__dict__`` por instância), guarda as datas como inteiros (microssegundos
+desde a época, sem fuso, como os ``datetime`` locais da aplicação) e o hash
+como ``bytes``. As datas e o hash continuam disponíveis como ``datetime`` e
+``str`` por propriedades, criadas só quando lidas.
+
+O acesso estilo dicionário (``usuario["id"]``, ``usuario.get(...)``) é
+mantido para o código existente; ``UserResponse`` lê os atributos
+diretamente (``from_attributes``), sem montar um dicionário intermediário.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Optional, Union
+
+EPOCA = datetime(1970, 1, 1)
+_MICROSSEGUNDO = timedelta(microseconds=1)
+
+
+def para_epoch(valor: Optional[datetime]) -> Optional[int]:
+    """Converte um ``datetime`` local (naive) em microssegundos desde a época, sem perda."""
+    if valor is None:
+        return None
+    if valor.tzinfo is not None:
+        valor = valor.astimezone().replace(tzinfo=None)
+    return (valor - EPOCA) // _MICROSSEGUNDO
+
+
+def de_epoch(valor: Optional[int]) -> Optional[datetime]:
+    """Inverso de :func:`para_epoch`."""
+    return None if valor is None else EPOCA + timedelta(microseconds=valor)
+
+
+class UserRecord:
+    """Usuário armazenado; atributos públicos espelham as chaves do antigo dicionário."""
+
+    __slots__ = ("id", "username", "email", "nome_completo", "idade",
+                 "hash_bytes", "data_criacao_us", "ultimo_login_us")
+
+    CAMPOS = ("id", "username", "email", "nome_completo", "idade",
+              "hashed_password", "data_criacao", "ultimo_login")
+
+    def __init__(self, id: Optional[int], username: str, email: str, nome_completo: Optional[str],
+                 idade: Optional[int], hashed_password: Union[str, bytes], data_criacao: datetime,
+                 ultimo_login: Optional[datetime] = None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.nome_completo = nome_completo
+        self.idade = idade
+        self.hashed_password = hashed_password
+        self.data_criacao = data_criacao
+        self.ultimo_login = ultimo_login
+
+    @classmethod
+    def from_dict(cls, dados: dict) -> "UserRecord":
+        """Cria o registro a partir do dicionário usado pelos endpoints e importações."""
+        return cls(
+            dados.get("id"), dados["username"], dados["email"], dados.get("nome_completo"),
+            dados.get("idade"), dados["hashed_password"], dados["data_criacao"], dados.get("ultimo_login"),
+        )
+
+    @classmethod
+    def from_tuple(cls, valores: tuple) -> "UserRecord":
+        """Recria o registro a partir de :meth:`to_tuple`, sem conversões (restauração em massa)."""
+        registro = cls.__new__(cls)
+        (registro.id, registro.username, registro.email, registro.nome_completo, registro.idade,
+         registro.hash_bytes, registro.data_criacao_us, registro.ultimo_login_us) = valores
+        return registro
+
+    def to_tuple(self) -> tuple:
+        """Valores armazenados, na ordem de ``__slots__`` (usado na persistência)."""
+        return (self.id, self.username, self.email, self.nome_completo, self.idade,
+                self.hash_bytes, self.data_criacao_us, self.ultimo_login_us)
+
+    # --- Visões convertidas sob demanda ---
+
+    @property
+    def hashed_password(self) -> str:
+        return self.hash_bytes.decode("ascii")
+
+    @hashed_password.setter
+    def hashed_password(self, valor: Union[str, bytes]) -> None:
+        self.hash_bytes = valor.encode("ascii") if isinstance(valor, str) else bytes(valor)
+
+    @property
+    def data_criacao(self) -> datetime:
+        return de_epoch(self.data_criacao_us)
+
+    @data_criacao.setter
+    def data_criacao(self, valor: datetime) -> None:
+        self.data_criacao_us = para_epoch(valor)
+
+    @property
+    def ultimo_login(self) -> Optional[datetime]:
+        return de_epoch(self.ultimo_login_us)
+
+    @ultimo_login.setter
+    def ultimo_login(self, valor: Optional[datetime]) -> None:
+        self.ultimo_login_us = para_epoch(valor)
+
+    # --- Compatibilidade com o acesso estilo dicionário ---
+
+    def __getitem__(self, campo: str) -> Any:
+        if campo not in self.CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo: str, padrao: Any = None) -> Any:
+        return getattr(self, campo) if campo in self.CAMPOS else padrao
+
+    def to_dict(self) -> dict:
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    def __eq__(self, outro) -> bool:
+        if not isinstance(outro, UserRecord):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(outro, campo) for campo in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"UserRecord(id={self.id!r}, username={self.username!r})"
@@ -0,0 +1,287 @@
+"""
+Busca de usuários por prefixo em username, nome completo e email.
+
+Os termos são normalizados sem acentos e sem diferenciar caixa (``"João"``
+e ``"JOAO"`` viram ``"joao"``): o username inteiro, cada palavra do nome e
+o email inteiro e o seu domínio. Cada backend mantém, por campo, um índice
+ordenado de pares ``(termo, id)``; os termos que começam com um prefixo
+formam uma faixa contígua, percorrida a partir de uma busca binária.
+
+Ranking: username, depois nome, depois email; dentro de cada campo o termo
+exato vem primeiro (é o menor da faixa), seguido dos demais em ordem
+alfabética e, em empate, pelo ID. Cada usuário aparece só na primeira
+posição em que casaria, o que permite paginar sem guardar estado: o cursor
+é a chave ``(campo, termo, id)`` em que a página parou.
+
+Consultas com várias palavras: a mais seletiva (menos pares no índice)
+percorre o índice e as demais filtram (cada uma precisa ser prefixo de algum
+termo do usuário).
+"""
+import bisect
+import itertools
+import re
+import unicodedata
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from storage.records import UserRecord
+
+# Campos pesquisados, na ordem do ranking; a posição é o "campo" do cursor
+CAMPOS_BUSCA = ("username", "nome_completo", "email")
+MAX_EXAMINADOS = 10_000  # candidatos examinados por página (consultas com filtros seletivos)
+AMOSTRA_SELETIVIDADE = 256  # pares contados por palavra ao escolher a que percorre o índice
+
+IterTermos = Callable[[int, str, Optional[tuple]], Iterator[Tuple[str, int]]]
+
+_PALAVRA = re.compile(r"\w+")
+_PONTUACAO = ".,;:!?\"'()[]"
+
+
+def normalizar_busca(texto: str) -> str:
+    """Minúsculas e sem acentos (``"Conceição"`` -> ``"conceicao"``)."""
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def termos(campo: int, valor: Optional[str]) -> List[str]:
+    """Termos indexados de um campo (posição em ``CAMPOS_BUSCA``), sem repetição."""
+    if not valor:
+        return []
+    normalizado = normalizar_busca(valor)
+    if campo == 1:
+        return sorted(set(_PALAVRA.findall(normalizado)))
+    if campo == 2:
+        dominio = normalizado.partition("@")[2]
+        return [normalizado, dominio] if dominio and dominio != normalizado else [normalizado]
+    return [normalizado]
+
+
+def termos_do_usuario(usuario: UserRecord) -> List[List[str]]:
+    return [termos(campo, getattr(usuario, nome)) for campo, nome in enumerate(CAMPOS_BUSCA)]
+
+
+def palavras_da_consulta(consulta: str) -> List[str]:
+    """Palavras normalizadas da consulta, sem repetição (separadas por espaços)."""
+    palavras = (palavra.strip(_PONTUACAO) for palavra in normalizar_busca(consulta).split())
+    return list(dict.fromkeys(palavra for palavra in palavras if palavra))
+
+
+def buscar(iter_termos: IterTermos,
+           obter: Callable[[int], Optional[UserRecord]], consulta: str, limite: int,
+           apos: Optional[tuple] = None,
+           max_examinados: int = MAX_EXAMINADOS) -> Tuple[List[UserRecord], Optional[tuple]]:
+    """
+    Página de resultados ranqueados e o cursor da próxima (``None`` no fim).
+
+    ``iter_termos(campo, prefixo, apos)`` percorre os pares ``(termo, id)``
+    do índice do campo cujo termo começa com ``prefixo``, em ordem, após a
+    chave ``apos``; ``obter`` busca o registro pelo ID.
+    """
+    palavras = palavras_da_consulta(consulta)
+    if not palavras or limite <= 0:
+        return [], None
+    principal = _mais_seletiva(iter_termos, palavras)
+    demais = [palavra for palavra in palavras if palavra != principal]
+    campo_inicial, chave = (apos[0], apos[1:]) if apos is not None else (0, None)
+
+    encontrados: List[Tuple[UserRecord, tuple]] = []
+    examinados = 0
+    for campo in range(campo_inicial, len(CAMPOS_BUSCA)):
+        for termo, user_id in iter_termos(campo, principal, chave if campo == campo_inicial else None):
+            examinados += 1
+            usuario = obter(user_id)
+            if usuario is not None and _casa(usuario, campo, termo, principal, demais):
+                encontrados.append((usuario, (campo, termo, user_id)))
+                if len(encontrados) > limite:
+                    return [usuario for usuario, _ in encontrados[:limite]], encontrados[limite - 1][1]
+            if examinados >= max_examinados:
+                return [usuario for usuario, _ in encontrados], (campo, termo, user_id)
+    return [usuario for usuario, _ in encontrados], None
+
+
+def _mais_seletiva(iter_termos: IterTermos, palavras: List[str], teto: int = AMOSTRA_SELETIVIDADE) -> str:
+    """A palavra com menos pares no índice (contados até ``teto``); empate: a mais longa."""
+    if len(palavras) == 1:
+        return palavras[0]
+    melhor, menor = max(palavras, key=len), teto
+    for palavra in sorted(palavras, key=len, reverse=True):
+        contagem = 0
+        for campo in range(len(CAMPOS_BUSCA)):
+            contagem += sum(1 for _ in itertools.islice(iter_termos(campo, palavra, None), menor - contagem))
+            if contagem >= menor:
+                break
+        if contagem < menor:
+            melhor, menor = palavra, contagem
+    return melhor
+
+
+def _casa(usuario: UserRecord, campo: int, termo: str, principal: str, demais: List[str]) -> bool:
+    """O usuário casa com a consulta e ``termo`` é a primeira posição dele no ranking."""
+    if campo == 0 and not demais:
+        return normalizar_busca(usuario.username) == termo  # caso comum: sem recalcular termos
+    por_campo = termos_do_usuario(usuario)
+    for anterior in range(campo):
+        if any(t.startswith(principal) for t in por_campo[anterior]):
+            return False  # já apareceu em um campo anterior
+    no_campo = [t for t in por_campo[campo] if t.startswith(principal)]
+    if not no_campo or no_campo[0] != termo:
+        return False  # índice desatualizado, ou não é o menor termo do usuário neste campo
+    todos = [t for lista in por_campo for t in lista]
+    return all(any(t.startswith(palavra) for t in todos) for palavra in demais)
+
+
+class PrefixIndex:
+    """
+    Termos distintos em ordem (em blocos, para inserções baratas) e, para
+    cada termo, os IDs que o contêm (um ``int``, ou lista ordenada se vários).
+    """
+
+    TAMANHO_BLOCO = 512
+
+    def __init__(self):
+        self._blocos: List[List[str]] = []
+        self._maximos: List[str] = []
+        self._ids: Dict[str, Union[int, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, termo: str, user_id: int) -> None:
+        atual = self._ids.get(termo)
+        if atual is None:
+            self._ids[termo] = user_id
+            self._inserir_termo(termo)
+        elif isinstance(atual, int):
+            if atual != user_id:
+                self._ids[termo] = sorted((atual, user_id))
+        else:
+            posicao = bisect.bisect_left(atual, user_id)
+            if posicao == len(atual) or atual[posicao] != user_id:
+                atual.insert(posicao, user_id)
+
+    def remove(self, termo: str, user_id: int) -> None:
+        atual = self._ids.get(termo)
+        if atual is None:
+            return
+        if isinstance(atual, int):
+            if atual == user_id:
+                del self._ids[termo]
+                self._remover_termo(termo)
+            return
+        posicao = bisect.bisect_left(atual, user_id)
+        if posicao < len(atual) and atual[posicao] == user_id:
+            del atual[posicao]
+            if len(atual) == 1:
+                self._ids[termo] = atual[0]
+
+    def _inserir_termo(self, termo: str) -> None:
+        if not self._blocos:
+            self._blocos.append([termo])
+            self._maximos.append(termo)
+            return
+        indice = min(bisect.bisect_left(self._maximos, termo), len(self._blocos) - 1)
+        bloco = self._blocos[indice]
+        bisect.insort(bloco, termo)
+        self._maximos[indice] = bloco[-1]
+        if len(bloco) > 2 * self.TAMANHO_BLOCO:
+            metade = self.TAMANHO_BLOCO
+            self._blocos[indice:indice + 1] = [bloco[:metade], bloco[metade:]]
+            self._maximos[indice:indice + 1] = [bloco[metade - 1], bloco[-1]]
+
+    def _remover_termo(self, termo: str) -> None:
+        indice = bisect.bisect_left(self._maximos, termo)
+        bloco = self._blocos[indice]
+        del bloco[bisect.bisect_left(bloco, termo)]
+        if bloco:
+            self._maximos[indice] = bloco[-1]
+        else:
+            del self._blocos[indice]
+            del self._maximos[indice]
+
+    def iter_prefix(self, prefixo: str, apos: Optional[tuple] = None) -> Iterator[Tuple[str, int]]:
+        """Pares ``(termo, id)`` com termo começando por ``prefixo``, em ordem, após ``apos``."""
+        inicio = prefixo if apos is None or apos[0] < prefixo else apos[0]
+        indice = bisect.bisect_left(self._maximos, inicio)
+        while indice < len(self._blocos):
+            bloco = self._blocos[indice]
+            for posicao in range(bisect.bisect_left(bloco, inicio), len(bloco)):
+                termo = bloco[posicao]
+                if not termo.startswith(prefixo):
+                    return
+                ids = self._ids.get(termo)
+                if ids is None:
+                    continue  # removido durante a iteração
+                if isinstance(ids, int):
+                    ids = (ids,)
+                if apos is not None and termo == apos[0]:
+                    ids = ids[bisect.bisect_right(ids, apos[1]):]
+                for user_id in ids:
+                    yield termo, user_id
+            indice += 1
+
+    def load(self, pares: Iterable[Tuple[str, int]]) -> None:
+        """Substitui o conteúdo, ordenando uma única vez (carga em massa)."""
+        por_termo: Dict[str, Union[int, List[int]]] = {}
+        for termo, user_id in pares:
+            atual = por_termo.get(termo)
+            if atual is None:
+                por_termo[termo] = user_id
+            elif isinstance(atual, int):
+                por_termo[termo] = [atual, user_id]
+            else:
+                atual.append(user_id)
+        for termo, ids in por_termo.items():
+            if not isinstance(ids, int):
+                ids.sort()
+        ordenados = sorted(por_termo)
+        self._ids = por_termo
+        self._blocos = [ordenados[i:i + self.TAMANHO_BLOCO] for i in range(0, len(ordenados), self.TAMANHO_BLOCO)]
+        self._maximos = [bloco[-1] for bloco in self._blocos]
+
+    def clear(self) -> None:
+        self._blocos, self._maximos, self._ids = [], [], {}
+
+
+class UserSearchIndex:
+    """Índices de prefixo dos três campos pesquisáveis, mantidos a cada escrita."""
+
+    def __init__(self):
+        self._indices = [PrefixIndex() for _ in CAMPOS_BUSCA]
+
+    def add(self, usuario: UserRecord) -> None:
+        for indice, lista in zip(self._indices, termos_do_usuario(usuario)):
+            for termo in lista:
+                indice.add(termo, usuario.id)
+
+    def remove(self, usuario: UserRecord) -> None:
+        for indice, lista in zip(self._indices, termos_do_usuario(usuario)):
+            for termo in lista:
+                indice.remove(termo, usuario.id)
+
+    def update(self, usuario: UserRecord, campos: dict) -> None:
+        """Reindexa os campos pesquisáveis alterados (chamar antes de aplicá-los ao registro)."""
+        for campo, nome in enumerate(CAMPOS_BUSCA):
+            if nome not in campos:
+                continue
+            antigos = set(termos(campo, getattr(usuario, nome)))
+            novos = set(termos(campo, campos[nome]))
+            for termo in antigos - novos:
+                self._indices[campo].remove(termo, usuario.id)
+            for termo in novos - antigos:
+                self._indices[campo].add(termo, usuario.id)
+
+    def iter_terms(self, campo: int, prefixo: str, apos: Optional[tuple] = None) -> Iterator[Tuple[str, int]]:
+        return self._indices[campo].iter_prefix(prefixo, apos)
+
+    def load(self, usuarios: Iterable[UserRecord]) -> None:
+        pares: List[List[Tuple[str, int]]] = [[] for _ in CAMPOS_BUSCA]
+        for usuario in usuarios:
+            for campo, lista in enumerate(termos_do_usuario(usuario)):
+                pares[campo].extend((termo, usuario.id) for termo in lista)
+        for indice, lista in zip(self._indices, pares):
+            indice.load(lista)
+
+    def clear(self) -> None:
+        for indice in self._indices:
+            indice.clear()
@@ -0,0 +1,587 @@
+"""
+Backend SQLite para usuários e logs.
+
+Pensado para vários workers (processos) compartilhando o mesmo arquivo:
+
+- modo WAL, permitindo leituras concorrentes durante escritas;
+- colunas ``username_key``/``email_key`` normalizadas com índice único,
+  garantindo unicidade entre processos;
+- índice de busca por prefixo na tabela ``busca_termos`` (ver
+  ``storage.search``), percorrido pela chave primária;
+- uma conexão por thread (``threading.local``), reaproveitada entre
+  requisições, com o cache de statements preparados do módulo ``sqlite3``.
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from storage.base import (
+    ORDEM_CRIACAO,
+    ORDEM_IDADE,
+    DuplicateKeyError,
+    LogStore,
+    UserStore,
+    normalizar_chave,
+)
+from storage.records import UserRecord
+from storage.search import CAMPOS_BUSCA, termos, termos_do_usuario
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    username_key TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL,
+    nome_completo TEXT,
+    idade INTEGER,
+    hashed_password TEXT NOT NULL,
+    data_criacao TEXT NOT NULL,
+    ultimo_login TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_usuarios_username_key ON usuarios(username_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_usuarios_email_key ON usuarios(email_key);
+CREATE INDEX IF NOT EXISTS idx_usuarios_idade ON usuarios(idade, id);
+CREATE INDEX IF NOT EXISTS idx_usuarios_data_criacao ON usuarios(data_criacao, id);
+
+-- Índice de busca por prefixo: termos normalizados (sem acento/caixa) de cada campo
+-- pesquisável, gravados pela aplicação na mesma transação da escrita do usuário
+CREATE TABLE IF NOT EXISTS busca_termos (
+    campo INTEGER NOT NULL,
+    termo TEXT NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    PRIMARY KEY (campo, termo, usuario_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    acao TEXT NOT NULL,
+    detalhes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_logs_usuario ON logs(usuario_id, id);
+CREATE INDEX IF NOT EXISTS idx_logs_acao ON logs(acao, id);
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp);
+
+-- Agregados mantidos por triggers: /stats lê uma linha em vez de varrer as tabelas.
+-- As linhas iniciais são semeadas a partir dos dados existentes (bancos anteriores).
+CREATE TABLE IF NOT EXISTS contadores (
+    nome TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO contadores SELECT 'usuarios', COUNT(*) FROM usuarios;
+INSERT OR IGNORE INTO contadores
+    SELECT 'usuarios_com_login', COUNT(*) FROM usuarios WHERE ultimo_login IS NOT NULL;
+INSERT OR IGNORE INTO contadores SELECT 'logs', COUNT(*) FROM logs;
+INSERT OR IGNORE INTO contadores SELECT 'acao:' || acao, COUNT(*) FROM logs GROUP BY acao;
+-- Maior atraso (us) de um log em relação ao maior timestamp já gravado antes dele
+INSERT OR IGNORE INTO contadores
+    SELECT 'logs_desordem_us', COALESCE(MAX(CAST(ROUND((julianday(maior) - julianday(timestamp)) * 86400000000)
+        AS INTEGER)), 0)
+    FROM (SELECT timestamp, MAX(timestamp) OVER (ORDER BY id) AS maior FROM logs
+          WHERE NOT EXISTS (SELECT 1 FROM contadores WHERE nome = 'logs_desordem_us'));
+
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_insert AFTER INSERT ON usuarios BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'usuarios';
+    UPDATE contadores SET valor = valor + 1
+        WHERE nome = 'usuarios_com_login' AND NEW.ultimo_login IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_delete AFTER DELETE ON usuarios BEGIN
+    UPDATE contadores SET valor = valor - 1 WHERE nome = 'usuarios';
+    UPDATE contadores SET valor = valor - 1
+        WHERE nome = 'usuarios_com_login' AND OLD.ultimo_login IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_login AFTER UPDATE OF ultimo_login ON usuarios
+WHEN (OLD.ultimo_login IS NULL) != (NEW.ultimo_login IS NULL) BEGIN
+    UPDATE contadores SET valor = valor + (CASE WHEN NEW.ultimo_login IS NULL THEN -1 ELSE 1 END)
+        WHERE nome = 'usuarios_com_login';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_logs_insert AFTER INSERT ON logs BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'logs';
+    INSERT INTO contadores (nome, valor) VALUES ('acao:' || NEW.acao, 1)
+        ON CONFLICT(nome) DO UPDATE SET valor = valor + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_logs_desordem AFTER INSERT ON logs
+WHEN NEW.timestamp < (SELECT MAX(timestamp) FROM logs) BEGIN
+    UPDATE contadores SET valor = MAX(valor, CAST(ROUND(
+        (julianday((SELECT MAX(timestamp) FROM logs)) - julianday(NEW.timestamp)) * 86400000000) AS INTEGER))
+        WHERE nome = 'logs_desordem_us';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_logs_delete AFTER DELETE ON logs BEGIN
+    UPDATE contadores SET valor = valor - 1 WHERE nome IN ('logs', 'acao:' || OLD.acao);
+END;
+"""
+
+COLUNAS_USUARIO = (
+    "id", "username", "email", "nome_completo", "idade",
+    "hashed_password", "data_criacao", "ultimo_login",
+)
+SELECT_USUARIO = f"SELECT {', '.join(COLUNAS_USUARIO)} FROM usuarios"
+LOTE_IN = 500  # chaves por consulta "IN (...)" em buscas em lote
+CAMPOS_ATUALIZAVEIS = ("username", "email", "nome_completo", "idade", "hashed_password", "ultimo_login")
+
+
+def _contador(db: "SQLiteDatabase", nome: str) -> int:
+    linha = db.connection().execute("SELECT valor FROM contadores WHERE nome = ?", (nome,)).fetchone()
+    return linha[0] if linha else 0
+
+
+def _para_texto(valor: Optional[datetime]) -> Optional[str]:
+    return None if valor is None else valor.isoformat()
+
+
+def _para_datetime(valor: Optional[str]) -> Optional[datetime]:
+    return None if valor is None else datetime.fromisoformat(valor)
+
+
+def _linha_para_usuario(linha) -> Optional[UserRecord]:
+    if linha is None:
+        return None
+    id_, username, email, nome_completo, idade, hashed_password, data_criacao, ultimo_login = linha
+    return UserRecord(id_, username, email, nome_completo, idade, hashed_password,
+                      _para_datetime(data_criacao), _para_datetime(ultimo_login))
+
+
+def _linha_para_log(linha) -> dict:
+    id_, timestamp, usuario_id, acao, detalhes = linha
+    return {
+        "id": id_,
+        "timestamp": datetime.fromisoformat(timestamp),
+        "usuario_id": usuario_id,
+        "acao": acao,
+        "detalhes": detalhes,
+    }
+
+
+class SQLiteDatabase:
+    """Pool de conexões SQLite (uma por thread) para um arquivo compartilhado."""
+
+    def __init__(self, path: str, timeout: float = 30.0, cached_statements: int = 256):
+        self.path = path
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes: List[sqlite3.Connection] = []
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, criando-a na primeira chamada."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,  # autocommit; transações explícitas quando necessário
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            with self._lock:
+                self._conexoes.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Fecha todas as conexões abertas pelo pool."""
+        with self._lock:
+            conexoes, self._conexoes = self._conexoes, []
+        for conn in conexoes:
+            conn.close()
+        self._local = threading.local()
+
+
+class SQLiteUserStore(UserStore):
+    """Repositório de usuários persistido em SQLite."""
+
+    bloqueante = True
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self._indexar_existentes()
+
+    def _indexar_existentes(self) -> None:
+        """Monta o índice de busca de bancos criados antes dele (uma vez, entre todos os workers)."""
+        conn = self.db.connection()
+        if conn.execute("SELECT 1 FROM busca_termos LIMIT 1").fetchone() is not None:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM busca_termos LIMIT 1").fetchone() is None:
+                for linha in conn.execute(SELECT_USUARIO).fetchall():
+                    self._indexar(conn, _linha_para_usuario(linha))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _indexar(conn: sqlite3.Connection, usuario: UserRecord, remover: bool = False) -> None:
+        linhas = [
+            (campo, termo, usuario.id)
+            for campo, lista in enumerate(termos_do_usuario(usuario)) for termo in lista
+        ]
+        if remover:
+            conn.executemany("DELETE FROM busca_termos WHERE campo = ? AND termo = ? AND usuario_id = ?", linhas)
+        else:
+            conn.executemany("INSERT OR IGNORE INTO busca_termos VALUES (?, ?, ?)", linhas)
+
+    def __len__(self) -> int:
+        return _contador(self.db, "usuarios")
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        linha = self.db.connection().execute(f"{SELECT_USUARIO} WHERE id = ?", (user_id,)).fetchone()
+        return _linha_para_usuario(linha)
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        linha = self.db.connection().execute(
+            f"{SELECT_USUARIO} WHERE username_key = ?", (normalizar_chave(username),)
+        ).fetchone()
+        return _linha_para_usuario(linha)
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        linha = self.db.connection().execute(
+            f"{SELECT_USUARIO} WHERE email_key = ?", (normalizar_chave(email),)
+        ).fetchone()
+        return _linha_para_usuario(linha)
+
+    def _buscar_em(self, coluna: str, chaves: list) -> List[UserRecord]:
+        usuarios = []
+        conexao = self.db.connection()
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for inicio in range(0, len(chaves), LOTE_IN):
+            lote = chaves[inicio:inicio + LOTE_IN]
+            marcadores = ", ".join("?" * len(lote))
+            linhas = conexao.execute(f"{SELECT_USUARIO} WHERE {coluna} IN ({marcadores})", lote).fetchall()
+            usuarios.extend(map(_linha_para_usuario, linhas))
+        return usuarios
+
+    def get_many(self, ids) -> List[UserRecord]:
+        return self._buscar_em("id", list(set(ids)))
+
+    def get_many_by_username(self, usernames) -> List[UserRecord]:
+        return self._buscar_em("username_key", list({normalizar_chave(username) for username in usernames}))
+
+    @staticmethod
+    def _erro_de_unicidade(exc: sqlite3.IntegrityError, usuario: dict) -> DuplicateKeyError:
+        campo = "username" if "username_key" in str(exc) else "email"
+        return DuplicateKeyError(campo, usuario.get(campo, ""))
+
+    def insert(self, usuario) -> UserRecord:
+        registro = usuario if isinstance(usuario, UserRecord) else UserRecord.from_dict(usuario)
+        conn = self.db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT INTO usuarios (username, username_key, email, email_key, nome_completo, "
+                "idade, hashed_password, data_criacao, ultimo_login) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    registro.username, normalizar_chave(registro.username),
+                    registro.email, normalizar_chave(registro.email),
+                    registro.nome_completo, registro.idade, registro.hashed_password,
+                    _para_texto(registro.data_criacao), _para_texto(registro.ultimo_login),
+                ),
+            )
+            registro.id = cursor.lastrowid
+            self._indexar(conn, registro)
+        except BaseException as exc:
+            conn.execute("ROLLBACK")
+            if isinstance(exc, sqlite3.IntegrityError):
+                raise self._erro_de_unicidade(exc, registro) from exc
+            raise
+        conn.execute("COMMIT")
+        return registro
+
+    def update(self, user_id: int, **campos) -> UserRecord:
+        atribuicoes, valores = [], []
+        for campo in CAMPOS_ATUALIZAVEIS:
+            if campo not in campos:
+                continue
+            valor = campos[campo]
+            atribuicoes.append(f"{campo} = ?")
+            valores.append(_para_texto(valor) if isinstance(valor, datetime) else valor)
+            if campo in ("username", "email"):
+                atribuicoes.append(f"{campo}_key = ?")
+                valores.append(normalizar_chave(valor))
+
+        reindexar = any(campo in campos for campo in CAMPOS_BUSCA)
+        if atribuicoes and reindexar:
+            self._atualizar_com_indice(user_id, atribuicoes, valores, campos)
+        elif atribuicoes:
+            try:
+                cursor = self.db.connection().execute(
+                    f"UPDATE usuarios SET {', '.join(atribuicoes)} WHERE id = ?", (*valores, user_id)
+                )
+            except sqlite3.IntegrityError as exc:
+                raise self._erro_de_unicidade(exc, campos) from exc
+            if cursor.rowcount == 0:
+                raise KeyError(user_id)
+
+        usuario = self.get(user_id)
+        if usuario is None:
+            raise KeyError(user_id)
+        return usuario
+
+    def _atualizar_com_indice(self, user_id: int, atribuicoes: list, valores: list, campos: dict) -> None:
+        """UPDATE e troca dos termos de busca dos campos alterados, na mesma transação."""
+        conn = self.db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            antes = _linha_para_usuario(conn.execute(f"{SELECT_USUARIO} WHERE id = ?", (user_id,)).fetchone())
+            if antes is None:
+                raise KeyError(user_id)
+            conn.execute(f"UPDATE usuarios SET {', '.join(atribuicoes)} WHERE id = ?", (*valores, user_id))
+            for campo, nome in enumerate(CAMPOS_BUSCA):
+                if nome not in campos:
+                    continue
+                antigos = set(termos(campo, getattr(antes, nome)))
+                novos = set(termos(campo, campos[nome]))
+                conn.executemany("DELETE FROM busca_termos WHERE campo = ? AND termo = ? AND usuario_id = ?",
+                                 [(campo, termo, user_id) for termo in antigos - novos])
+                conn.executemany("INSERT OR IGNORE INTO busca_termos VALUES (?, ?, ?)",
+                                 [(campo, termo, user_id) for termo in novos - antigos])
+        except BaseException as exc:
+            conn.execute("ROLLBACK")
+            if isinstance(exc, sqlite3.IntegrityError):
+                raise self._erro_de_unicidade(exc, campos) from exc
+            raise
+        conn.execute("COMMIT")
+
+    def delete(self, user_id: int) -> UserRecord:
+        conn = self.db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            usuario = _linha_para_usuario(conn.execute(f"{SELECT_USUARIO} WHERE id = ?", (user_id,)).fetchone())
+            if usuario is None:
+                raise KeyError(user_id)
+            conn.execute("DELETE FROM usuarios WHERE id = ?", (user_id,))
+            self._indexar(conn, usuario, remover=True)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return usuario
+
+    def list_page(self, offset: int, limite: int) -> List[UserRecord]:
+        linhas = self.db.connection().execute(
+            f"{SELECT_USUARIO} ORDER BY id LIMIT ? OFFSET ?", (limite, offset)
+        ).fetchall()
+        return [_linha_para_usuario(linha) for linha in linhas]
+
+    def page(self, limite, ordem="id", apos=None, idade_min=None, idade_max=None,
+             criado_desde=None, criado_ate=None) -> List[UserRecord]:
+        condicoes, valores = [], []
+        if idade_min is not None:
+            condicoes.append("idade >= ?")
+            valores.append(idade_min)
+        if idade_max is not None:
+            condicoes.append("idade <= ?")
+            valores.append(idade_max)
+        if criado_desde is not None:
+            condicoes.append("data_criacao >= ?")
+            valores.append(criado_desde.isoformat())
+        if criado_ate is not None:
+            condicoes.append("data_criacao <= ?")
+            valores.append(criado_ate.isoformat())
+
+        if ordem == ORDEM_IDADE:
+            colunas = "idade, id"
+            condicoes.append("idade IS NOT NULL")
+        elif ordem == ORDEM_CRIACAO:
+            colunas = "data_criacao, id"
+        else:
+            colunas = "id"
+        if apos is not None:
+            marcadores = ", ".join("?" for _ in apos)
+            condicoes.append(f"({colunas}) > ({marcadores})")
+            valores.extend(_para_texto(v) if isinstance(v, datetime) else v for v in apos)
+
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        linhas = self.db.connection().execute(
+            f"{SELECT_USUARIO} {where} ORDER BY {colunas} LIMIT ?", (*valores, limite)
+        ).fetchall()
+        return [_linha_para_usuario(linha) for linha in linhas]
+
+    def iter_search_terms(self, campo, prefixo, apos=None, tamanho_pagina: int = 200) -> Iterator[tuple]:
+        conn = self.db.connection()
+        chave = tuple(apos) if apos is not None and apos[0] >= prefixo else (prefixo, -1)
+        fim = prefixo + "\U0010ffff"  # maior que qualquer termo que comece com o prefixo
+        while True:
+            linhas = conn.execute(
+                "SELECT termo, usuario_id FROM busca_termos WHERE campo = ? AND (termo, usuario_id) > (?, ?) "
+                "AND termo < ? ORDER BY termo, usuario_id LIMIT ?",
+                (campo, *chave, fim, tamanho_pagina),
+            ).fetchall()
+            yield from linhas
+            if len(linhas) < tamanho_pagina:
+                return
+            chave = linhas[-1]
+
+    def count_logged_in(self) -> int:
+        return _contador(self.db, "usuarios_com_login")
+
+    def clear(self) -> None:
+        conn = self.db.connection()
+        conn.execute("DELETE FROM usuarios")
+        conn.execute("DELETE FROM busca_termos")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'usuarios'")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteLogStore(LogStore):
+    """Repositório de logs persistido em SQLite, com retenção aplicada periodicamente."""
+
+    bloqueante = True
+
+    def __init__(self, db: SQLiteDatabase, max_por_usuario: int = 1000,
+                 max_total: int = 100_000, intervalo_limpeza: int = 1000):
+        self.db = db
+        self.max_por_usuario = max_por_usuario
+        self.max_total = max_total
+        self.intervalo_limpeza = intervalo_limpeza
+        self._lock = threading.Lock()
+        self._insercoes = 0
+
+    def __len__(self) -> int:
+        return _contador(self.db, "logs")
+
+    def add(self, usuario_id: int, acao: str, detalhes: str = "",
+            timestamp: Optional[datetime] = None) -> dict:
+        timestamp = timestamp or datetime.now()
+        cursor = self.db.connection().execute(
+            "INSERT INTO logs (timestamp, usuario_id, acao, detalhes) VALUES (?, ?, ?, ?)",
+            (timestamp.isoformat(), usuario_id, acao, detalhes),
+        )
+        with self._lock:
+            self._insercoes += 1
+            limpar = self._insercoes % self.intervalo_limpeza == 0
+        if limpar:
+            self.apply_retention()
+        return {
+            "id": cursor.lastrowid,
+            "timestamp": timestamp,
+            "usuario_id": usuario_id,
+            "acao": acao,
+            "detalhes": detalhes,
+        }
+
+    def add_many(self, entradas) -> int:
+        """Grava o lote inteiro em uma única transação."""
+        linhas = [
+            (timestamp.isoformat(), usuario_id, acao, detalhes)
+            for usuario_id, acao, detalhes, timestamp in entradas
+        ]
+        if not linhas:
+            return 0
+        conn = self.db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO logs (timestamp, usuario_id, acao, detalhes) VALUES (?, ?, ?, ?)",
+                linhas,
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        with self._lock:
+            antes = self._insercoes
+            self._insercoes += len(linhas)
+            limpar = antes // self.intervalo_limpeza != self._insercoes // self.intervalo_limpeza
+        if limpar:
+            self.apply_retention()
+        return len(linhas)
+
+    def apply_retention(self) -> None:
+        """Aplica os limites global e por usuário, removendo as entradas mais antigas."""
+        conn = self.db.connection()
+        conn.execute(
+            "DELETE FROM logs WHERE id <= (SELECT MAX(id) FROM logs) - ?", (self.max_total,)
+        )
+        conn.execute(
+            "DELETE FROM logs WHERE id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+            "(PARTITION BY usuario_id ORDER BY id DESC) AS posicao FROM logs) WHERE posicao > ?)",
+            (self.max_por_usuario,),
+        )
+
+    def recent(self, usuario_id: int, limite: int) -> List[dict]:
+        if limite <= 0:
+            return []
+        linhas = self.db.connection().execute(
+            "SELECT id, timestamp, usuario_id, acao, detalhes FROM logs "
+            "WHERE usuario_id = ? ORDER BY id DESC LIMIT ?",
+            (usuario_id, limite),
+        ).fetchall()
+        return [_linha_para_log(linha) for linha in reversed(linhas)]
+
+    def page(self, limite, apos_id=None, usuario_id=None, acao=None, desde=None, ate=None) -> List[dict]:
+        """
+        A janela de tempo vira uma faixa de IDs pelo índice de timestamp e a
+        página sai do índice ``(acao, id)`` ou ``(usuario_id, id)`` dentro
+        dela. Workers e lotes podem gravar fora da ordem de timestamp: a
+        faixa é alargada pelo maior atraso já observado e o timestamp é
+        sempre conferido linha a linha.
+        """
+        if limite <= 0:
+            return []
+        conn = self.db.connection()
+        # Margem de 1 ms: julianday() tem precisão de milissegundos
+        desordem = timedelta(microseconds=_contador(self.db, "logs_desordem_us") + 1000)
+        condicoes, valores = [], []
+        if desde is not None:
+            # Tudo até este ID é anterior a desde - desordem, logo fora da janela
+            linha = conn.execute(
+                "SELECT id FROM logs WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1",
+                ((desde - desordem).isoformat(),),
+            ).fetchone()
+            if linha is not None:
+                apos_id = max(apos_id or 0, linha[0])
+            condicoes.append("timestamp >= ?")
+            valores.append(desde.isoformat())
+        if ate is not None:
+            # Tudo a partir deste ID é posterior a ate + desordem
+            linha = conn.execute(
+                "SELECT id FROM logs WHERE timestamp > ? ORDER BY timestamp LIMIT 1",
+                ((ate + desordem).isoformat(),),
+            ).fetchone()
+            if linha is not None:
+                condicoes.append("id < ?")
+                valores.append(linha[0])
+            condicoes.append("timestamp <= ?")
+            valores.append(ate.isoformat())
+        if apos_id is not None:
+            condicoes.append("id > ?")
+            valores.append(apos_id)
+        if usuario_id is not None:
+            condicoes.append("usuario_id = ?")
+            valores.append(usuario_id)
+        if acao is not None:
+            condicoes.append("acao = ?")
+            valores.append(acao)
+        filtro = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+        linhas = conn.execute(
+            f"SELECT id, timestamp, usuario_id, acao, detalhes FROM logs {filtro}ORDER BY id LIMIT ?",
+            (*valores, limite),
+        ).fetchall()
+        return [_linha_para_log(linha) for linha in linhas]
+
+    def count_by_action(self) -> Dict[str, int]:
+        linhas = self.db.connection().execute(
+            "SELECT substr(nome, 6), valor FROM contadores WHERE nome LIKE 'acao:%' AND valor > 0"
+        ).fetchall()
+        return dict(linhas)
+
+    def clear(self) -> None:
+        conn = self.db.connection()
+        conn.execute("DELETE FROM logs")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'logs'")
+        conn.execute("UPDATE contadores SET valor = 0 WHERE nome = 'logs_desordem_us'")
+
+    def close(self) -> None:
+        self.db.close()
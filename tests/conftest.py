@@ -1,6 +1,11 @@
 """
 Configurações compartilhadas para todos os testes.
 """
+import os
+
+# Custo mínimo do bcrypt nos testes (precisa ser definido antes de importar main)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 import pytest
 from fastapi.testclient import TestClient
 from main import app, db_usuarios
@@ -18,6 +23,8 @@ def reset_database():
     db_usuarios.clear()
     import main
     main.user_id_counter = 1
+    main.login_limiter.clear()
+    main.profile_cache.clear()
     yield
     db_usuarios.clear()
 
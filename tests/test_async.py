@@ -0,0 +1,91 @@
+import asyncio
+
+import anyio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from locks import KeyedLock
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+async def cadastrar_em_paralelo(usuarios):
+    """Envia os cadastros ao mesmo tempo (mesmo event loop) e retorna os status."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+        respostas = await asyncio.gather(*(cliente.post("/cadastro", json=dados) for dados in usuarios))
+    return sorted(resposta.status_code for resposta in respostas)
+
+
+# --- Testes do lock por chave ---
+
+def test_lock_por_chave_serializa_so_a_mesma_chave():
+    """Testa a exclusão mútua por chave e o descarte dos locks sem uso."""
+    locks = KeyedLock()
+    ordem = []
+
+    async def tarefa(nome, chave, espera):
+        async with locks.hold(chave):
+            ordem.append(f"{nome}+")
+            await asyncio.sleep(espera)
+            ordem.append(f"{nome}-")
+
+    async def cenario():
+        await asyncio.gather(tarefa("a", "x", 0.02), tarefa("b", "x", 0), tarefa("c", "y", 0))
+
+    asyncio.run(cenario())
+    assert ordem.index("a-") < ordem.index("b+")  # mesma chave: um de cada vez
+    assert ordem.index("c-") < ordem.index("a-")  # outra chave: não espera
+    assert len(locks) == 0
+
+
+# --- Testes via API ---
+
+def test_cadastros_simultaneos_do_mesmo_username(monkeypatch):
+    """Testa que só um cadastro concorrente vence e os demais não pagam o bcrypt."""
+    hashes = []
+    original = main.get_password_hash
+    monkeypatch.setattr(main, "get_password_hash", lambda senha: hashes.append(senha) or original(senha))
+
+    usuarios = [{"username": "disputado", "password": "senha123", "email": f"disputado{i}@email.com"}
+                for i in range(10)]
+    assert asyncio.run(cadastrar_em_paralelo(usuarios)) == [201] + [400] * 9
+    assert len(hashes) == 1
+    assert len(db_usuarios) == 1
+
+def test_cadastros_simultaneos_distintos_recebem_ids_unicos():
+    """Testa a alocação de IDs sob concorrência."""
+    usuarios = [{"username": f"user{i}", "password": "senha123", "email": f"user{i}@email.com"}
+                for i in range(20)]
+    assert asyncio.run(cadastrar_em_paralelo(usuarios)) == [201] * 20
+    assert len({db_usuarios.get_by_username(f"user{i}").id for i in range(20)}) == 20
+
+def test_leituras_em_memoria_nao_usam_threadpool(monkeypatch):
+    """Testa que, no backend em memória, as rotas de leitura rodam direto no event loop."""
+    client.post("/cadastro", json={"username": "maria", "password": "senha123", "email": "maria@email.com"})
+    token = client.post("/login", json={"username": "maria", "password": "senha123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    chamadas = []
+    original = anyio.to_thread.run_sync
+
+    async def contar(fn, *args, **kwargs):
+        chamadas.append(fn)
+        return await original(fn, *args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", contar)
+    for rota in ("/usuario/1", "/me", "/usuarios", "/logs", "/stats"):
+        assert client.get(rota, headers=headers).status_code == 200
+    assert chamadas == []
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from audit import AuditLogWriter
+from storage import InMemoryLogStore
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+def test_writer_parado_grava_diretamente():
+    """Testa que, sem a task de background, a entrada é gravada na hora."""
+    logs = InMemoryLogStore()
+    writer = AuditLogWriter(logs)
+    writer.submit(1, "LOGIN", "ok")
+
+    assert [log["acao"] for log in logs.recent(1, 10)] == ["LOGIN"]
+    assert writer.stats()["gravados"] == 1
+
+def test_writer_grava_em_lote_por_tamanho_e_no_stop():
+    """Testa o flush ao atingir o tamanho do lote e o flush final no shutdown."""
+    logs = InMemoryLogStore()
+    writer = AuditLogWriter(logs, batch_size=3, flush_interval=60)
+
+    async def cenario():
+        await writer.start()
+        for i in range(3):
+            writer.submit(1, "CONSULTA", str(i))
+        await asyncio.sleep(0.1)
+        gravados_antes_do_stop = len(logs)
+        writer.submit(2, "LOGIN")
+        await writer.stop()
+        return gravados_antes_do_stop
+
+    assert asyncio.run(cenario()) == 3
+    assert len(logs) == 4
+    stats = writer.stats()
+    assert stats["enfileirados"] == 4
+    assert stats["gravados"] == 4
+    assert stats["pendentes"] == 0
+
+def test_writer_grava_por_janela_de_tempo():
+    """Testa que um lote incompleto é gravado ao fim da janela de tempo."""
+    logs = InMemoryLogStore()
+    writer = AuditLogWriter(logs, batch_size=100, flush_interval=0.01)
+
+    async def cenario():
+        await writer.start()
+        writer.submit(1, "LOGIN")
+        await asyncio.sleep(0.1)
+        gravados = len(logs)
+        await writer.stop()
+        return gravados
+
+    assert asyncio.run(cenario()) == 1
+
+@pytest.mark.parametrize("politica,gravados,descartados", [("drop", 2, 1), ("block", 3, 0)])
+def test_writer_politica_de_overflow(politica, gravados, descartados):
+    """Testa as políticas de fila cheia: descartar ou gravar de forma bloqueante."""
+    logs = InMemoryLogStore()
+    writer = AuditLogWriter(logs, batch_size=10, flush_interval=60, max_queue=2, overflow=politica)
+
+    async def cenario():
+        await writer.start()
+        for _ in range(3):
+            writer.submit(1, "CONSULTA")
+        await writer.stop()
+
+    asyncio.run(cenario())
+    stats = writer.stats()
+    assert stats["gravados"] == gravados
+    assert stats["descartados"] == descartados
+    assert len(logs) == gravados
+
+class LogStoreLento(InMemoryLogStore):
+    """Repositório que registra quantas gravações ocorrem ao mesmo tempo e em que thread."""
+
+    def __init__(self):
+        super().__init__()
+        self.ativas = self.max_ativas = 0
+        self.threads = set()
+
+    def add_many(self, entradas):
+        self.ativas += 1
+        self.max_ativas = max(self.max_ativas, self.ativas)
+        self.threads.add(threading.get_ident())
+        time.sleep(0.002)
+        super().add_many(entradas)
+        self.ativas -= 1
+
+def test_writer_bloqueante_usa_um_unico_writer_fora_do_loop():
+    """Testa que, no overflow "block", os lotes não se sobrepõem, mantêm a ordem e não rodam no event loop."""
+    logs = LogStoreLento()
+    writer = AuditLogWriter(logs, batch_size=2, flush_interval=0.001, max_queue=2, overflow="block")
+
+    async def cenario():
+        await writer.start()
+        for i in range(30):
+            await writer.put(1, "CONSULTA", str(i))
+        await writer.stop()
+
+    asyncio.run(cenario())
+    registros = logs.page(100)
+    assert [log["detalhes"] for log in registros] == [str(i) for i in range(30)]
+    assert [log["timestamp"] for log in registros] == sorted(log["timestamp"] for log in registros)
+    assert logs.max_ativas == 1
+    assert threading.get_ident() not in logs.threads
+    assert writer.stats()["descartados"] == 0
+
+class LogStoreInstavel(InMemoryLogStore):
+    """Repositório cuja primeira gravação falha (disco cheio, banco ocupado...)."""
+
+    def __init__(self):
+        super().__init__()
+        self.falhou = False
+
+    def add_many(self, entradas):
+        if not self.falhou:
+            self.falhou = True
+            raise OSError("disco cheio")
+        super().add_many(entradas)
+
+def test_writer_sobrevive_a_falha_de_gravacao():
+    """Testa que um lote com falha é contado e a task continua drenando a fila."""
+    logs = LogStoreInstavel()
+    writer = AuditLogWriter(logs, batch_size=1, flush_interval=0.001)
+
+    async def cenario():
+        await writer.start()
+        writer.submit(1, "LOGIN", "perdido")
+        await asyncio.sleep(0.05)
+        assert writer.running
+        writer.submit(1, "LOGIN", "gravado")
+        await asyncio.sleep(0.05)
+        writer.submit(1, "LOGIN", "no_stop")
+        await writer.stop()
+
+    asyncio.run(cenario())
+    assert [log["detalhes"] for log in logs.page(10)] == ["gravado", "no_stop"]
+    assert writer.stats()["falhas"] == 1
+    assert writer.stats()["pendentes"] == 0
+
+def test_lifespan_inicia_e_esvazia_fila_no_shutdown():
+    """Testa que a aplicação inicia o writer no startup e grava tudo no shutdown."""
+    with TestClient(app) as client:
+        assert main.audit_writer.running
+        response = client.post("/cadastro", json={
+            "username": "auditado",
+            "password": "senha123",
+            "email": "auditado@email.com"
+        })
+        assert response.status_code == 201
+        user_id = response.json()["id"]
+
+    assert not main.audit_writer.running
+    assert [log["acao"] for log in db_logs.recent(user_id, 10)] == ["CADASTRO"]
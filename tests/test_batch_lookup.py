@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs, profile_cache
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o cache de perfis antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+
+
+def cadastrar(*usernames):
+    """Cadastra os usuários e retorna seus IDs."""
+    return [client.post("/cadastro", json={
+        "username": username, "password": "senha123", "email": f"{username}@email.com"
+    }).json()["id"] for username in usernames]
+
+
+def autenticar(username="maria"):
+    token = client.post("/login", json={"username": username, "password": "senha123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_busca_em_lote_por_ids_e_usernames():
+    """Testa a ordem pedida, a remoção de repetidos e a lista de ausentes."""
+    maria, joao, ana = cadastrar("maria", "joao", "ana")
+    headers = autenticar()
+
+    response = client.post("/usuarios/batch", headers=headers, json={
+        "ids": [ana, 999, maria, ana], "usernames": ["JOAO", "maria", "fantasma"],
+    })
+
+    assert response.status_code == 200
+    dados = response.json()
+    assert [usuario["id"] for usuario in dados["usuarios"]] == [ana, maria, joao]
+    assert dados["usuarios"][0] == client.get(f"/usuario/{ana}", headers=headers).json()
+    assert "hashed_password" not in dados["usuarios"][0]
+    assert dados["ids_nao_encontrados"] == [999]
+    assert dados["usernames_nao_encontrados"] == ["fantasma"]
+
+def test_busca_em_lote_registra_um_log_agregado():
+    """Testa que a chamada gera uma única entrada de log, em vez de uma por ID."""
+    ids = cadastrar("maria", "joao", "ana")
+    headers = autenticar()
+    antes = len(db_logs)
+
+    client.post("/usuarios/batch", headers=headers, json={"ids": ids + [999]})
+
+    assert len(db_logs) == antes + 1
+    assert db_logs.count_by_action()["CONSULTA_LOTE"] == 1
+    assert "CONSULTA" not in db_logs.count_by_action()
+    assert "3 perfis" in db_logs.recent(0, 1)[0]["detalhes"]
+
+def test_busca_em_lote_le_faltantes_de_uma_vez(monkeypatch):
+    """Testa que os perfis fora do cache são lidos com uma única busca em lote."""
+    ids = cadastrar("maria", "joao", "ana")
+    headers = autenticar()
+    client.get(f"/usuario/{ids[0]}", headers=headers)  # só este fica no cache
+    chamadas = []
+    get_many = db_usuarios.get_many
+    monkeypatch.setattr(db_usuarios, "get_many", lambda chaves: chamadas.append(list(chaves)) or get_many(chaves))
+    monkeypatch.setattr(db_usuarios, "get", lambda user_id: pytest.fail("busca individual"))
+
+    dados = client.post("/usuarios/batch", headers=headers, json={"ids": ids}).json()
+
+    assert [usuario["id"] for usuario in dados["usuarios"]] == ids
+    assert chamadas == [ids[1:]]
+    assert len(profile_cache) == 3  # os lidos agora também ficam no cache
+
+def test_busca_em_lote_respeita_limite_e_autenticacao(monkeypatch):
+    """Testa o limite de chaves por chamada e a exigência de token."""
+    cadastrar("maria")
+    headers = autenticar()
+    monkeypatch.setattr(main, "BATCH_LOOKUP_MAX", 3)
+
+    response = client.post("/usuarios/batch", headers=headers, json={"ids": [1, 2], "usernames": ["a", "b"]})
+    assert response.status_code == 400
+    assert client.post("/usuarios/batch", json={"ids": [1]}).status_code in (401, 403)
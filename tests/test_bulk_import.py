@@ -0,0 +1,110 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app, create_access_token, db_usuarios, db_logs
+from bulk_import import iter_lines, iter_records
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+@pytest.fixture
+def headers():
+    """Headers com um token válido para o importador."""
+    token = create_access_token({"sub": "importador"}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def ler_ndjson(response):
+    """Converte o corpo NDJSON da resposta em lista de objetos."""
+    return [json.loads(linha) for linha in response.text.splitlines() if linha]
+
+
+async def _coletar(gerador):
+    return [item async for item in gerador]
+
+
+async def _pedacos(*pedacos):
+    for pedaco in pedacos:
+        yield pedaco
+
+
+# --- Testes das funções de leitura ---
+
+def test_iter_lines_junta_linhas_quebradas_entre_pedacos():
+    """Testa que linhas divididas entre pedaços do corpo são reconstruídas."""
+    linhas = asyncio.run(_coletar(iter_lines(_pedacos(b'{"a": 1}\n{"b"', b': 2}\r\n', b'{"c": 3}'))))
+    assert linhas == ['{"a": 1}', '{"b": 2}', '{"c": 3}']
+
+def test_iter_records_csv_usa_cabecalho():
+    """Testa a conversão de CSV em dicionários usando a primeira linha como cabeçalho."""
+    registros = asyncio.run(_coletar(iter_records(
+        _pedacos("username,password,email,idade", "", "ana123,senha123,ana@email.com,30"), "csv"
+    )))
+    assert registros == [(3, {"username": "ana123", "password": "senha123",
+                              "email": "ana@email.com", "idade": "30"})]
+
+
+# --- Testes via API ---
+
+def test_bulk_ndjson_resultado_por_linha(headers):
+    """Testa criação, erros de validação e duplicatas (no lote e no banco)."""
+    db_usuarios.insert({
+        "username": "existente", "email": "existente@email.com", "nome_completo": None,
+        "idade": None, "hashed_password": "hash", "data_criacao": datetime.now(),
+        "ultimo_login": None,
+    })
+    corpo = "\n".join([
+        json.dumps({"username": "ana123", "password": "senha123", "email": "ana@email.com"}),
+        json.dumps({"username": "bia123", "password": "senha123", "email": "bia@email.com", "idade": 30}),
+        "{nao e json",
+        json.dumps({"username": "ab", "password": "senha123", "email": "ab@email.com"}),
+        json.dumps({"username": "ANA123", "password": "senha123", "email": "outra@email.com"}),
+        json.dumps({"username": "novo123", "password": "senha123", "email": "EXISTENTE@email.com"}),
+    ]) + "\n"
+
+    response = client.post("/cadastro/bulk", content=corpo, headers={
+        **headers, "Content-Type": "application/x-ndjson"
+    })
+    assert response.status_code == 200
+    resultados = ler_ndjson(response)
+    por_linha = {r["linha"]: r for r in resultados if "linha" in r}
+
+    assert por_linha[1]["status"] == "criado"
+    assert por_linha[2]["status"] == "criado"
+    assert por_linha[3]["erro"] == "JSON inválido"
+    assert por_linha[4]["erro"].startswith("username")
+    assert por_linha[5]["erro"] == "Username já cadastrado."
+    assert por_linha[6]["erro"] == "Email já cadastrado."
+    assert resultados[-1] == {"resumo": {"total": 6, "criados": 2, "erros": 4}}
+    assert db_usuarios.get_by_username("bia123")["idade"] == 30
+
+def test_bulk_csv_e_login_do_usuario_importado(headers):
+    """Testa a importação em CSV e que a senha importada funciona no login."""
+    corpo = "username,password,email,nome_completo\ncarla123,senha123,carla@email.com,Carla Souza\n"
+    response = client.post("/cadastro/bulk", content=corpo, headers={**headers, "Content-Type": "text/csv"})
+
+    resultados = ler_ndjson(response)
+    assert resultados[0]["status"] == "criado"
+    assert resultados[-1]["resumo"]["criados"] == 1
+
+    login = client.post("/login", json={"username": "carla123", "password": "senha123"})
+    assert login.status_code == 200
+
+def test_bulk_exige_autenticacao():
+    """Testa que a importação em lote exige token."""
+    response = client.post("/cadastro/bulk", content="{}\n")
+    assert response.status_code == 403
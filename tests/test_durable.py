@@ -0,0 +1,181 @@
+import os
+import threading
+import zlib
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app
+from storage import DuplicateKeyError, open_durable_storage
+from storage.durable import _CABECALHO, ARQUIVO_SNAPSHOT, VERSAO_WAL
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+def novo_usuario(username, idade=None):
+    """Monta um registro de usuário completo para os repositórios."""
+    return {
+        "username": username,
+        "email": f"{username}@email.com",
+        "nome_completo": None,
+        "idade": idade,
+        "hashed_password": "hash",
+        "data_criacao": datetime(2024, 1, 1, 12, 0, 0, 123),
+        "ultimo_login": None,
+    }
+
+
+def reabrir(diretorio, **kwargs):
+    """Abre os repositórios duráveis como em um novo processo."""
+    return open_durable_storage(str(diretorio), intervalo_snapshot=0, **kwargs)
+
+
+def test_estado_restaurado_pelo_wal(tmp_path):
+    """Testa que cadastros, alterações, exclusões e logs sobrevivem a uma queda (sem snapshot)."""
+    usuarios, logs = reabrir(tmp_path)
+    maria = usuarios.insert(novo_usuario("maria", idade=30))
+    joao = usuarios.insert(novo_usuario("joao"))
+    usuarios.update(maria.id, ultimo_login=datetime(2024, 2, 1), email="maria@novo.com")
+    usuarios.delete(joao.id)
+    logs.add(maria.id, "LOGIN", "Login realizado com sucesso")
+    usuarios.persistencia.wal.flush()  # "queda" logo após o group commit
+
+    restaurados, logs_restaurados = reabrir(tmp_path)
+    assert len(restaurados) == 1
+    assert restaurados.get(maria.id) == maria
+    assert restaurados.get_by_email("maria@novo.com").id == maria.id
+    assert restaurados.page(10, "idade", idade_min=18) == [maria]
+    assert restaurados.count_logged_in() == 1
+    assert restaurados.search("novo.com", 10)[0] == [maria]
+    assert [log["acao"] for log in logs_restaurados.recent(maria.id, 10)] == ["LOGIN"]
+    # IDs não são reutilizados e a unicidade continua valendo
+    assert restaurados.insert(novo_usuario("ana")).id == joao.id + 1
+    with pytest.raises(DuplicateKeyError):
+        restaurados.insert(novo_usuario("maria"))
+
+def test_snapshot_trunca_o_wal(tmp_path):
+    """Testa a compactação: snapshot + segmentos posteriores reconstituem o estado."""
+    usuarios, logs = reabrir(tmp_path)
+    for i in range(5):
+        usuarios.insert(novo_usuario(f"user{i}", idade=20 + i))
+        logs.add(i + 1, "CADASTRO")
+    usuarios.persistencia.snapshot()
+    usuarios.update(1, idade=99)
+    usuarios.delete(2)
+    usuarios.persistencia.wal.flush()
+
+    segmentos = sorted(nome for nome in os.listdir(tmp_path) if nome.startswith("wal-"))
+    assert len(segmentos) == 1  # os anteriores ao snapshot foram apagados
+    assert os.path.exists(tmp_path / ARQUIVO_SNAPSHOT)
+
+    restaurados, logs_restaurados = reabrir(tmp_path)
+    assert sorted(restaurados) == [1, 3, 4, 5]
+    assert restaurados.get(1).idade == 99
+    assert len(logs_restaurados) == 5
+    assert logs_restaurados.add(1, "LOGIN")["id"] == 6
+
+def test_snapshot_nao_segura_o_lock_durante_io(tmp_path, monkeypatch):
+    """Testa que os fsyncs da compactação acontecem fora do lock e que escritas simultâneas são preservadas."""
+    usuarios, _ = reabrir(tmp_path)
+    for i in range(50):
+        usuarios.insert(novo_usuario(f"user{i}", idade=20))
+    fsync_original = os.fsync
+    bloqueios = []
+
+    def fsync(fd):
+        # Outra thread precisa conseguir o lock enquanto o disco sincroniza
+        resultado = []
+
+        def escrever():
+            livre = usuarios.persistencia.lock.acquire(timeout=1)
+            if livre:
+                usuarios.persistencia.lock.release()
+                usuarios.update(1, idade=len(bloqueios) + 30)  # escrita concorrente com a compactação
+            resultado.append(livre)
+
+        thread = threading.Thread(target=escrever)
+        thread.start()
+        thread.join()
+        bloqueios.append(not resultado[0])
+        fsync_original(fd)
+
+    monkeypatch.setattr("storage.durable.os.fsync", fsync)
+    usuarios.persistencia.snapshot()
+    monkeypatch.setattr("storage.durable.os.fsync", fsync_original)
+    usuarios.persistencia.wal.flush()
+
+    assert bloqueios and not any(bloqueios)
+    idade_final = usuarios.get(1).idade
+    restaurados, _ = reabrir(tmp_path)
+    assert len(restaurados) == 50
+    assert restaurados.get(1).idade == idade_final
+
+def test_replay_ignora_registro_truncado(tmp_path):
+    """Testa que uma gravação interrompida no fim do WAL não impede a inicialização."""
+    usuarios, _ = reabrir(tmp_path)
+    usuarios.insert(novo_usuario("maria"))
+    usuarios.persistencia.wal.flush()
+    segmento = os.path.join(tmp_path, sorted(os.listdir(tmp_path))[-1])
+    with open(segmento, "ab") as arquivo:
+        arquivo.write(_CABECALHO.pack(VERSAO_WAL, 64, 0) + b"\x01\x02")  # quadro que não chegou inteiro
+
+    restaurados, _ = reabrir(tmp_path)
+    assert restaurados.get_by_username("maria") is not None
+
+def test_formato_desconhecido_interrompe_a_inicializacao(tmp_path):
+    """Testa que quadros íntegros de outra versão e snapshots sem cabeçalho não são ignorados."""
+    usuarios, _ = reabrir(tmp_path)
+    usuarios.insert(novo_usuario("maria"))
+    usuarios.persistencia.wal.close()
+    segmento = os.path.join(tmp_path, sorted(os.listdir(tmp_path))[-1])
+    payload = b"payload de outro formato"
+    with open(segmento, "ab") as arquivo:
+        arquivo.write(_CABECALHO.pack(VERSAO_WAL + 1, len(payload), zlib.crc32(payload)) + payload)
+    with pytest.raises(ValueError, match="Versão de WAL"):
+        reabrir(tmp_path)
+
+    os.remove(segmento)
+    with open(tmp_path / ARQUIVO_SNAPSHOT, "wb") as arquivo:
+        arquivo.write(b"\xe3snapshot antigo em marshal")
+    with pytest.raises(ValueError, match="formato desconhecido"):
+        reabrir(tmp_path)
+
+def test_fsync_always_agrupa_escritas_concorrentes(tmp_path):
+    """Testa o group commit: escritas simultâneas compartilham fsyncs."""
+    usuarios, logs = reabrir(tmp_path, fsync="always")
+    assert usuarios.bloqueante  # espera o disco: fora do event loop
+
+    def cadastrar(inicio):
+        for i in range(inicio, inicio + 25):
+            usuarios.insert(novo_usuario(f"user{i}"))
+
+    threads = [threading.Thread(target=cadastrar, args=(n * 25,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    estatisticas = usuarios.persistencia.stats()
+    assert estatisticas["registros"] == 200
+    assert estatisticas["lotes"] < 200
+    assert len(reabrir(tmp_path)[0]) == 200
+
+def test_api_com_persistencia(tmp_path, monkeypatch):
+    """Testa que cadastro, login e logs feitos pela API são restaurados após um restart."""
+    usuarios, logs = reabrir(tmp_path)
+    monkeypatch.setattr(main, "db_usuarios", usuarios)
+    monkeypatch.setattr(main, "db_logs", logs)
+    monkeypatch.setattr(main.audit_writer, "store", logs)
+    main.profile_cache.clear()
+
+    client.post("/cadastro", json={"username": "maria", "password": "senha123", "email": "maria@email.com"})
+    assert client.post("/login", json={"username": "maria", "password": "senha123"}).status_code == 200
+    usuarios.close()  # encerramento limpo: snapshot final
+
+    restaurados, logs_restaurados = reabrir(tmp_path)
+    maria = restaurados.get_by_username("maria")
+    assert maria.ultimo_login is not None
+    assert main.verify_password("senha123", maria.hashed_password)
+    assert [log["acao"] for log in logs_restaurados.recent(maria.id, 10)] == ["CADASTRO", "LOGIN"]
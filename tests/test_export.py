@@ -0,0 +1,127 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, create_access_token, db_usuarios, db_logs
+from export import chunked, gzip_stream
+from storage import InMemoryLogStore, create_storage
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+BASE = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+@pytest.fixture
+def headers():
+    """Headers com um token válido para exportação."""
+    token = create_access_token({"sub": "exportador"}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def popular(store, quantidade=5):
+    """Cadastra usuários com datas de criação crescentes."""
+    for i in range(1, quantidade + 1):
+        store.insert({
+            "username": f"user{i}",
+            "email": f"user{i}@email.com",
+            "nome_completo": f"Usuário {i}",
+            "idade": 20 + i,
+            "hashed_password": "hash-secreto",
+            "data_criacao": BASE + timedelta(minutes=i),
+            "ultimo_login": None,
+        })
+
+
+# --- Testes dos repositórios e serializadores ---
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_iter_logs_em_paginas_com_filtro(backend, tmp_path):
+    """Testa a iteração paginada dos logs com filtro de tempo."""
+    _, logs = create_storage(backend, sqlite_path=str(tmp_path / "export.db"))
+    logs.add_many([(1, "LOGIN", str(i), BASE + timedelta(minutes=i)) for i in range(10)])
+
+    todos = list(logs.iter_logs(tamanho_pagina=3))
+    assert [log["detalhes"] for log in todos] == [str(i) for i in range(10)]
+
+    janela = list(logs.iter_logs(desde=BASE + timedelta(minutes=2), ate=BASE + timedelta(minutes=4),
+                                 tamanho_pagina=2))
+    assert [log["detalhes"] for log in janela] == ["2", "3", "4"]
+    logs.close()
+
+def test_iter_logs_apos_descarte_por_retencao():
+    """Testa que a paginação continua correta depois que entradas antigas foram descartadas."""
+    logs = InMemoryLogStore(max_total=4)
+    for i in range(7):
+        logs.add(1, "CONSULTA", str(i))
+    assert [log["detalhes"] for log in logs.iter_logs(tamanho_pagina=3)] == ["3", "4", "5", "6"]
+
+def test_gzip_stream_gera_gzip_valido():
+    """Testa que a compressão em streaming produz um gzip decodificável."""
+    linhas = [f"linha {i}\n" for i in range(1000)]
+    comprimido = b"".join(gzip_stream(chunked(linhas, tamanho=100)))
+    assert gzip.decompress(comprimido).decode() == "".join(linhas)
+
+
+# --- Testes via API ---
+
+def test_exportar_usuarios_ndjson_sem_hash(headers):
+    """Testa a exportação NDJSON de todos os usuários, sem o hash da senha."""
+    popular(db_usuarios)
+    response = client.get("/export/usuarios", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    usuarios = [json.loads(linha) for linha in response.text.splitlines()]
+    assert [u["username"] for u in usuarios] == [f"user{i}" for i in range(1, 6)]
+    assert "hashed_password" not in usuarios[0]
+    assert "hash-secreto" not in response.text
+
+def test_exportar_usuarios_csv_com_janela(headers):
+    """Testa a exportação CSV filtrando pela data de criação."""
+    popular(db_usuarios)
+    response = client.get("/export/usuarios", params={
+        "formato": "csv",
+        "desde": (BASE + timedelta(minutes=2)).isoformat(),
+        "ate": (BASE + timedelta(minutes=3)).isoformat(),
+    }, headers=headers)
+
+    linhas = list(csv.DictReader(io.StringIO(response.text)))
+    assert [linha["username"] for linha in linhas] == ["user2", "user3"]
+    assert linhas[0]["nome_completo"] == "Usuário 2"
+
+def test_exportar_logs_com_gzip(headers, monkeypatch):
+    """Testa a exportação de logs comprimida quando o cliente aceita gzip."""
+    monkeypatch.setattr(main, "LOG_ADMINS", {"exportador"})
+    db_logs.add_many([(1, "LOGIN", "ok", BASE + timedelta(minutes=i)) for i in range(3)])
+    response = client.get("/export/logs", params={"ate": (BASE + timedelta(minutes=1)).isoformat()},
+                          headers={**headers, "Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    logs = [json.loads(linha) for linha in response.text.splitlines()]
+    assert [log["timestamp"] for log in logs] == [BASE.isoformat(), (BASE + timedelta(minutes=1)).isoformat()]
+
+def test_exportar_logs_exige_admin(headers):
+    """Testa que a exportação de logs de todos os usuários é restrita a LOG_ADMINS."""
+    db_logs.add(1, "LOGIN", "ok")
+    assert client.get("/export/logs", headers=headers).status_code == 403
+
+def test_exportar_formato_invalido(headers):
+    """Testa que formatos desconhecidos são rejeitados."""
+    response = client.get("/export/usuarios", params={"formato": "xml"}, headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from hash_pool import HashWorkerPool, PoolSaturatedError
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+def test_pool_executa_funcao_e_registra_latencia():
+    """Testa que o pool devolve o resultado e contabiliza a execução."""
+    pool = HashWorkerPool(max_workers=2, max_pending=2)
+    try:
+        resultado = asyncio.run(pool.run(lambda a, b: a + b, 2, 3))
+    finally:
+        pool.shutdown()
+
+    assert resultado == 5
+    stats = pool.stats()
+    assert stats["submetidos"] == 1
+    assert stats["concluidos"] == 1
+    assert stats["fila"] == 0
+
+def test_pool_rejeita_quando_fila_cheia():
+    """Testa a rejeição imediata quando workers e fila estão ocupados."""
+    pool = HashWorkerPool(max_workers=1, max_pending=0)
+    liberar = threading.Event()
+
+    async def cenario():
+        ocupado = asyncio.ensure_future(pool.run(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(lambda: None)
+        liberar.set()
+        await ocupado
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["rejeitados"] == 1
+
+def test_cadastro_responde_503_com_pool_saturado(monkeypatch):
+    """Testa que /cadastro responde 503 com Retry-After quando o pool está cheio."""
+    pool = HashWorkerPool(max_workers=1, max_pending=0)
+    monkeypatch.setattr(pool, "_pendentes", 1)
+    monkeypatch.setattr(main, "hash_pool", pool)
+
+    response = client.post("/cadastro", json={
+        "username": "ocupado",
+        "password": "123456",
+        "email": "ocupado@email.com"
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.HASH_POOL_RETRY_AFTER)
+    assert db_usuarios.get_by_username("ocupado") is None
+
+def test_stats_expoe_metricas_do_pool():
+    """Testa que /stats expõe fila e latência do pool de hashing."""
+    client.post("/cadastro", json={
+        "username": "metricas",
+        "password": "senha123",
+        "email": "metricas@email.com"
+    })
+    token = client.post("/login", json={
+        "username": "metricas",
+        "password": "senha123"
+    }).json()["access_token"]
+
+    response = client.get("/stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    hash_stats = response.json()["hash_pool"]
+    assert hash_stats["concluidos"] >= 2
+    assert "fila" in hash_stats and "latencia_media_ms" in hash_stats
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, create_access_token, db_usuarios, db_logs
+from storage import InMemoryLogStore, create_storage
+from storage.memory import LogSegments
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+BASE = datetime(2024, 1, 1, 2, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+def autenticar(username):
+    """Cadastra o usuário direto no repositório (sem gerar logs) e devolve os headers."""
+    db_usuarios.insert({
+        "username": username, "email": f"{username}@email.com", "nome_completo": None, "idade": None,
+        "hashed_password": "hash", "data_criacao": BASE, "ultimo_login": None,
+    })
+    token = create_access_token({"sub": username}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def headers(monkeypatch):
+    """Headers de um administrador de logs cadastrado com ID 1."""
+    monkeypatch.setattr(main, "LOG_ADMINS", {"operador"})
+    return autenticar("operador")
+
+
+def registrar(logs, quantidade=12):
+    """Uma entrada por minuto, alternando ações e usuários 1 e 2."""
+    logs.add_many([
+        (1 + i % 2, "LOGIN" if i % 3 == 0 else "CONSULTA", str(i), BASE + timedelta(minutes=i))
+        for i in range(quantidade)
+    ])
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_page_por_janela_acao_e_usuario(backend, tmp_path):
+    """Testa os filtros de tempo, ação e usuário e a retomada após um ID."""
+    _, logs = create_storage(backend, sqlite_path=str(tmp_path / "logs.db"))
+    registrar(logs)
+
+    def detalhes(**filtros):
+        return [log["detalhes"] for log in logs.page(100, **filtros)]
+
+    assert detalhes(desde=BASE + timedelta(minutes=2), ate=BASE + timedelta(minutes=5)) == ["2", "3", "4", "5"]
+    assert detalhes(acao="LOGIN") == ["0", "3", "6", "9"]
+    assert detalhes(acao="LOGIN", desde=BASE + timedelta(minutes=1), ate=BASE + timedelta(minutes=6)) == ["3", "6"]
+    assert detalhes(usuario_id=2, acao="CONSULTA") == ["1", "5", "7", "11"]
+    assert detalhes(acao="CONSULTA", apos_id=9) == ["10", "11"]  # ID = detalhes + 1
+    assert detalhes(desde=BASE + timedelta(hours=1)) == []
+    assert [log["detalhes"] for log in logs.page(2, acao="CONSULTA")] == ["1", "2"]
+    logs.close()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_page_com_ids_fora_da_ordem_de_timestamp(backend, tmp_path):
+    """Testa que a janela de tempo continua exata quando lotes chegam fora de ordem."""
+    _, logs = create_storage(backend, sqlite_path=str(tmp_path / "logs.db"))
+    ordem = list(range(10, 15)) + list(range(0, 5)) + list(range(5, 10))  # t10..t14 gravados primeiro
+    logs.add_many([(1, "LOGIN", str(i), BASE + timedelta(minutes=i)) for i in ordem])
+
+    def minutos(**filtros):
+        return sorted(int(log["detalhes"]) for log in logs.page(100, **filtros))
+
+    assert minutos(desde=BASE + timedelta(minutes=11)) == [11, 12, 13, 14]
+    assert minutos(ate=BASE + timedelta(minutes=3)) == [0, 1, 2, 3]
+    assert minutos(acao="LOGIN", desde=BASE + timedelta(minutes=4), ate=BASE + timedelta(minutes=10)) == \
+        [4, 5, 6, 7, 8, 9, 10]
+    # Paginação em ordem de ID cobre a janela inteira, sem repetir
+    vistos, apos_id = [], None
+    while True:
+        pagina = logs.page(2, apos_id, desde=BASE + timedelta(minutes=3), ate=BASE + timedelta(minutes=12))
+        vistos.extend(int(log["detalhes"]) for log in pagina)
+        if len(pagina) < 2:
+            break
+        apos_id = pagina[-1]["id"]
+    assert vistos == [10, 11, 12, 3, 4, 5, 6, 7, 8, 9]
+    logs.close()
+
+def test_segmentos_com_retencao():
+    """Testa a busca binária entre segmentos depois de descartes no início."""
+    segmentos = LogSegments()
+    segmentos.TAMANHO_SEGMENTO = 4
+    for i in range(1, 15):
+        segmentos.append({"id": i, "timestamp": BASE + timedelta(minutes=i)})
+    for _ in range(5):
+        segmentos.popleft()
+
+    assert len(segmentos) == 9
+    assert [e["id"] for e in segmentos] == list(range(6, 15))
+    assert [e["id"] for e in segmentos.iter_from()] == list(range(6, 15))
+    assert [e["id"] for e in segmentos.iter_from(desde=BASE)] == list(range(6, 15))
+    meio = BASE + timedelta(minutes=8, seconds=30)
+    assert [e["id"] for e in segmentos.iter_from(desde=meio)] == [9, 10, 11, 12, 13, 14]
+    assert [e["id"] for e in segmentos.iter_from(apos_id=11)] == [12, 13, 14]
+    assert list(segmentos.iter_from(desde=BASE + timedelta(hours=1))) == []
+
+def test_indice_por_acao_acompanha_retencao():
+    """Testa que o descarte por retenção também sai do índice da ação."""
+    logs = InMemoryLogStore(max_total=5)
+    registrar(logs, 9)
+
+    assert logs.count_by_action() == {"LOGIN": 1, "CONSULTA": 4}
+    assert [log["detalhes"] for log in logs.page(10, acao="LOGIN")] == ["6"]
+    assert [log["detalhes"] for log in logs.page(10)] == ["4", "5", "6", "7", "8"]
+
+def test_logs_por_janela_e_acao_com_cursor(headers):
+    """Testa /logs com todos=true, janela de tempo, ação e paginação por cursor."""
+    registrar(db_logs)
+    params = {"todos": "true", "acao": "CONSULTA", "desde": (BASE + timedelta(minutes=1)).isoformat(),
+              "ate": (BASE + timedelta(minutes=10)).isoformat(), "limite": 3}
+
+    vistos, cursor = [], None
+    while True:
+        response = client.get("/logs", headers=headers, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        vistos.extend(log["detalhes"] for log in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert vistos == ["1", "2", "4", "5", "7", "8", "10"]
+
+def test_logs_filtrados_do_proprio_usuario_e_de_outro(headers):
+    """Testa que, sem todos=true, os filtros valem para o usuário autenticado ou (admin) para usuario_id."""
+    registrar(db_logs)
+
+    proprios = client.get("/logs", headers=headers, params={"acao": "LOGIN"}).json()
+    assert [log["detalhes"] for log in proprios] == ["0", "6"]
+    outro = client.get("/logs", headers=headers, params={"usuario_id": 2, "acao": "LOGIN"}).json()
+    assert [log["detalhes"] for log in outro] == ["3", "9"]
+
+def test_logs_parametros_invalidos(headers):
+    """Testa as combinações rejeitadas com 400."""
+    assert client.get("/logs", headers=headers, params={"usuario_id": 2, "todos": "true"}).status_code == 400
+    assert client.get("/logs", headers=headers, params={"cursor": "invalido"}).status_code == 400
+
+def test_logs_de_outros_usuarios_exigem_admin(headers):
+    """Testa que quem não está em LOG_ADMINS só vê os próprios logs (403 para usuario_id/todos)."""
+    registrar(db_logs)
+    bob = autenticar("bob")  # ID 2
+
+    assert client.get("/logs", headers=bob, params={"usuario_id": 1}).status_code == 403
+    assert client.get("/logs", headers=bob, params={"todos": "true"}).status_code == 403
+    proprios = client.get("/logs", headers=bob, params={"acao": "LOGIN"}).json()
+    assert {log["usuario_id"] for log in proprios} == {2}
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app, create_access_token, db_usuarios, db_logs, http_requests_total
+from metrics import MetricsRegistry
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+# --- Testes das primitivas ---
+
+def test_render_counter_e_gauge():
+    """Testa o formato de exposição de contadores e gauges."""
+    registry = MetricsRegistry()
+    contador = registry.counter("eventos_total", "Eventos.", ("tipo",))
+    registry.gauge("fila", "Tamanho da fila.", callback=lambda: 3)
+    contador.inc("a")
+    contador.inc("a", valor=2)
+
+    texto = registry.render()
+    assert "# TYPE eventos_total counter" in texto
+    assert 'eventos_total{tipo="a"} 3' in texto
+    assert "fila 3" in texto
+
+def test_histogram_buckets_cumulativos_e_timer():
+    """Testa buckets cumulativos e o decorador de tempo (síncrono e assíncrono)."""
+    registry = MetricsRegistry()
+    histograma = registry.histogram("duracao_seconds", "Duração.", ("funcao",), buckets=(0.1, 1.0))
+    histograma.observe(0.05, "x")
+    histograma.observe(0.5, "x")
+    histograma.observe(5.0, "x")
+
+    @histograma.time("sync")
+    def soma(a, b):
+        return a + b
+
+    @histograma.time("async")
+    async def dobro(a):
+        return a * 2
+
+    assert soma(1, 2) == 3
+    assert asyncio.run(dobro(2)) == 4
+
+    texto = registry.render()
+    assert 'duracao_seconds_bucket{funcao="x",le="0.1"} 1' in texto
+    assert 'duracao_seconds_bucket{funcao="x",le="1"} 2' in texto
+    assert 'duracao_seconds_bucket{funcao="x",le="+Inf"} 3' in texto
+    assert 'duracao_seconds_count{funcao="x"} 3' in texto
+    assert histograma.count("sync") == 1 and histograma.count("async") == 1
+
+
+# --- Testes via API ---
+
+def test_middleware_usa_template_da_rota():
+    """Testa que a rota é registrada pelo template, não pelo caminho com ID."""
+    token = create_access_token({"sub": "observador"}, timedelta(minutes=5))
+    antes = http_requests_total.value("GET", "/usuario/{user_id}", "404")
+    client.get("/usuario/999", headers={"Authorization": f"Bearer {token}"})
+
+    assert http_requests_total.value("GET", "/usuario/{user_id}", "404") == antes + 1
+
+def test_endpoint_metrics_formato_prometheus():
+    """Testa que /metrics expõe latências por rota, funções e gauges."""
+    client.post("/cadastro", json={
+        "username": "medido",
+        "password": "senha123",
+        "email": "medido@email.com"
+    })
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    texto = response.text
+    assert 'http_request_duration_seconds_count{method="POST",route="/cadastro"}' in texto
+    assert 'app_function_duration_seconds_count{function="get_password_hash"}' in texto
+    assert "app_usuarios 1" in texto
+    assert "hash_pool_queue_depth" in texto
+    assert "/metrics" not in texto
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, create_access_token, db_usuarios, db_logs
+from storage import InMemoryUserStore, create_storage
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+BASE = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+@pytest.fixture
+def headers():
+    """Headers com um token válido (a listagem não exige usuário cadastrado)."""
+    token = create_access_token({"sub": "paginador"}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """Repositório de usuários de cada backend."""
+    usuarios, _ = create_storage(request.param, sqlite_path=str(tmp_path / "paginacao.db"))
+    yield usuarios
+    usuarios.close()
+
+
+def popular(store, quantidade=10):
+    """Cadastra usuários com idades alternadas e datas de criação crescentes."""
+    for i in range(1, quantidade + 1):
+        store.insert({
+            "username": f"user{i}",
+            "email": f"user{i}@email.com",
+            "nome_completo": None,
+            "idade": None if i % 5 == 0 else 20 + (i % 4),
+            "hashed_password": "hash",
+            "data_criacao": BASE + timedelta(minutes=i),
+            "ultimo_login": None,
+        })
+
+
+# --- Testes do repositório ---
+
+def test_page_por_id_com_keyset(store):
+    """Testa a paginação por ID continuando após a última chave."""
+    popular(store)
+    primeira = store.page(4)
+    segunda = store.page(4, apos=(primeira[-1]["id"],))
+
+    assert [u["id"] for u in primeira] == [1, 2, 3, 4]
+    assert [u["id"] for u in segunda] == [5, 6, 7, 8]
+
+def test_page_por_faixa_de_idade(store):
+    """Testa o filtro por idade servido pelo índice ordenado (idade, id)."""
+    popular(store)
+    pagina = store.page(10, ordem="idade", idade_min=21, idade_max=22)
+
+    assert [(u["idade"], u["id"]) for u in pagina] == [(21, 1), (21, 9), (22, 2), (22, 6)]
+    continuacao = store.page(10, ordem="idade", apos=(21, 9), idade_min=21, idade_max=22)
+    assert [u["id"] for u in continuacao] == [2, 6]
+
+def test_page_por_janela_de_criacao(store):
+    """Testa o filtro por data de criação servido pelo índice ordenado."""
+    popular(store)
+    pagina = store.page(
+        10, ordem="data_criacao",
+        criado_desde=BASE + timedelta(minutes=3), criado_ate=BASE + timedelta(minutes=5),
+    )
+    assert [u["id"] for u in pagina] == [3, 4, 5]
+
+def test_indices_ordenados_acompanham_update_e_delete():
+    """Testa que os índices ordenados refletem alterações de idade e exclusões."""
+    store = InMemoryUserStore()
+    popular(store, 4)
+    store.update(1, idade=40)
+    store.delete(2)
+
+    assert [u["id"] for u in store.page(10)] == [1, 3, 4]
+    assert [u["id"] for u in store.page(10, ordem="idade", idade_min=30)] == [1]
+
+
+# --- Testes via API ---
+
+def test_listagem_com_cursor_percorre_todos(headers):
+    """Testa que seguir o X-Next-Cursor percorre todos os usuários sem repetição."""
+    popular(db_usuarios, 7)
+    vistos, cursor = [], None
+    while True:
+        params = {"limite": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/usuarios", params=params, headers=headers)
+        assert response.status_code == 200
+        vistos.extend(u["id"] for u in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert vistos == list(range(1, 8))
+
+def test_listagem_after_id_e_filtros(headers):
+    """Testa after_id e os filtros de idade e data de criação."""
+    popular(db_usuarios)
+    response = client.get("/usuarios", params={"after_id": 8}, headers=headers)
+    assert [u["id"] for u in response.json()] == [9, 10]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/usuarios", params={"idade_min": 23, "limite": 1}, headers=headers)
+    assert [u["id"] for u in response.json()] == [3]
+    proxima = client.get("/usuarios", params={
+        "idade_min": 23, "limite": 1, "cursor": response.headers["X-Next-Cursor"]
+    }, headers=headers)
+    assert [u["id"] for u in proxima.json()] == [7]
+
+    response = client.get("/usuarios", params={
+        "criado_desde": (BASE + timedelta(minutes=9)).isoformat()
+    }, headers=headers)
+    assert [u["id"] for u in response.json()] == [9, 10]
+
+def test_listagem_offset_legado(headers):
+    """Testa que o parâmetro offset continua funcionando."""
+    popular(db_usuarios, 5)
+    response = client.get("/usuarios", params={"offset": 2, "limite": 2}, headers=headers)
+    assert [u["id"] for u in response.json()] == [3, 4]
+    assert "X-Next-Cursor" in response.headers
+
+def test_listagem_offset_negativo(headers):
+    """Testa que offset negativo é rejeitado na validação (422), não com erro interno."""
+    popular(db_usuarios, 3)
+    assert client.get("/usuarios", params={"offset": -1}, headers=headers).status_code == 422
+
+def test_listagem_cursor_invalido(headers):
+    """Testa cursores malformados ou incompatíveis com os filtros."""
+    popular(db_usuarios, 3)
+    assert client.get("/usuarios", params={"cursor": "nao-e-cursor"}, headers=headers).status_code == 400
+
+    cursor = client.get("/usuarios", params={"limite": 1}, headers=headers).headers["X-Next-Cursor"]
+    response = client.get("/usuarios", params={"cursor": cursor, "idade_min": 20}, headers=headers)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("ordem, chave, filtros", [
+    ("idade", ["a", 1], {"idade_min": 20}),
+    ("idade", [20], {"idade_min": 20}),
+    ("id", ["a"], {}),
+    ("id", [1, 2, 3], {}),
+    ("id", [True], {}),
+    ("data_criacao", [1, 1], {"criado_desde": "2024-01-01T00:00:00"}),
+])
+def test_listagem_cursor_com_chave_malformada(headers, ordem, chave, filtros):
+    """Testa que chaves com aridade ou tipos errados para a ordenação dão 400, não 500."""
+    popular(db_usuarios, 3)
+    cursor = main.encode_cursor(ordem, tuple(chave))
+    response = client.get("/usuarios", params={"cursor": cursor, **filtros}, headers=headers)
+    assert response.status_code == 400
+    response = client.get("/usuarios", params={"after_id": 1, "idade_min": 20}, headers=headers)
+    assert response.status_code == 400
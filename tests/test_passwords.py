@@ -0,0 +1,110 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from passwords import build_password_context, calibrate_bcrypt_rounds, resolve_bcrypt_rounds, warm_up_context
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+# --- Testes do custo do bcrypt ---
+
+def test_contexto_marca_apenas_hashes_com_custo_menor():
+    """Testa que só hashes com custo abaixo do configurado precisam ser refeitos."""
+    contexto = build_password_context(5)
+    assert not contexto.needs_update(contexto.hash("senha123"))
+    assert contexto.needs_update(build_password_context(4).hash("senha123"))
+    assert not contexto.needs_update(build_password_context(6).hash("senha123"))
+    assert contexto.verify("senha123", build_password_context(6).hash("senha123"))
+    assert contexto.verify("senha123", build_password_context(4).hash("senha123"))
+
+def test_calibracao_respeita_minimo_e_alvo():
+    """Testa que a calibração cresce com o alvo e nunca fica abaixo do mínimo."""
+    assert calibrate_bcrypt_rounds(0.001, minimo=4, maximo=8) == 6  # o custo base da medição
+    assert calibrate_bcrypt_rounds(0.001, minimo=10, maximo=16) == 10
+    assert calibrate_bcrypt_rounds(10_000, minimo=4, maximo=8) == 8
+
+def test_resolucao_da_configuracao():
+    """Testa a precedência: custo fixo, depois alvo de tempo, depois o padrão."""
+    assert resolve_bcrypt_rounds("5", alvo_ms=50) == 5
+    assert resolve_bcrypt_rounds(None, alvo_ms=0) == 12
+    assert resolve_bcrypt_rounds("", alvo_ms=0.001, minimo=7) == 7
+
+
+# --- Testes via API ---
+
+def test_login_refaz_hash_com_custo_antigo(monkeypatch):
+    """Testa que o login atualiza em background o hash gerado com outro custo."""
+    client.post("/cadastro", json={"username": "maria", "password": "senha123", "email": "maria@email.com"})
+    hash_antigo = db_usuarios.get_by_username("maria").hashed_password
+    assert hash_antigo.startswith("$2b$04$")
+
+    monkeypatch.setattr(main, "pwd_context", build_password_context(5))
+    rehashes = main.password_rehash_total.value()
+    response = client.post("/login", json={"username": "maria", "password": "senha123"})
+    assert response.status_code == 200
+
+    hash_novo = db_usuarios.get_by_username("maria").hashed_password
+    assert hash_novo.startswith("$2b$05$")
+    assert main.password_rehash_total.value() == rehashes + 1
+
+    # O novo hash continua válido e não é refeito de novo
+    assert client.post("/login", json={"username": "maria", "password": "senha123"}).status_code == 200
+    assert db_usuarios.get_by_username("maria").hashed_password == hash_novo
+
+def test_rehash_nao_sobrescreve_senha_alterada(monkeypatch):
+    """Testa que o rehash desiste se o hash mudou enquanto era calculado."""
+    client.post("/cadastro", json={"username": "maria", "password": "senha123", "email": "maria@email.com"})
+    usuario = db_usuarios.get_by_username("maria")
+    db_usuarios.update(usuario.id, hashed_password=main.get_password_hash("outrasenha"))
+    atual = db_usuarios.get(usuario.id).hashed_password
+
+    asyncio.run(main.rehash_password(usuario.id, "senha123", "hash-que-ja-mudou"))
+    assert db_usuarios.get(usuario.id).hashed_password == atual
+
+def test_stats_expoe_custo_do_bcrypt():
+    """Testa que /stats informa o custo em uso."""
+    token = main.create_access_token({"sub": "admin"}, timedelta(minutes=5))
+    dados = client.get("/stats", headers={"Authorization": f"Bearer {token}"}).json()
+    assert dados["bcrypt"]["rounds"] == main.BCRYPT_ROUNDS
+
+
+# --- Aquecimento na inicialização ---
+
+def test_aquecimento_usa_custo_minimo():
+    """Testa que o aquecimento não calcula nenhum hash com o custo configurado."""
+    contexto = build_password_context(12)
+    with patch.object(contexto, "hash") as hash_caro:
+        warm_up_context(contexto)
+    hash_caro.assert_not_called()
+
+def test_lifespan_aquece_antes_da_primeira_requisicao():
+    """Testa que a inicialização passa pelo pool de hashing e já deixa o esquema OpenAPI pronto."""
+    app.openapi_schema = None
+    submetidos = main.hash_pool.stats()["submetidos"]
+    with TestClient(app):
+        assert app.openapi_schema is not None
+        assert main.hash_pool.stats()["submetidos"] == submetidos + 1
+        linhas = main.startup_warmup_seconds.render()
+        assert any(linha.startswith("app_startup_warmup_seconds ") for linha in linhas)
+
+def test_aquecimento_desativado_por_configuracao():
+    """Testa que STARTUP_WARMUP=false pula o aquecimento."""
+    app.openapi_schema = None
+    with patch.object(main, "STARTUP_WARMUP", False), TestClient(app):
+        assert app.openapi_schema is None
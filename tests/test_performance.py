@@ -0,0 +1,94 @@
+"""
+Testes de performance (marcador ``performance``).
+
+Versões reduzidas da suíte de ``benchmarks/``; para a execução completa,
+com bases de 1M de usuários e relatório em JSON, use ``python -m benchmarks``.
+"""
+import json
+import os
+
+import pytest
+import main
+from main import app, db_usuarios, db_logs
+from benchmarks import loadgen, micro
+from benchmarks.__main__ import compare
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+def salvar_resultado(nome, resultado):
+    """Grava o resultado em JSON quando BENCHMARK_OUTPUT_DIR estiver definido."""
+    diretorio = os.getenv("BENCHMARK_OUTPUT_DIR")
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+        with open(os.path.join(diretorio, f"{nome}.json"), "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+
+def test_buscas_nao_crescem_com_a_base():
+    """Testa que as buscas por username/email são O(1): 20x mais usuários não pesam 5x mais."""
+    resultado = micro.bench_lookups([1_000, 20_000], repeticoes=2_000)
+    salvar_resultado("lookups", resultado)
+
+    for operacao in ("get_by_username", "get_by_email", "page"):
+        pequena = resultado["1000"][operacao]["p50_ms"]
+        grande = resultado["20000"][operacao]["p50_ms"]
+        assert grande < pequena * 5 + 0.01, operacao
+
+def test_cache_de_token_acelera_verify_token():
+    """Testa que a validação com cache é mais rápida que o jwt.decode completo."""
+    resultado = micro.bench_auth(repeticoes=500, repeticoes_bcrypt=1)
+    salvar_resultado("auth", resultado)
+
+    assert resultado["verify_token_com_cache"]["p50_ms"] < resultado["verify_token_sem_cache"]["p50_ms"]
+
+def test_gerador_de_carga_reporta_percentis():
+    """Testa o gerador de carga em processo com uma mistura de leituras."""
+    resultado = loadgen.run_load(app, total=200, concorrencia=8, contas=2,
+                                 mistura={"me": 60, "listagem": 40})
+    salvar_resultado("load", resultado)
+
+    total = resultado["total"]
+    assert total["operacoes"] == 200
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"]
+    assert all(operacao["erros"] == 0 for operacao in resultado["por_operacao"].values())
+
+def test_comparacao_detecta_regressoes():
+    """Testa a detecção de regressões entre duas execuções."""
+    anterior = {"load": {"total": {"p99_ms": 10.0, "ops_por_segundo": 1000.0}}}
+    atual = {"load": {"total": {"p99_ms": 13.0, "ops_por_segundo": 950.0}}}
+
+    regressoes = compare(atual, anterior, tolerancia=0.2)
+    assert len(regressoes) == 1
+    assert regressoes[0].startswith("load.total.p99_ms")
+
+@pytest.mark.skipif(db_usuarios.bloqueante, reason="só o backend em memória roda no event loop")
+def test_leituras_no_event_loop_nao_usam_threadpool(monkeypatch):
+    """Testa que, no backend em memória, as leituras não saltam para o threadpool."""
+    chamadas = []
+
+    async def threadpool_contado(fn, *args, **kwargs):
+        chamadas.append(fn)
+        return fn(*args, **kwargs)
+
+    monkeypatch.setattr(main, "run_in_threadpool", threadpool_contado)
+    mistura = {"me": 60, "listagem": 40}
+    resultado = loadgen.run_load(app, total=200, concorrencia=8, contas=2, mistura=mistura)
+    salvar_resultado("async", resultado)
+    assert resultado["total"]["operacoes"] == 200
+    assert chamadas == []
+
+    # Com um repositório bloqueante (sqlite), cada operação iria para o threadpool
+    monkeypatch.setattr(type(db_usuarios), "bloqueante", True)
+    loadgen.run_load(app, total=20, concorrencia=2, contas=2, mistura=mistura)
+    assert chamadas
@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs, profile_cache
+from cache import ProfileCache
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o cache de perfis antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+
+
+def cadastrar_e_logar(username="maria"):
+    """Cadastra um usuário, faz login e retorna (id, headers de autenticação)."""
+    user_id = client.post("/cadastro", json={
+        "username": username, "password": "senha123", "email": f"{username}@email.com"
+    }).json()["id"]
+    token = client.post("/login", json={"username": username, "password": "senha123"}).json()["access_token"]
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+# --- Testes do cache ---
+
+def test_cache_de_perfis_indexa_por_username():
+    """Testa a busca pelo username e a remoção do índice ao invalidar."""
+    cache = ProfileCache(maxsize=10)
+    assert cache.put(1, "Maria", b"{}", '"e1"', cache.geracao)
+    assert cache.get_by_username("MARIA") == ("maria", b"{}", '"e1"')
+    cache.invalidate(1)
+    assert cache.get_by_username("maria") is None
+
+def test_cache_de_perfis_descarta_leitura_anterior_a_invalidacao():
+    """Testa que um perfil lido antes de uma alteração não volta para o cache."""
+    cache = ProfileCache(maxsize=10)
+    geracao = cache.geracao
+    cache.invalidate(1)  # alteração concorrente durante a leitura
+    assert not cache.put(1, "maria", b"{}", '"e1"', geracao)
+    assert len(cache) == 0
+
+
+# --- Testes via API ---
+
+def test_perfil_servido_do_cache(monkeypatch):
+    """Testa que leituras repetidas não consultam o repositório."""
+    user_id, headers = cadastrar_e_logar()
+    primeira = client.get(f"/usuario/{user_id}", headers=headers)
+
+    def sem_repositorio(*args):
+        raise AssertionError("perfil deveria vir do cache")
+
+    monkeypatch.setattr(main.db_usuarios, "get", sem_repositorio)
+    monkeypatch.setattr(main.db_usuarios, "get_by_username", sem_repositorio)
+    assert client.get(f"/usuario/{user_id}", headers=headers).json() == primeira.json()
+    assert client.get("/me", headers=headers).json() == primeira.json()
+
+def test_alteracoes_invalidam_o_perfil():
+    """Testa a invalidação após atualização, login e exclusão."""
+    user_id, headers = cadastrar_e_logar()
+    perfil = client.get("/me", headers=headers).json()
+
+    client.put(f"/usuario/{user_id}", json={"idade": 30}, headers=headers)
+    assert client.get(f"/usuario/{user_id}", headers=headers).json()["idade"] == 30
+
+    client.post("/login", json={"username": "maria", "password": "senha123"})
+    assert client.get("/me", headers=headers).json()["ultimo_login"] != perfil["ultimo_login"]
+
+    _, outro = cadastrar_e_logar("joao")
+    client.delete(f"/usuario/{user_id}", headers=headers)
+    assert client.get(f"/usuario/{user_id}", headers=outro).status_code == 404
+
+def test_etag_responde_304():
+    """Testa If-None-Match: 304 sem corpo enquanto o perfil não muda."""
+    user_id, headers = cadastrar_e_logar()
+    response = client.get(f"/usuario/{user_id}", headers=headers)
+    etag = response.headers["ETag"]
+
+    repetida = client.get(f"/usuario/{user_id}", headers={**headers, "If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.content == b""
+    assert repetida.headers["ETag"] == etag
+
+    client.put(f"/usuario/{user_id}", json={"nome_completo": "Maria Silva"}, headers=headers)
+    alterada = client.get(f"/usuario/{user_id}", headers={**headers, "If-None-Match": etag})
+    assert alterada.status_code == 200
+    assert alterada.headers["ETag"] != etag
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from rate_limit import InMemoryTokenBucketStore, LoginRateLimiter
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o estado do limitador antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    main.login_limiter.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    main.login_limiter.clear()
+
+
+# --- Testes do token bucket ---
+
+def test_bucket_permite_rajada_e_recarrega():
+    """Testa a capacidade inicial, a recusa sem tokens e a recarga contínua."""
+    store = InMemoryTokenBucketStore()
+    assert [store.consume("k", 3, 1.0, agora=0) for _ in range(3)] == [0, 0, 0]
+    assert store.consume("k", 3, 1.0, agora=0) == pytest.approx(1.0)
+    assert store.consume("k", 3, 1.0, agora=0.5) == pytest.approx(0.5)
+    assert store.consume("k", 3, 1.0, agora=1.0) == 0
+
+def test_bucket_descarta_chaves_ociosas():
+    """Testa que chaves cujo bucket já estaria cheio deixam de ocupar memória."""
+    store = InMemoryTokenBucketStore()
+    store.consume("a", 2, 1.0, agora=0)
+    store.consume("b", 2, 1.0, agora=0.5)
+    assert len(store) == 2
+
+    store.consume("c", 2, 1.0, agora=1.2)  # "a" encheu em t=1, "b" só em t=1.5
+    assert len(store) == 2
+    assert store.descartadas == 1
+
+def test_bucket_respeita_limite_de_chaves():
+    """Testa o teto de chaves contra sprays de usernames."""
+    store = InMemoryTokenBucketStore(max_chaves=100)
+    for i in range(1000):
+        store.consume(f"usuario:{i}", 5, 0.01, agora=0)
+    assert len(store) <= 100
+
+def test_limitador_por_username_independente_do_ip():
+    """Testa que o limite por username vale mesmo trocando de IP."""
+    limitador = LoginRateLimiter(InMemoryTokenBucketStore(), ip_capacidade=100, ip_por_minuto=60,
+                                 usuario_capacidade=2, usuario_por_minuto=60)
+    assert limitador.check("1.1.1.1", "Maria", agora=0) == 0
+    assert limitador.check("2.2.2.2", "maria", agora=0) == 0
+    assert limitador.check("3.3.3.3", "MARIA", agora=0) > 0
+    assert limitador.check("3.3.3.3", "joao", agora=0) == 0
+    assert limitador.stats()["bloqueados"] == 1
+
+
+# --- Testes via API ---
+
+def test_login_bloqueado_responde_429_sem_bcrypt():
+    """Testa que tentativas acima do limite são recusadas antes de qualquer verificação de senha."""
+    with patch.object(main.login_limiter, "usuario_capacidade", 2), \
+            patch.object(main, "verify_dummy_password", return_value=False) as dummy:
+        for _ in range(2):
+            response = client.post("/login", json={"username": "alvo", "password": "errada"})
+            assert response.status_code == 401
+        response = client.post("/login", json={"username": "alvo", "password": "errada"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert dummy.call_count == 2
+
+def test_login_usuario_inexistente_usa_hash_ficticio():
+    """Testa que usernames inexistentes também pagam uma verificação de bcrypt."""
+    with patch.object(main.pwd_context, "dummy_verify") as dummy_verify:
+        response = client.post("/login", json={"username": "fantasma", "password": "qualquer"})
+    assert response.status_code == 401
+    dummy_verify.assert_called_once()
+
+def test_limitador_desativado_por_configuracao():
+    """Testa que o limitador pode ser desligado (ex.: atrás de um proxy que já limita)."""
+    with patch.object(main.login_limiter, "ativo", False):
+        assert main.login_limiter.check("1.1.1.1", "x") == 0
+        assert main.login_limiter.stats()["chaves"] == 0
@@ -0,0 +1,134 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app, db_usuarios, db_logs, profile_cache
+from storage.search import PrefixIndex, normalizar_busca
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o cache de perfis antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    profile_cache.clear()
+
+
+def cadastrar(username, nome_completo=None, email=None):
+    return client.post("/cadastro", json={
+        "username": username, "password": "senha123",
+        "email": email or f"{username}@email.com", "nome_completo": nome_completo,
+    }).json()["id"]
+
+
+def autenticar(username):
+    token = client.post("/login", json={"username": username, "password": "senha123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def buscar(headers, q, **params):
+    response = client.get("/usuarios/search", headers=headers, params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [usuario["username"] for usuario in response.json()], response.headers.get("X-Next-Cursor")
+
+
+def test_normalizacao_sem_acentos_e_caixa():
+    """Testa que a normalização remove acentos e ignora maiúsculas."""
+    assert normalizar_busca("Conceição") == "conceicao"
+    assert normalizar_busca("JOÃO") == normalizar_busca("joao") == "joao"
+
+def test_busca_ignora_acentos_e_ranqueia_por_campo():
+    """Testa o ranking: username exato, prefixo de username, nome e, por fim, email."""
+    cadastrar("joao", "João Silva")
+    cadastrar("joaozinho")
+    cadastrar("maria", "Maria Joana")
+    cadastrar("ana", email="jo@provedor.com")
+    cadastrar("pedro", "Pedro Souza")
+    headers = autenticar("joao")
+
+    assert buscar(headers, "João")[0] == ["joao", "joaozinho"]
+    assert buscar(headers, "jo")[0] == ["joao", "joaozinho", "maria", "ana"]
+    assert buscar(headers, "SILVA")[0] == ["joao"]
+    assert buscar(headers, "xyz")[0] == []
+
+def test_busca_com_varias_palavras_e_dominio():
+    """Testa que todas as palavras precisam casar e a busca pelo domínio do email."""
+    cadastrar("maria", "Maria Silva", "maria@empresa.com")
+    cadastrar("mariana", "Mariana Souza")
+    headers = autenticar("maria")
+
+    assert buscar(headers, "mari silva")[0] == ["maria"]
+    assert buscar(headers, "souza mar")[0] == ["mariana"]
+    assert buscar(headers, "empresa.com")[0] == ["maria"]
+
+def test_paginacao_da_busca_sem_repetidos():
+    """Testa que o cursor percorre todos os resultados, uma única vez e na ordem do ranking."""
+    for i in range(7):
+        cadastrar(f"silva{i}", f"Fulano Silva {i}")
+    for i in range(5):
+        cadastrar(f"user{i}", f"Beltrano Silva {i}")
+    headers = autenticar("silva0")
+    completa, _ = buscar(headers, "silva", limite=100)
+
+    paginas, cursor = [], None
+    while True:
+        pagina, cursor = buscar(headers, "silva", limite=5, **({"cursor": cursor} if cursor else {}))
+        paginas.extend(pagina)
+        if cursor is None:
+            break
+
+    assert paginas == completa
+    assert len(paginas) == 12
+    assert paginas[:7] == [f"silva{i}" for i in range(7)]
+
+def test_cursor_de_outra_busca_e_rejeitado():
+    """Testa que o cursor só vale para a mesma consulta."""
+    for i in range(3):
+        cadastrar(f"ana{i}")
+    headers = autenticar("ana0")
+    _, cursor = buscar(headers, "ana", limite=1)
+
+    response = client.get("/usuarios/search", headers=headers, params={"q": "outra", "cursor": cursor})
+    assert response.status_code == 400
+
+def test_indice_acompanha_atualizacao_e_remocao():
+    """Testa que o índice reflete PUT (nome e email) e DELETE."""
+    maria = cadastrar("maria", "Maria Silva")
+    cadastrar("joao")
+    headers, dona = autenticar("joao"), autenticar("maria")
+
+    client.put(f"/usuario/{maria}", headers=dona, json={"nome_completo": "Maria Conceição", "email": "m@novo.com"})
+    assert buscar(headers, "silva")[0] == []
+    assert buscar(headers, "conceicao")[0] == ["maria"]
+    assert buscar(headers, "novo.com")[0] == ["maria"]
+    assert buscar(headers, "email.com")[0] == ["joao"]
+
+    assert client.delete(f"/usuario/{maria}", headers=dona).status_code == 200
+    assert buscar(headers, "maria")[0] == []
+
+def test_busca_exige_autenticacao_e_registra_log():
+    """Testa a autenticação obrigatória e o log agregado da busca."""
+    cadastrar("maria")
+    assert client.get("/usuarios/search", params={"q": "maria"}).status_code in (401, 403)
+
+    buscar(autenticar("maria"), "maria")
+    assert db_logs.count_by_action()["BUSCA"] == 1
+
+def test_prefix_index_em_blocos():
+    """Testa o índice de prefixos com divisão de blocos, remoção e retomada após uma chave."""
+    indice = PrefixIndex()
+    indice.TAMANHO_BLOCO = 4
+    for user_id in range(1, 40):
+        indice.add(f"t{user_id:02d}", user_id)
+        indice.add("comum", user_id)
+    indice.remove("t05", 5)
+    indice.remove("comum", 2)
+
+    assert [termo for termo, _ in indice.iter_prefix("t0")] == [f"t0{i}" for i in range(1, 10) if i != 5]
+    assert [user_id for _, user_id in indice.iter_prefix("comum", ("comum", 37))] == [38, 39]
+    assert len(list(indice.iter_prefix("comum"))) == 38
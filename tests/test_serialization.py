@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+import serialization
+from main import app, db_usuarios, db_logs, create_access_token
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+@pytest.fixture
+def headers():
+    """Popula usuários e logs e retorna o header de autenticação do segundo usuário."""
+    base = datetime(2024, 3, 1, 12, 0, 0, 500)
+    for i in range(1, 6):
+        db_usuarios.insert({
+            "username": f"user{i}",
+            "email": f"user{i}@email.com",
+            "nome_completo": f"Usuário {i}" if i % 2 else None,
+            "idade": 20 + i if i != 3 else None,
+            "hashed_password": "hash",
+            "data_criacao": base + timedelta(minutes=i),
+            "ultimo_login": base + timedelta(days=1) if i == 1 else None,
+        })
+    db_logs.add(2, "LOGIN", "Login realizado com sucesso", timestamp=base)
+    db_logs.add(2, "CONSULTA", "Perfil consultado", timestamp=base + timedelta(seconds=1))
+    token = create_access_token({"sub": "user2"}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def respostas(params_por_rota, headers):
+    """Executa as requisições e devolve status, corpo e cursor de cada uma."""
+    resultado = []
+    for rota, params in params_por_rota:
+        response = client.get(rota, params=params, headers=headers)
+        resultado.append((response.status_code, response.json(), response.headers.get("X-Next-Cursor")))
+    return resultado
+
+
+ROTAS = [
+    ("/usuarios", {"limite": 2}),
+    ("/usuarios", {"idade_min": 22}),
+    ("/usuario/1", {}),
+    ("/me", {}),
+    ("/logs", {"limite": 10}),
+]
+
+
+@pytest.mark.parametrize("sem_orjson", [False, True])
+def test_modo_rapido_gera_o_mesmo_json(monkeypatch, headers, sem_orjson):
+    """Testa que o modo rápido produz exatamente as mesmas respostas do modo padrão."""
+    if sem_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+
+    monkeypatch.setattr(main, "FAST_SERIALIZATION", False)
+    padrao = respostas(ROTAS, headers)
+    monkeypatch.setattr(main, "FAST_SERIALIZATION", True)
+    rapido = respostas(ROTAS, headers)
+
+    assert rapido == padrao
+    assert padrao[0][2] is not None  # cursor da próxima página preservado
+    assert "hashed_password" not in rapido[3][1]
+
+
+def test_modo_rapido_nao_altera_openapi(monkeypatch):
+    """Testa que o schema OpenAPI continua descrevendo os modelos de resposta."""
+    esquema = app.openapi()
+    listagem = esquema["paths"]["/usuarios"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert listagem["items"]["$ref"] == "#/components/schemas/UserResponse"
+    logs = esquema["paths"]["/logs"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert logs["items"]["$ref"] == "#/components/schemas/LogEntry"
@@ -0,0 +1,210 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app
+from rate_limit import SQLiteTokenBucketStore
+from storage import DuplicateKeyError, SQLiteDatabase, SQLiteLogStore, SQLiteUserStore, create_storage
+from tokens import SQLiteRefreshTokenStore, SQLiteRevocationList
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    """Caminho de um banco SQLite temporário."""
+    return str(tmp_path / "cadastro.db")
+
+
+@pytest.fixture
+def stores(sqlite_path):
+    """Repositórios SQLite compartilhando o mesmo arquivo."""
+    usuarios, logs = create_storage("sqlite", sqlite_path=sqlite_path)
+    yield usuarios, logs
+    usuarios.close()
+
+
+@pytest.fixture
+def sqlite_app(monkeypatch, stores):
+    """Faz a API usar o backend SQLite durante o teste."""
+    usuarios, logs = stores
+    monkeypatch.setattr(main, "db_usuarios", usuarios)
+    monkeypatch.setattr(main, "db_logs", logs)
+    monkeypatch.setattr(main.audit_writer, "store", logs)
+    return stores
+
+
+def novo_usuario(username, email):
+    """Monta um registro de usuário completo para o backend SQLite."""
+    return {
+        "username": username,
+        "email": email,
+        "nome_completo": None,
+        "idade": None,
+        "hashed_password": "hash",
+        "data_criacao": datetime.now(),
+        "ultimo_login": None,
+    }
+
+
+def test_sqlite_modo_wal(stores):
+    """Testa que o banco é aberto em modo WAL."""
+    usuarios, _ = stores
+    modo = usuarios.db.connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert modo == "wal"
+
+def test_sqlite_insert_e_buscas_por_indice(stores):
+    """Testa inserção com ID gerado pelo banco e buscas sem diferenciar caixa."""
+    usuarios, _ = stores
+    maria = usuarios.insert(novo_usuario("Maria", "Maria@Email.com"))
+
+    assert maria["id"] == 1
+    assert usuarios.get_by_username("maria")["id"] == 1
+    assert usuarios.get_by_email("maria@email.com")["email"] == "Maria@Email.com"
+    assert isinstance(usuarios.get(1)["data_criacao"], datetime)
+    assert len(usuarios) == 1 and 1 in usuarios
+
+def test_sqlite_busca_em_lote(stores):
+    """Testa as buscas em lote por IDs e usernames (uma consulta IN, sem diferenciar caixa)."""
+    usuarios, _ = stores
+    maria = usuarios.insert(novo_usuario("Maria", "maria@email.com"))
+    joao = usuarios.insert(novo_usuario("joao", "joao@email.com"))
+
+    assert sorted(u["id"] for u in usuarios.get_many([joao["id"], 999, maria["id"], joao["id"]])) == [1, 2]
+    assert [u["username"] for u in usuarios.get_many_by_username(["MARIA", "fantasma"])] == ["Maria"]
+    assert usuarios.get_many([]) == []
+
+def test_sqlite_busca_por_prefixo(sqlite_path):
+    """Testa a busca com o índice em tabela, mantido nas escritas e montado para bancos antigos."""
+    db = SQLiteDatabase(sqlite_path)
+    usuarios = SQLiteUserStore(db)
+    maria = usuarios.insert({**novo_usuario("maria", "maria@email.com"), "nome_completo": "Maria Conceição"})
+    usuarios.insert(novo_usuario("mariana", "mariana@email.com"))
+    usuarios.update(maria["id"], nome_completo="Maria Silva")
+
+    assert [u["username"] for u in usuarios.search("MARI", 10)[0]] == ["maria", "mariana"]
+    assert usuarios.search("conceicao", 10)[0] == []
+    pagina, cursor = usuarios.search("mari", 1)
+    assert [u["username"] for u in pagina + usuarios.search("mari", 1, cursor)[0]] == ["maria", "mariana"]
+
+    db.connection().execute("DELETE FROM busca_termos")  # banco anterior ao índice
+    db.close()
+    db = SQLiteDatabase(sqlite_path)
+    try:
+        assert [u["username"] for u in SQLiteUserStore(db).search("silva", 10)[0]] == ["maria"]
+    finally:
+        db.close()
+
+def test_sqlite_unicidade(stores):
+    """Testa que os índices únicos do banco barram username/email duplicados."""
+    usuarios, _ = stores
+    usuarios.insert(novo_usuario("maria", "maria@email.com"))
+    joao = usuarios.insert(novo_usuario("joao", "joao@email.com"))
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        usuarios.insert(novo_usuario("MARIA", "outra@email.com"))
+    assert exc.value.campo == "username"
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        usuarios.update(joao["id"], email="MARIA@email.com")
+    assert exc.value.campo == "email"
+
+def test_sqlite_persiste_entre_conexoes(sqlite_path):
+    """Testa que os dados sobrevivem a um "restart" (novo pool de conexões)."""
+    db = SQLiteDatabase(sqlite_path)
+    SQLiteUserStore(db).insert(novo_usuario("persistido", "persistido@email.com"))
+    SQLiteLogStore(db).add(1, "CADASTRO")
+    db.close()
+
+    db = SQLiteDatabase(sqlite_path)
+    try:
+        assert SQLiteUserStore(db).get_by_username("persistido") is not None
+        assert [log["acao"] for log in SQLiteLogStore(db).recent(1, 10)] == ["CADASTRO"]
+    finally:
+        db.close()
+
+def test_sqlite_retencao_de_logs(sqlite_path):
+    """Testa os limites global e por usuário aplicados pela limpeza periódica."""
+    db = SQLiteDatabase(sqlite_path)
+    logs = SQLiteLogStore(db, max_por_usuario=2, max_total=4, intervalo_limpeza=1)
+    try:
+        for i in range(4):
+            logs.add(1, "CONSULTA", f"consulta {i}")
+        logs.add(2, "LOGIN")
+
+        assert [log["detalhes"] for log in logs.recent(1, 10)] == ["consulta 2", "consulta 3"]
+        assert len(logs) == 3
+    finally:
+        db.close()
+
+@pytest.fixture
+def dois_workers(sqlite_path):
+    """Dois pools de conexão no mesmo arquivo, como dois processos do uvicorn."""
+    bancos = [SQLiteDatabase(sqlite_path), SQLiteDatabase(sqlite_path)]
+    yield bancos
+    for db in bancos:
+        db.close()
+
+def test_sqlite_revogacao_compartilhada_entre_workers(dois_workers, monkeypatch):
+    """Testa que um logout em um worker invalida o token nos demais."""
+    monkeypatch.setattr("tokens.time.time", lambda: 1000.0)
+    um, outro = (SQLiteRevocationList(db) for db in dois_workers)
+    um.revoke("jti-1", expira_em=1100)
+    um.revoke_subject("maria", revogado_em=1000, expira_em=1200)
+
+    assert outro.is_revoked("jti-1", "joao", 900)
+    assert outro.is_revoked(None, "maria", 999)
+    assert not outro.is_revoked(None, "maria", 1001)
+    assert outro.stats() == {"jtis": 1, "usuarios": 1}
+
+    outro.purge(agora=1150)
+    assert um.stats() == {"jtis": 0, "usuarios": 1}
+
+def test_sqlite_refresh_token_de_uso_unico_entre_workers(dois_workers):
+    """Testa que o mesmo refresh token só pode ser rotacionado uma vez, em qualquer worker."""
+    um, outro = (SQLiteRefreshTokenStore(db, ttl_segundos=60) for db in dois_workers)
+    token = um.issue("maria")
+    sub, novo = outro.rotate(token)
+    assert sub == "maria"
+    assert um.rotate(token) is None
+    assert um.stats() == {"ativos": 1, "usuarios": 1}
+    assert um.revoke_subject("maria") == 1
+    assert outro.rotate(novo) is None
+
+def test_sqlite_token_bucket_compartilhado_entre_workers(dois_workers):
+    """Testa que as tentativas de login somam entre workers."""
+    um, outro = (SQLiteTokenBucketStore(db) for db in dois_workers)
+    assert um.consume("usuario:maria", 2, 1.0, agora=0) == 0
+    assert outro.consume("usuario:maria", 2, 1.0, agora=0) == 0
+    assert um.consume("usuario:maria", 2, 1.0, agora=0) == pytest.approx(1.0)
+    assert outro.consume("usuario:maria", 2, 1.0, agora=1.0) == 0
+
+    outro.reset("usuario:maria")
+    assert len(um) == 0
+
+def test_fluxo_completo_com_backend_sqlite(sqlite_app):
+    """Testa cadastro, login, consulta e exclusão usando o backend SQLite."""
+    usuarios, logs = sqlite_app
+    cadastro = client.post("/cadastro", json={
+        "username": "sqliteuser",
+        "password": "senha123",
+        "email": "sqlite@email.com"
+    })
+    assert cadastro.status_code == 201
+    user_id = cadastro.json()["id"]
+
+    token = client.post("/login", json={
+        "username": "sqliteuser",
+        "password": "senha123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    perfil = client.get("/me", headers=headers).json()
+    assert perfil["id"] == user_id
+    assert perfil["ultimo_login"] is not None
+    assert [log["acao"] for log in client.get("/logs", headers=headers).json()] == ["CADASTRO", "LOGIN"]
+
+    assert client.delete(f"/usuario/{user_id}", headers=headers).status_code == 200
+    assert usuarios.get(user_id) is None
@@ -0,0 +1,153 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs, create_access_token
+from metrics import SlidingWindowCounter
+from storage import InMemoryLogStore, InMemoryUserStore, SQLiteDatabase, SQLiteLogStore, SQLiteUserStore
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e as janelas de login antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    main.logins_ultimo_minuto.clear()
+    main.logins_ultima_hora.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    main.logins_ultimo_minuto.clear()
+    main.logins_ultima_hora.clear()
+
+
+def novo_usuario(username, ultimo_login=None):
+    """Monta um registro de usuário completo para os repositórios."""
+    return {
+        "username": username,
+        "email": f"{username}@email.com",
+        "nome_completo": None,
+        "idade": None,
+        "hashed_password": "hash",
+        "data_criacao": datetime(2024, 1, 1),
+        "ultimo_login": ultimo_login,
+    }
+
+
+def verificar_contadores(usuarios, logs):
+    """Exercita os contadores incrementais de um par de repositórios."""
+    ana = usuarios.insert(novo_usuario("ana"))
+    bia = usuarios.insert(novo_usuario("bia", ultimo_login=datetime(2024, 1, 2)))
+    usuarios.insert(novo_usuario("caio"))
+    assert len(usuarios) == 3
+    assert usuarios.count_logged_in() == 1
+
+    usuarios.update(ana["id"], ultimo_login=datetime(2024, 1, 3))
+    usuarios.update(ana["id"], ultimo_login=datetime(2024, 1, 4))
+    assert usuarios.count_logged_in() == 2
+
+    usuarios.delete(bia["id"])
+    assert len(usuarios) == 2
+    assert usuarios.count_logged_in() == 1
+
+    logs.add(1, "CADASTRO")
+    logs.add(1, "LOGIN")
+    logs.add_many([(2, "LOGIN", "", datetime.now()), (2, "CONSULTA", "", datetime.now())])
+    assert len(logs) == 4
+    assert logs.count_by_action() == {"CADASTRO": 1, "LOGIN": 2, "CONSULTA": 1}
+
+    usuarios.clear()
+    logs.clear()
+    assert len(usuarios) == 0
+    assert usuarios.count_logged_in() == 0
+    assert logs.count_by_action() == {}
+
+
+def test_contadores_em_memoria():
+    """Testa os agregados incrementais do backend em memória."""
+    verificar_contadores(InMemoryUserStore(), InMemoryLogStore())
+
+
+def test_contadores_sqlite(tmp_path):
+    """Testa os agregados mantidos por triggers no backend SQLite."""
+    db = SQLiteDatabase(str(tmp_path / "cadastro.db"))
+    try:
+        verificar_contadores(SQLiteUserStore(db), SQLiteLogStore(db))
+    finally:
+        db.close()
+
+
+def test_contadores_acompanham_retencao():
+    """Testa que entradas descartadas pela retenção saem da contagem por ação."""
+    logs = InMemoryLogStore(max_por_usuario=10, max_total=2)
+    logs.add(1, "CADASTRO")
+    logs.add(1, "LOGIN")
+    logs.add(1, "LOGIN")
+    assert logs.count_by_action() == {"LOGIN": 2}
+
+
+def test_contadores_sqlite_semeados_de_banco_existente(tmp_path):
+    """Testa que bancos criados antes dos contadores têm os totais reconstruídos."""
+    caminho = str(tmp_path / "cadastro.db")
+    db = SQLiteDatabase(caminho)
+    SQLiteUserStore(db).insert(novo_usuario("ana", ultimo_login=datetime(2024, 1, 2)))
+    SQLiteLogStore(db).add(1, "CADASTRO")
+    db.close()
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("DROP TABLE contadores")
+
+    db = SQLiteDatabase(caminho)
+    try:
+        assert len(SQLiteUserStore(db)) == 1
+        assert SQLiteUserStore(db).count_logged_in() == 1
+        assert SQLiteLogStore(db).count_by_action() == {"CADASTRO": 1}
+    finally:
+        db.close()
+
+
+def test_janela_deslizante_descarta_buckets_antigos():
+    """Testa que eventos fora da janela deixam de ser contados."""
+    janela = SlidingWindowCounter(janela=60, resolucao=1)
+    janela.add(agora=1000)
+    janela.add(2, agora=1030)
+    assert janela.count(agora=1030) == 3
+    assert janela.count(agora=1060) == 2
+    assert janela.count(agora=1090) == 0
+
+    # O bucket reaproveitado no anel é zerado antes de contar o novo evento
+    janela.add(agora=1090)
+    assert janela.count(agora=1090) == 1
+
+
+def test_janela_deslizante_com_resolucao_maior():
+    """Testa a janela de uma hora com buckets de um minuto."""
+    janela = SlidingWindowCounter(janela=3600, resolucao=60)
+    janela.add(agora=0)
+    janela.add(agora=3599)
+    assert janela.count(agora=3599) == 2
+    assert janela.count(agora=3600) == 1
+
+
+def test_stats_expoe_contadores_incrementais():
+    """Testa o endpoint /stats com contagens por ação e logins recentes."""
+    main.logins_ultimo_minuto.add(3)
+    main.logins_ultima_hora.add(5)
+    db_logs.add(1, "LOGIN")
+    db_logs.add(1, "CONSULTA")
+    db_usuarios.insert(novo_usuario("ana", ultimo_login=datetime.now()))
+
+    token = create_access_token({"sub": "admin"}, timedelta(minutes=5))
+    response = client.get("/stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    dados = response.json()
+    assert dados["total_usuarios"] == 1
+    assert dados["usuarios_com_login"] == 1
+    assert dados["total_logs"] == 2
+    assert dados["logs_por_acao"] == {"LOGIN": 1, "CONSULTA": 1}
+    assert dados["logins_ultimo_minuto"] == 3
+    assert dados["logins_ultima_hora"] == 5
@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app, db_usuarios, db_logs, UserResponse
+from storage import DuplicateKeyError, InMemoryLogStore, InMemoryUserStore, UserRecord
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+
+
+def novo_usuario(user_id, username, email, idade=None, data_criacao=None):
+    """Monta um registro de usuário mínimo para os testes do repositório."""
+    return {
+        "id": user_id,
+        "username": username,
+        "email": email,
+        "idade": idade,
+        "hashed_password": "hash",
+        "data_criacao": data_criacao or datetime(2024, 1, 1) + timedelta(minutes=user_id),
+        "ultimo_login": None,
+    }
+
+
+# --- Testes do repositório em memória ---
+
+def test_store_busca_por_username_e_email():
+    """Testa as buscas O(1) pelos índices secundários."""
+    store = InMemoryUserStore()
+    store.insert(novo_usuario(1, "Maria", "Maria@Email.com"))
+
+    assert store.get_by_username("maria")["id"] == 1
+    assert store.get_by_email("maria@email.com")["id"] == 1
+    assert store.get_by_username("joao") is None
+    assert 1 in store and len(store) == 1
+
+def test_store_unicidade_sem_diferenciar_caixa():
+    """Testa que username e email são únicos independentemente de maiúsculas."""
+    store = InMemoryUserStore()
+    store.insert(novo_usuario(1, "maria", "maria@email.com"))
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        store.insert(novo_usuario(2, "MARIA", "outra@email.com"))
+    assert exc.value.campo == "username"
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        store.insert(novo_usuario(2, "outra", "MARIA@email.com"))
+    assert exc.value.campo == "email"
+    assert len(store) == 1
+
+def test_store_update_mantem_indice_de_email():
+    """Testa que trocar o email atualiza o índice e libera o email antigo."""
+    store = InMemoryUserStore()
+    store.insert(novo_usuario(1, "maria", "maria@email.com"))
+    store.insert(novo_usuario(2, "joao", "joao@email.com"))
+
+    store.update(1, email="nova@email.com")
+    assert store.get_by_email("maria@email.com") is None
+    assert store.get_by_email("nova@email.com")["id"] == 1
+
+    with pytest.raises(DuplicateKeyError):
+        store.update(2, email="NOVA@email.com")
+    assert store.get_by_email("joao@email.com")["id"] == 2
+
+def test_store_delete_remove_indices():
+    """Testa que a exclusão remove o usuário de todos os índices."""
+    store = InMemoryUserStore()
+    store.insert(novo_usuario(1, "maria", "maria@email.com"))
+    store.delete(1)
+
+    assert store.get(1) is None
+    assert store.get_by_username("maria") is None
+    assert store.get_by_email("maria@email.com") is None
+    store.insert(novo_usuario(2, "maria", "maria@email.com"))
+
+
+def test_registro_compacto_preserva_valores():
+    """Testa que o registro compacto devolve datas e hash sem perda de precisão."""
+    criado = datetime(2024, 5, 17, 13, 45, 12, 123456)
+    registro = UserRecord.from_dict({**novo_usuario(1, "maria", "maria@email.com"), "data_criacao": criado})
+
+    assert not hasattr(registro, "__dict__")
+    assert registro.data_criacao == criado
+    assert registro["data_criacao"] == criado
+    assert registro.get("ultimo_login") is None
+    assert registro.hash_bytes == b"hash"
+    assert registro.hashed_password == "hash"
+    with pytest.raises(KeyError):
+        registro["inexistente"]
+
+    registro.ultimo_login = criado + timedelta(days=1)
+    assert registro.ultimo_login_us - registro.data_criacao_us == 86_400_000_000
+
+def test_user_response_lido_dos_atributos():
+    """Testa a conversão direta do registro para a resposta, sem expor o hash."""
+    registro = UserRecord.from_dict(novo_usuario(7, "maria", "maria@email.com", idade=30))
+    resposta = UserResponse.model_validate(registro)
+
+    assert resposta.id == 7
+    assert resposta.idade == 30
+    assert resposta.data_criacao == registro.data_criacao
+    assert "hashed_password" not in resposta.model_dump()
+
+
+# --- Testes do repositório de logs ---
+
+def test_log_store_ids_nao_se_repetem_apos_descarte():
+    """Testa que os IDs continuam crescendo mesmo após o descarte por retenção."""
+    logs = InMemoryLogStore(max_por_usuario=10, max_total=3)
+    ids = [logs.add(1, "LOGIN")["id"] for _ in range(5)]
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert len(logs) == 3
+    assert [log["id"] for log in logs.recent(1, 10)] == [3, 4, 5]
+
+def test_log_store_buffer_circular_por_usuario():
+    """Testa o limite de entradas por usuário e a ordem cronológica do retorno."""
+    logs = InMemoryLogStore(max_por_usuario=3, max_total=100)
+    for i in range(5):
+        logs.add(1, "CONSULTA", f"consulta {i}")
+    logs.add(2, "LOGIN")
+
+    recentes = logs.recent(1, 10)
+    assert [log["detalhes"] for log in recentes] == ["consulta 2", "consulta 3", "consulta 4"]
+    assert [log["detalhes"] for log in logs.recent(1, 2)] == ["consulta 3", "consulta 4"]
+    assert len(logs.recent(2, 10)) == 1
+    assert logs.recent(3, 10) == []
+
+def test_log_store_retencao_global_remove_do_buffer_do_usuario():
+    """Testa que o limite global também remove a entrada do buffer do usuário."""
+    logs = InMemoryLogStore(max_por_usuario=10, max_total=2)
+    logs.add(1, "CADASTRO")
+    logs.add(2, "CADASTRO")
+    logs.add(2, "LOGIN")
+
+    assert logs.recent(1, 10) == []
+    assert [log["acao"] for log in logs.recent(2, 10)] == ["CADASTRO", "LOGIN"]
+    assert len(logs) == 2
+
+
+# --- Testes via API ---
+
+def test_cadastro_email_duplicado_com_caixa_diferente():
+    """Testa que o cadastro rejeita email repetido com outra capitalização."""
+    response1 = client.post("/cadastro", json={
+        "username": "user1",
+        "password": "123456",
+        "email": "mesmo@email.com"
+    })
+    assert response1.status_code == 201
+
+    response2 = client.post("/cadastro", json={
+        "username": "user2",
+        "password": "123456",
+        "email": "MESMO@email.com"
+    })
+    assert response2.status_code == 400
+
+def test_atualizar_email_e_me_apos_exclusao():
+    """Testa atualização de email e que o usuário some dos índices ao ser deletado."""
+    cadastro = client.post("/cadastro", json={
+        "username": "indexado",
+        "password": "senha123",
+        "email": "indexado@email.com"
+    })
+    user_id = cadastro.json()["id"]
+    token = client.post("/login", json={
+        "username": "indexado",
+        "password": "senha123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.put(f"/usuario/{user_id}", json={"email": "novo@email.com"}, headers=headers)
+    assert response.status_code == 200
+    assert db_usuarios.get_by_email("novo@email.com")["id"] == user_id
+    assert db_usuarios.get_by_email("indexado@email.com") is None
+
+    assert client.delete(f"/usuario/{user_id}", headers=headers).status_code == 200
+    assert db_usuarios.get_by_username("indexado") is None
+    assert client.get("/me", headers=headers).status_code == 401  # token revogado na exclusão
+
+def test_logs_retorna_ultimas_entradas_do_usuario():
+    """Testa que /logs devolve as últimas entradas do usuário em ordem cronológica."""
+    cadastro = client.post("/cadastro", json={
+        "username": "comlogs",
+        "password": "senha123",
+        "email": "comlogs@email.com"
+    })
+    user_id = cadastro.json()["id"]
+    token = client.post("/login", json={
+        "username": "comlogs",
+        "password": "senha123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get(f"/usuario/{user_id}", headers=headers)
+
+    response = client.get("/logs?limite=2", headers=headers)
+    assert response.status_code == 200
+    assert [log["acao"] for log in response.json()] == ["LOGIN", "CONSULTA"]
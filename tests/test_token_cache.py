@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, create_access_token, db_usuarios, db_logs, token_cache
+from cache import ClaimsCache, LRUCache
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o cache de tokens antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    token_cache.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    token_cache.clear()
+
+
+# --- Testes do cache ---
+
+def test_lru_descarta_menos_usado():
+    """Testa a política LRU ao exceder a capacidade."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_lru_respeita_expiracao():
+    """Testa que entradas expiradas contam como miss e são removidas."""
+    cache = LRUCache(maxsize=10)
+    cache.set("vencido", "x", expira_em=time.time() - 1)
+    cache.set("valido", "y", expira_em=time.time() + 60)
+
+    assert cache.get("vencido") is None
+    assert cache.get("valido") == "y"
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_claims_cache_invalida_por_usuario():
+    """Testa a remoção de todos os tokens de um usuário."""
+    cache = ClaimsCache(maxsize=10)
+    cache.set(b"t1", ("maria", "j1", 1.0))
+    cache.set(b"t2", ("maria", "j2", 2.0))
+    cache.set(b"t3", ("joao", "j3", 3.0))
+
+    assert cache.invalidate_subject("maria") == 2
+    assert cache.get(b"t1") is None and cache.get(b"t2") is None
+    assert cache.get(b"t3") == ("joao", "j3", 3.0)
+
+
+# --- Testes via API ---
+
+def test_verify_token_usa_cache_nas_requisicoes_seguintes():
+    """Testa que o segundo uso do mesmo token é servido pelo cache."""
+    token = create_access_token({"sub": "cacheado"}, timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.get("/usuarios", headers=headers)
+    misses = token_cache.stats()["misses"]
+    client.get("/usuarios", headers=headers)
+
+    stats = token_cache.stats()
+    assert stats["hits"] >= 1
+    assert stats["misses"] == misses
+
+def test_token_com_assinatura_invalida_nao_entra_no_cache():
+    """Testa que tokens rejeitados não são armazenados."""
+    token = create_access_token({"sub": "x"}, timedelta(minutes=5)) + "adulterado"
+    response = client.get("/usuarios", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+    assert len(token_cache) == 0
+
+def test_exclusao_remove_tokens_do_cache():
+    """Testa que deletar o usuário descarta seus tokens do cache."""
+    cadastro = client.post("/cadastro", json={
+        "username": "excluido",
+        "password": "senha123",
+        "email": "excluido@email.com"
+    })
+    token = client.post("/login", json={
+        "username": "excluido",
+        "password": "senha123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/me", headers=headers)
+    assert len(token_cache) == 1
+
+    client.delete(f"/usuario/{cadastro.json()['id']}", headers=headers)
+    assert len(token_cache) == 0
@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, db_usuarios, db_logs
+from tokens import InMemoryRefreshTokenStore, InMemoryRevocationList, TimeBuckets
+
+# Cliente de teste para fazer requisições à nossa API
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Limpa o "banco de dados" e o estado dos tokens antes e depois de cada teste."""
+    db_usuarios.clear()
+    db_logs.clear()
+    main.refresh_tokens.clear()
+    main.revoked_tokens.clear()
+    main.token_cache.clear()
+    yield
+    db_usuarios.clear()
+    db_logs.clear()
+    main.refresh_tokens.clear()
+    main.revoked_tokens.clear()
+    main.token_cache.clear()
+
+
+def cadastrar_e_logar(username="maria"):
+    """Cadastra um usuário e retorna o corpo da resposta de login."""
+    client.post("/cadastro", json={"username": username, "password": "senha123", "email": f"{username}@email.com"})
+    response = client.post("/login", json={"username": username, "password": "senha123"})
+    assert response.status_code == 200
+    return response.json()
+
+
+# --- Testes das estruturas ---
+
+def test_buckets_consumidos_em_ordem_de_tempo():
+    """Testa que só buckets inteiramente vencidos são consumidos."""
+    buckets = TimeBuckets(largura=10)
+    buckets.add("a", 5)
+    buckets.add("b", 15)
+    buckets.add("c", 25)
+    assert list(buckets.pop_expired(12)) == ["a"]
+    assert list(buckets.pop_expired(12)) == []
+    assert list(buckets.pop_expired(100)) == ["b", "c"]
+
+def test_revogacao_expira_e_e_limpa(monkeypatch):
+    """Testa a consulta O(1) e a limpeza das entradas vencidas."""
+    agora = [1000.0]
+    monkeypatch.setattr("tokens.time.time", lambda: agora[0])
+    revogados = InMemoryRevocationList(largura_bucket=60)
+    revogados.revoke("jti-1", expira_em=1100)
+    revogados.revoke_subject("maria", revogado_em=1000, expira_em=1200)
+
+    assert revogados.is_revoked("jti-1", "joao", 900)
+    assert revogados.is_revoked(None, "maria", 999)
+    assert not revogados.is_revoked(None, "maria", 1001)  # emitido depois da revogação
+
+    agora[0] = 1150
+    assert not revogados.is_revoked("jti-1", "joao", 900)
+    revogados.purge()
+    assert revogados.stats() == {"jtis": 0, "usuarios": 1}
+    revogados.purge(agora=1300)
+    assert len(revogados) == 0
+
+def test_refresh_token_rotacionado_e_de_uso_unico():
+    """Testa a rotação: o token usado deixa de valer e um novo é emitido."""
+    store = InMemoryRefreshTokenStore(ttl_segundos=60)
+    token = store.issue("maria")
+    sub, novo = store.rotate(token)
+    assert sub == "maria" and novo != token
+    assert store.rotate(token) is None
+    assert store.revoke_subject("maria") == 1
+    assert store.rotate(novo) is None
+    assert len(store) == 0
+
+
+# --- Testes via API ---
+
+def test_refresh_emite_novo_access_token_sem_bcrypt(monkeypatch):
+    """Testa o fluxo de renovação sem nenhuma verificação de senha."""
+    login = cadastrar_e_logar()
+    assert login["refresh_token"]
+
+    def sem_bcrypt(*args):
+        raise AssertionError("renovação não deve usar bcrypt")
+
+    monkeypatch.setattr(main, "verify_password", sem_bcrypt)
+    response = client.post("/token/refresh", json={"refresh_token": login["refresh_token"]})
+    assert response.status_code == 200
+    renovado = response.json()
+    assert renovado["refresh_token"] != login["refresh_token"]
+
+    me = client.get("/me", headers={"Authorization": f"Bearer {renovado['access_token']}"})
+    assert me.json()["username"] == "maria"
+    # O refresh token antigo já foi consumido
+    assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+def test_logout_revoga_access_e_refresh_token():
+    """Testa que o logout invalida o access token (mesmo em cache) e o refresh token."""
+    login = cadastrar_e_logar()
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert client.get("/me", headers=headers).status_code == 200  # claims em cache
+
+    response = client.post("/logout", json={"refresh_token": login["refresh_token"]}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/me", headers=headers).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+def test_logout_com_token_simples():
+    """Testa que o logout com o token simples (legado) não quebra e ainda revoga o refresh token."""
+    login = cadastrar_e_logar()
+    headers = {"Authorization": "Bearer simple_token_maria"}
+
+    response = client.post("/logout", json={"refresh_token": login["refresh_token"]}, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+def test_exclusao_revoga_tokens_do_usuario():
+    """Testa que excluir o usuário invalida seus access e refresh tokens, mas não os de um novo cadastro."""
+    login = cadastrar_e_logar()
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    user_id = client.get("/me", headers=headers).json()["id"]
+    outro_token = main.create_access_token({"sub": "maria"}, timedelta(minutes=5))
+
+    assert client.delete(f"/usuario/{user_id}", headers=headers).status_code == 200
+    assert client.get("/logs", headers={"Authorization": f"Bearer {outro_token}"}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+    # Mesmo username cadastrado de novo: tokens emitidos depois da exclusão valem
+    novo_login = cadastrar_e_logar()
+    assert client.get("/me", headers={"Authorization": f"Bearer {novo_login['access_token']}"}).status_code == 200
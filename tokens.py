@@ -0,0 +1,369 @@
+"""
+Refresh tokens opacos e lista de revogação de access tokens.
+
+Refresh tokens são valores aleatórios guardados apenas no servidor (pelo
+SHA-256, nunca em claro) e trocados a cada uso (rotação): renovar a sessão
+não envolve bcrypt. A lista de revogação guarda ``jti`` de access tokens
+encerrados (logout) e usernames cujos tokens emitidos até certo instante
+deixaram de valer (exclusão do usuário).
+
+As entradas só precisam existir até o ``exp`` do que revogam. Nas versões
+em memória elas são agrupadas em buckets pelo instante de expiração
+(``TimeBuckets``): a limpeza percorre apenas buckets inteiramente vencidos,
+com custo amortizado O(1) por entrada, e a consulta em ``verify_token`` é
+uma busca em dicionário. As versões SQLite compartilham o estado entre
+workers usando o mesmo arquivo dos usuários, com consultas pela chave
+primária e limpeza por índice de expiração.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+
+class TimeBuckets:
+    """Chaves agrupadas por intervalo de expiração, consumidas em ordem de tempo."""
+
+    def __init__(self, largura: float = 60.0):
+        self.largura = largura
+        self._buckets: Dict[int, List[Hashable]] = {}
+        self._proximo: Optional[int] = None  # menor bucket ainda não consumido
+
+    def add(self, chave: Hashable, expira_em: float) -> None:
+        indice = int(expira_em // self.largura)
+        self._buckets.setdefault(indice, []).append(chave)
+        if self._proximo is None or indice < self._proximo:
+            self._proximo = indice
+
+    def pop_expired(self, agora: float) -> Iterator[Hashable]:
+        """Remove e devolve as chaves dos buckets que terminaram antes de ``agora``."""
+        limite = int(agora // self.largura)
+        while self._proximo is not None and self._proximo < limite:
+            yield from self._buckets.pop(self._proximo, ())
+            self._proximo = self._proximo + 1 if self._buckets else None
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._proximo = None
+
+
+class RevocationList(ABC):
+    """Denylist de ``jti`` e de usernames revogados, válida até o ``exp`` de cada entrada."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Quantidade de entradas ainda guardadas."""
+
+    @abstractmethod
+    def revoke(self, jti: str, expira_em: float) -> None:
+        """Revoga um access token até o seu ``exp``."""
+
+    @abstractmethod
+    def revoke_subject(self, sub: str, revogado_em: float, expira_em: float) -> None:
+        """Revoga os tokens de ``sub`` emitidos até ``revogado_em``; vale até ``expira_em``."""
+
+    @abstractmethod
+    def is_revoked(self, jti: Optional[str], sub: str, emitido_em: Optional[float]) -> bool:
+        """Indica se o token está revogado (consulta O(1))."""
+
+    @abstractmethod
+    def purge(self, agora: Optional[float] = None) -> None:
+        """Remove as entradas vencidas."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Quantidades de entradas por tipo."""
+
+
+def _revogado(jti_expira_em: Optional[float], usuario: Optional[Tuple[float, float]],
+              emitido_em: Optional[float], agora: float) -> bool:
+    # Entradas vencidas ainda não limpas não revogam nada
+    if jti_expira_em is not None and jti_expira_em > agora:
+        return True
+    if usuario is not None and usuario[1] > agora:
+        return emitido_em is None or emitido_em <= usuario[0]
+    return False
+
+
+class InMemoryRevocationList(RevocationList):
+    """Denylist em memória, com expiração em buckets."""
+
+    def __init__(self, largura_bucket: float = 60.0):
+        self._jtis: Dict[str, float] = {}  # jti -> exp do token
+        self._usuarios: Dict[str, Tuple[float, float]] = {}  # sub -> (revogado_em, expira_em)
+        self._expiracoes = TimeBuckets(largura_bucket)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jtis) + len(self._usuarios)
+
+    def revoke(self, jti: str, expira_em: float) -> None:
+        with self._lock:
+            self._purge(time.time())
+            self._jtis[jti] = expira_em
+            self._expiracoes.add(("jti", jti), expira_em)
+
+    def revoke_subject(self, sub: str, revogado_em: float, expira_em: float) -> None:
+        with self._lock:
+            self._purge(time.time())
+            self._usuarios[sub] = (revogado_em, expira_em)
+            self._expiracoes.add(("sub", sub), expira_em)
+
+    def is_revoked(self, jti: Optional[str], sub: str, emitido_em: Optional[float]) -> bool:
+        return _revogado(self._jtis.get(jti) if jti is not None else None,
+                         self._usuarios.get(sub), emitido_em, time.time())
+
+    def _purge(self, agora: float) -> None:
+        for tipo, chave in self._expiracoes.pop_expired(agora):
+            indice = self._jtis if tipo == "jti" else self._usuarios
+            valor = indice.get(chave)
+            expira_em = valor if tipo == "jti" else (valor[1] if valor else None)
+            # A chave pode ter sido revogada de novo com expiração posterior
+            if expira_em is not None and expira_em <= agora:
+                del indice[chave]
+
+    def purge(self, agora: Optional[float] = None) -> None:
+        with self._lock:
+            self._purge(time.time() if agora is None else agora)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jtis.clear()
+            self._usuarios.clear()
+            self._expiracoes.clear()
+
+    def stats(self) -> dict:
+        return {"jtis": len(self._jtis), "usuarios": len(self._usuarios)}
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class RefreshTokenStore(ABC):
+    """Refresh tokens opacos com rotação a cada uso."""
+
+    def __init__(self, ttl_segundos: float):
+        self.ttl_segundos = ttl_segundos
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Quantidade de refresh tokens ativos."""
+
+    @abstractmethod
+    def issue(self, sub: str) -> str:
+        """Emite um novo refresh token para ``sub``."""
+
+    @abstractmethod
+    def rotate(self, token: str) -> Optional[Tuple[str, str]]:
+        """Consome ``token`` e devolve ``(sub, novo_token)``; ``None`` se inválido ou vencido."""
+
+    @abstractmethod
+    def revoke(self, token: str) -> None:
+        """Revoga um refresh token."""
+
+    @abstractmethod
+    def revoke_subject(self, sub: str) -> int:
+        """Revoga todos os refresh tokens de ``sub``."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todos os refresh tokens."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Quantidades de tokens ativos e de usuários com tokens."""
+
+
+class InMemoryRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens em memória, com expiração em buckets."""
+
+    def __init__(self, ttl_segundos: float, largura_bucket: float = 3600.0):
+        super().__init__(ttl_segundos)
+        self._tokens: Dict[bytes, Tuple[str, float]] = {}  # sha256 -> (sub, expira_em)
+        self._por_usuario: Dict[str, Set[bytes]] = {}
+        self._expiracoes = TimeBuckets(largura_bucket)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def issue(self, sub: str) -> str:
+        token = secrets.token_urlsafe(32)
+        chave = _digest(token)
+        agora = time.time()
+        expira_em = agora + self.ttl_segundos
+        with self._lock:
+            self._purge(agora)
+            self._tokens[chave] = (sub, expira_em)
+            self._por_usuario.setdefault(sub, set()).add(chave)
+            self._expiracoes.add(chave, expira_em)
+        return token
+
+    def _remover(self, chave: bytes) -> Optional[Tuple[str, float]]:
+        entrada = self._tokens.pop(chave, None)
+        if entrada is not None:
+            chaves = self._por_usuario.get(entrada[0])
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_usuario[entrada[0]]
+        return entrada
+
+    def rotate(self, token: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            entrada = self._remover(_digest(token))
+        if entrada is None or entrada[1] <= time.time():
+            return None
+        return entrada[0], self.issue(entrada[0])
+
+    def revoke(self, token: str) -> None:
+        with self._lock:
+            self._remover(_digest(token))
+
+    def revoke_subject(self, sub: str) -> int:
+        with self._lock:
+            chaves = list(self._por_usuario.get(sub, ()))
+            for chave in chaves:
+                self._remover(chave)
+        return len(chaves)
+
+    def _purge(self, agora: float) -> None:
+        for chave in self._expiracoes.pop_expired(agora):
+            entrada = self._tokens.get(chave)
+            if entrada is not None and entrada[1] <= agora:
+                self._remover(chave)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._por_usuario.clear()
+            self._expiracoes.clear()
+
+    def stats(self) -> dict:
+        return {"ativos": len(self._tokens), "usuarios": len(self._por_usuario)}
+
+
+# --- Versões SQLite (estado compartilhado entre workers) ---
+
+SCHEMA_TOKENS = """
+CREATE TABLE IF NOT EXISTS revogacoes (
+    tipo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    revogado_em REAL NOT NULL,
+    expira_em REAL NOT NULL,
+    PRIMARY KEY (tipo, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_revogacoes_expira ON revogacoes(expira_em);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    digest BLOB PRIMARY KEY,
+    sub TEXT NOT NULL,
+    expira_em REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_sub ON refresh_tokens(sub);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expira ON refresh_tokens(expira_em);
+"""
+
+
+class SQLiteRevocationList(RevocationList):
+    """Denylist compartilhada no banco SQLite (``storage.SQLiteDatabase``)."""
+
+    def __init__(self, db):
+        self.db = db
+        self.db.connection().executescript(SCHEMA_TOKENS)
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM revogacoes").fetchone()[0]
+
+    def _gravar(self, tipo: str, chave: str, revogado_em: float, expira_em: float) -> None:
+        conn = self.db.connection()
+        conn.execute("DELETE FROM revogacoes WHERE expira_em <= ?", (time.time(),))
+        conn.execute(
+            "INSERT INTO revogacoes (tipo, chave, revogado_em, expira_em) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(tipo, chave) DO UPDATE SET revogado_em = excluded.revogado_em, "
+            "expira_em = MAX(expira_em, excluded.expira_em)",
+            (tipo, chave, revogado_em, expira_em),
+        )
+
+    def revoke(self, jti: str, expira_em: float) -> None:
+        self._gravar("jti", jti, time.time(), expira_em)
+
+    def revoke_subject(self, sub: str, revogado_em: float, expira_em: float) -> None:
+        self._gravar("sub", sub, revogado_em, expira_em)
+
+    def is_revoked(self, jti: Optional[str], sub: str, emitido_em: Optional[float]) -> bool:
+        linhas = self.db.connection().execute(
+            "SELECT tipo, revogado_em, expira_em FROM revogacoes "
+            "WHERE (tipo = 'jti' AND chave = ?) OR (tipo = 'sub' AND chave = ?)",
+            (jti or "", sub),
+        ).fetchall()
+        jti_expira_em, usuario = None, None
+        for tipo, revogado_em, expira_em in linhas:
+            if tipo == "jti":
+                jti_expira_em = expira_em
+            else:
+                usuario = (revogado_em, expira_em)
+        return _revogado(jti_expira_em, usuario, emitido_em, time.time())
+
+    def purge(self, agora: Optional[float] = None) -> None:
+        self.db.connection().execute(
+            "DELETE FROM revogacoes WHERE expira_em <= ?", (time.time() if agora is None else agora,))
+
+    def clear(self) -> None:
+        self.db.connection().execute("DELETE FROM revogacoes")
+
+    def stats(self) -> dict:
+        contagem = dict(self.db.connection().execute(
+            "SELECT tipo, COUNT(*) FROM revogacoes GROUP BY tipo").fetchall())
+        return {"jtis": contagem.get("jti", 0), "usuarios": contagem.get("sub", 0)}
+
+
+class SQLiteRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens compartilhados no banco SQLite; a rotação é atômica entre processos."""
+
+    def __init__(self, db, ttl_segundos: float):
+        super().__init__(ttl_segundos)
+        self.db = db
+        self.db.connection().executescript(SCHEMA_TOKENS)
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM refresh_tokens").fetchone()[0]
+
+    def issue(self, sub: str) -> str:
+        token = secrets.token_urlsafe(32)
+        agora = time.time()
+        conn = self.db.connection()
+        conn.execute("DELETE FROM refresh_tokens WHERE expira_em <= ?", (agora,))
+        conn.execute("INSERT INTO refresh_tokens (digest, sub, expira_em) VALUES (?, ?, ?)",
+                     (_digest(token), sub, agora + self.ttl_segundos))
+        return token
+
+    def rotate(self, token: str) -> Optional[Tuple[str, str]]:
+        # DELETE ... RETURNING: só um worker consegue consumir o mesmo token
+        linha = self.db.connection().execute(
+            "DELETE FROM refresh_tokens WHERE digest = ? RETURNING sub, expira_em", (_digest(token),)
+        ).fetchone()
+        if linha is None or linha[1] <= time.time():
+            return None
+        return linha[0], self.issue(linha[0])
+
+    def revoke(self, token: str) -> None:
+        self.db.connection().execute("DELETE FROM refresh_tokens WHERE digest = ?", (_digest(token),))
+
+    def revoke_subject(self, sub: str) -> int:
+        return self.db.connection().execute("DELETE FROM refresh_tokens WHERE sub = ?", (sub,)).rowcount
+
+    def clear(self) -> None:
+        self.db.connection().execute("DELETE FROM refresh_tokens")
+
+    def stats(self) -> dict:
+        ativos, usuarios = self.db.connection().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT sub) FROM refresh_tokens").fetchone()
+        return {"ativos": ativos, "usuarios": usuarios}